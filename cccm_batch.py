@@ -0,0 +1,74 @@
+# 작은 payload batching - message 여러 개를 batch 1개로 묶어 압축 / 암호화 / hash를 1번만 수행.
+# batch body (압축 전): [sequence(4) | length(4) | data] 반복. subscriber는 body를 message 단위로 다시 나눈다.
+import struct
+import time
+
+BATCH_RECORD = struct.Struct(">II")
+
+
+class MessageBatcher:
+    """message를 모으고 flush 시점을 판단 (전송은 호출 측).
+
+    누적 data가 max_bytes 이상, message 수가 max_messages 이상이면 full(),
+    가장 오래된 message가 max_delay 초를 넘으면 due() -> message별 batching 지연의 상한.
+    """
+
+    def __init__(self, max_bytes=65536, max_delay=0.05, max_messages=256):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_messages = max_messages
+        self.records = []           # (sequence, data, enqueue_time)
+        self.size = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, sequence, data, enqueue_time=None):
+        self.records.append((sequence, data, time.time() if enqueue_time is None else enqueue_time))
+        self.size += BATCH_RECORD.size + len(data)
+
+    def full(self):
+        return self.size >= self.max_bytes or len(self.records) >= self.max_messages
+
+    def deadline(self):
+        """가장 오래된 message의 flush 기한 (없으면 None)"""
+        return self.records[0][2] + self.max_delay if self.records else None
+
+    def due(self, now=None):
+        deadline = self.deadline()
+        return deadline is not None and (time.time() if now is None else now) >= deadline
+
+    def take(self):
+        records, self.records, self.size = self.records, [], 0
+        return records
+
+
+def batch_size(records):
+    return sum(BATCH_RECORD.size + len(data) for _, data, *_ in records)
+
+
+def pack_batch(records):
+    """[(sequence, data, ...)] -> batch body bytearray (data는 1번만 복사)"""
+    body = bytearray(batch_size(records))
+    offset = 0
+    for sequence, data, *_ in records:
+        BATCH_RECORD.pack_into(body, offset, sequence, len(data))
+        offset += BATCH_RECORD.size
+        body[offset:offset + len(data)] = data
+        offset += len(data)
+    return body
+
+
+def iter_batch(body):
+    """batch body -> (sequence, data memoryview) 순서대로"""
+    view = memoryview(body)
+    offset = 0
+    while offset < len(view):
+        if offset + BATCH_RECORD.size > len(view):
+            raise ValueError("Truncated batch record header")
+        sequence, size = BATCH_RECORD.unpack_from(view, offset)
+        offset += BATCH_RECORD.size
+        if offset + size > len(view):
+            raise ValueError(f"Truncated batch record (seq={sequence})")
+        yield sequence, view[offset:offset + size]
+        offset += size
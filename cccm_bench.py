@@ -0,0 +1,199 @@
+# 재현 가능한 end-to-end benchmark - 로컬 broker(cccm_broker, network emulation) 위에서 cccms_20 / cccmp_20 을 함께 실행하고
+# log를 cccm_m2_20 과 같은 merge csv (+ summary)로 만든다. 공개 broker / WAN 상태와 무관하게 codec 변경을 비교할 때 사용.
+#   python cccm_bench.py --latency 20 --jitter 2 --bandwidth 10 --loss 0.5 --combos 1-56 --sizes 512,65536
+import argparse
+import configparser
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from cccm_broker import LinkProfile, LocalBroker
+from cccm_m2_20 import CsvSink, drop_sequences, merge_stream, print_invalid_report, summarize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_config(base_ini, path, port, run_dir, args):
+    """기본 ini에 benchmark 설정을 덮어쓴 run 전용 ini 생성. 상대 경로(corpus, policy 등)는 BASE_DIR 기준 그대로"""
+    config = configparser.ConfigParser()
+    config.read(base_ini)
+    for section in ("MQTT", "LOG", "TEST", "PING", "METRICS"):
+        if not config.has_section(section):
+            config.add_section(section)
+    config["MQTT"]["broker"] = "127.0.0.1"
+    config["MQTT"]["port"] = str(port)
+    config["LOG"]["log_file"] = os.path.join(run_dir, "bench_log.txt")
+    config["LOG"]["hash_mismatch_log"] = os.path.join(run_dir, "hash_mismatch_log.txt")
+    config["LOG"]["log_format"] = "jsonl"     # cccm_m2_20 입력
+    config["METRICS"]["snapshot_file"] = os.path.join(run_dir, "metrics_snapshot.jsonl")
+    config["METRICS"]["port"] = "0"         # 이미 실행 중인 subscriber의 metrics port와 충돌하지 않도록 HTTP 없음
+    config["TEST"]["label"] = "bench"
+    config["TEST"]["mode"] = args.mode
+    config["TEST"]["test_loop"] = str(args.loop)
+    config["TEST"]["time_sleep"] = str(args.sleep)
+    config["TEST"]["combos"] = args.combos
+    if args.sizes:
+        config["TEST"]["data_sizes"] = args.sizes
+    if args.format:
+        config["TEST"]["payload_format"] = args.format
+    # ping은 loopback broker port로 (emulation 값은 environment label / bench_profile.json에 기록)
+    config["PING"]["method"] = "monitor"
+    config["PING"]["protocol"] = "tcp"
+    config["PING"]["port"] = str(port)
+    with open(path, "w") as f:
+        config.write(f)
+    return config["LOG"]["log_file"]
+
+
+def count_directions(log_file):
+    """log의 (pub 수, sub 수)"""
+    counts = {"pub": 0, "sub": 0}
+    if not os.path.exists(log_file):
+        return 0, 0
+    with open(log_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                direction = json.loads(line).get("direction")
+            except json.JSONDecodeError:
+                continue
+            if direction in counts:
+                counts[direction] += 1
+    return counts["pub"], counts["sub"]
+
+
+def wait_until(condition, timeout, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return condition()
+
+
+def drain(log_file, idle, timeout):
+    """sub 수가 pub 수에 도달하거나 idle 초 동안 늘지 않을 때까지 대기 -> (pub, sub)"""
+    deadline = time.monotonic() + timeout
+    last, last_change = None, time.monotonic()
+    while True:
+        pub, sub = count_directions(log_file)
+        if sub >= pub:
+            return pub, sub
+        if sub != last:
+            last, last_change = sub, time.monotonic()
+        if time.monotonic() - last_change > idle or time.monotonic() > deadline:
+            return pub, sub
+        time.sleep(0.5)
+
+
+def stop_process(proc, timeout=15.0):
+    """Ctrl+C 와 같이 종료 (subscriber는 KeyboardInterrupt에서 log flush)"""
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def merge_log(log_file, environment):
+    """cccm_m2_20 main 과 같은 merge / summary. 불완전 sequence는 제외하고 보고"""
+    csv_file = log_file.rsplit(".", 1)[0] + ".csv"
+    sink = CsvSink(csv_file, environment)
+    try:
+        invalid, late_duplicates, out_of_order = merge_stream(log_file, sink)
+    finally:
+        sink.close()
+    if out_of_order:
+        print(f"[WARN] {out_of_order} rows are out of sequence order.")
+    if invalid or late_duplicates:
+        print_invalid_report(log_file, invalid, late_duplicates)
+        sink.rows -= drop_sequences(csv_file, set(late_duplicates) | set(invalid))
+    summaries = summarize(csv_file) if sink.rows else []
+    return csv_file, sink.rows, summaries
+
+
+def run_benchmark(args):
+    profile = LinkProfile(args.latency / 1000, args.jitter / 1000, args.bandwidth * 1e6 / 8, args.loss / 100,
+                          args.rto / 1000 if args.rto else None)
+    environment = args.env or profile.describe()
+    run_dir = os.path.abspath(args.out or os.path.join("bench", time.strftime("%Y%m%d_%H%M%S")))
+    os.makedirs(run_dir, exist_ok=True)
+
+    broker = LocalBroker(uplink=profile, downlink=profile, seed=args.seed).start()
+    ini_path = os.path.join(run_dir, "ccms.ini")
+    log_file = write_config(args.config, ini_path, broker.port, run_dir, args)
+    env = dict(os.environ, CCMS_INI=ini_path, PYTHONUNBUFFERED="1")
+    print(f"Benchmark: {environment}, broker 127.0.0.1:{broker.port}, output {run_dir}")
+
+    started = time.time()
+    subscriber = publisher = None
+    try:
+        with open(os.path.join(run_dir, "sub.out"), "w") as sub_out, \
+                open(os.path.join(run_dir, "pub.out"), "w") as pub_out:
+            subscriber = subprocess.Popen([sys.executable, "cccms_20.py"], cwd=BASE_DIR, env=env,
+                                          stdout=sub_out, stderr=subprocess.STDOUT)
+            if not wait_until(lambda: broker.subscription_count() > 0 or subscriber.poll() is not None, 60):
+                raise RuntimeError("Subscriber did not subscribe")
+            if subscriber.poll() is not None:
+                raise RuntimeError(f"Subscriber exited ({subscriber.returncode}), see {run_dir}/sub.out")
+            publisher = subprocess.Popen([sys.executable, "cccmp_20.py"], cwd=BASE_DIR, env=env,
+                                         stdout=pub_out, stderr=subprocess.STDOUT)
+            publisher.wait()
+            if publisher.returncode:
+                print(f"[WARN] Publisher exited with {publisher.returncode}, see {run_dir}/pub.out")
+            drain(log_file, args.drain, args.timeout)
+            stop_process(subscriber)
+    finally:
+        for proc in (publisher, subscriber):
+            if proc is not None:
+                stop_process(proc)
+        broker.stop()
+
+    pub_count, sub_count = count_directions(log_file)
+    report = {"environment": environment, "uplink": profile.as_dict(), "downlink": profile.as_dict(),
+              "seed": args.seed, "combos": args.combos, "sizes": args.sizes, "mode": args.mode,
+              "loop": args.loop, "pub": pub_count, "sub": sub_count, "elapsed": time.time() - started,
+              "broker": broker.stats()}
+    with open(os.path.join(run_dir, "bench_profile.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Published {pub_count}, received {sub_count}, broker {report['broker']}")
+
+    if not pub_count:
+        print("No log records, nothing to merge.")
+        return None
+    csv_file, rows, summaries = merge_log(log_file, environment)
+    print(f"Merged {rows} sequences into {csv_file}.")
+    for summary_file in summaries:
+        print(f"Summary saved to {summary_file}.")
+    return csv_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="end-to-end benchmark on a local broker with network emulation")
+    parser.add_argument('--config', default='ccms.ini', help='base ini (broker / log / ping are overridden)')
+    parser.add_argument('--out', default=None, help='run directory (default bench/<timestamp>)')
+    parser.add_argument('--latency', type=float, default=0.0, help='one-way delay per hop (ms)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='uniform jitter per packet (+/- ms)')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='per-hop bandwidth in Mbit/s (0 = unlimited)')
+    parser.add_argument('--loss', type=float, default=0.0, help='TCP segment loss (%%), emulated as retransmission delay')
+    parser.add_argument('--rto', type=float, default=0.0, help='retransmission timeout (ms, default max(200, 2*latency))')
+    parser.add_argument('--seed', type=int, default=0, help='emulation random seed')
+    parser.add_argument('--combos', default='', help='combo ids (e.g. 1-56,71), empty = all')
+    parser.add_argument('--sizes', default='', help='payload sizes (comma separated), empty = publisher default')
+    parser.add_argument('--mode', default='sweep', help='publisher mode (sweep / stream / throughput ...)')
+    parser.add_argument('--format', default='', help='payload format (json / binary), empty = base ini')
+    parser.add_argument('--loop', type=int, default=1, help='test_loop')
+    parser.add_argument('--sleep', type=float, default=0.05, help='time_sleep between payloads (s)')
+    parser.add_argument('--env', default=None, help='environment label (default: emulation profile)')
+    parser.add_argument('--drain', type=float, default=10.0, help='stop when no new sub record for this many seconds')
+    parser.add_argument('--timeout', type=float, default=600.0, help='max wait for subscriber after publisher ends')
+    args = parser.parse_args()
+    if run_benchmark(args) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
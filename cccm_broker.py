@@ -0,0 +1,372 @@
+# 로컬 MQTT broker (3.1.1 subset) + 전송 구간 network emulation - cccm_bench 의 재현 가능한 benchmark 용.
+# 지원: CONNECT / PUBLISH (QoS 0/1/2) / SUBSCRIBE (+, # wildcard) / UNSUBSCRIBE / PINGREQ / DISCONNECT
+#       shared subscription ($share/<group>/<filter>, group 안에서 message마다 round-robin)
+# retained message, will, persistent session 은 지원하지 않음.
+import asyncio
+import math
+import random
+import struct
+import threading
+import time
+
+MSS = 1460
+MIN_RTO = 0.2   # Linux TCP 최소 RTO
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+SHARED_PREFIX = "$share/"
+
+
+class LinkProfile:
+    """한 방향 전송 구간의 특성. latency / jitter / rto 는 초, bandwidth는 bytes/s (0 = 제한 없음).
+
+    loss는 TCP segment(MSS) 단위 손실 확률. MQTT는 TCP 위에서 동작하므로 손실된 segment는 버려지지 않고
+    RTO 후 재전송(재손실 시 RTO 2배)된다 -> message 유실이 아니라 지연 + head-of-line blocking 으로 나타난다.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0.0, loss=0.0, rto=None):
+        if not 0.0 <= loss < 1.0:
+            raise ValueError(f"loss must be in [0, 1): {loss}")
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.rto = rto if rto is not None else max(MIN_RTO, 2 * latency)
+
+    def as_dict(self):
+        return {"latency": self.latency, "jitter": self.jitter, "bandwidth": self.bandwidth,
+                "loss": self.loss, "rto": self.rto}
+
+    def describe(self):
+        """log / csv environment label 용 짧은 이름"""
+        bandwidth = f"{self.bandwidth * 8 / 1e6:g}mbps" if self.bandwidth else "unlimited"
+        return f"local_d{self.latency * 1000:g}ms_j{self.jitter * 1000:g}ms_{bandwidth}_loss{self.loss * 100:g}pct"
+
+
+class Link:
+    """LinkProfile에 따라 packet별 도착 시각 계산 (bandwidth 직렬화 + 지연 + 재전송, TCP처럼 순서 유지)"""
+
+    def __init__(self, profile, rng):
+        self.profile = profile
+        self._rng = rng
+        self._free = 0.0        # 이전 packet 직렬화가 끝나는 시각
+        self._last = 0.0        # 이전 packet 도착 시각 (순서 유지)
+        self.packets = 0
+        self.bytes = 0
+        self.retransmits = 0
+
+    def _retransmit_delay(self, nbytes):
+        p = self.profile
+        worst = 0
+        for _ in range(max(1, math.ceil(nbytes / MSS))):
+            tries = 0
+            while self._rng.random() < p.loss:
+                tries += 1
+            self.retransmits += tries
+            worst = max(worst, tries)
+        return p.rto * (2 ** worst - 1)
+
+    def schedule(self, nbytes, now):
+        p = self.profile
+        start = max(now, self._free)
+        self._free = start + (nbytes / p.bandwidth if p.bandwidth > 0 else 0.0)
+        delay = p.latency
+        if p.jitter:
+            delay = max(0.0, delay + self._rng.uniform(-p.jitter, p.jitter))
+        if p.loss:
+            delay += self._retransmit_delay(nbytes)
+        self._last = max(self._last, self._free + delay)
+        self.packets += 1
+        self.bytes += nbytes
+        return self._last
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT topic filter (+ : 1 level, # : 나머지 전체) 매칭"""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def split_shared(topic_filter):
+    """$share/<group>/<filter> -> (group, filter), 일반 filter는 None"""
+    if not topic_filter.startswith(SHARED_PREFIX):
+        return None
+    group, _, real_filter = topic_filter[len(SHARED_PREFIX):].partition("/")
+    if not group or not real_filter:
+        return None
+    return group, real_filter
+
+
+def _remaining_length(n):
+    out = bytearray()
+    while True:
+        n, digit = divmod(n, 128)
+        out.append(digit | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _packet(first_byte, *parts):
+    size = sum(len(p) for p in parts)
+    return b"".join((bytes([first_byte]), _remaining_length(size)) + parts)
+
+
+async def _read_packet(reader):
+    first = (await reader.readexactly(1))[0]
+    size, multiplier = 0, 1
+    for _ in range(4):
+        digit = (await reader.readexactly(1))[0]
+        size += (digit & 0x7F) * multiplier
+        multiplier *= 128
+        if not digit & 0x80:
+            break
+    else:
+        raise ValueError("Malformed remaining length")
+    return first, await reader.readexactly(size)
+
+
+class _Session:
+    """client 연결 1개. 수신 packet은 uplink, 송신 packet은 downlink 도착 시각까지 기다린 뒤 처리 / 전송"""
+
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.index = broker.next_session_index()
+        self.reader = reader
+        self.writer = writer
+        self.uplink = Link(broker.uplink, broker.rng)
+        self.downlink = Link(broker.downlink, broker.rng)
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.subscriptions = {}     # topic filter -> granted QoS
+        self._next_mid = 0
+
+    def send(self, packet):
+        self.outbox.put_nowait((self.downlink.schedule(len(packet), time.monotonic()), packet))
+
+    def match(self, topic):
+        """이 session이 받을 QoS (구독하지 않았으면 None)"""
+        granted = [qos for topic_filter, qos in self.subscriptions.items()
+                   if not topic_filter.startswith(SHARED_PREFIX) and topic_matches(topic_filter, topic)]
+        return max(granted) if granted else None
+
+    def shared_matches(self, topic):
+        """topic과 맞는 shared subscription -> ((group, filter), QoS)"""
+        for topic_filter, qos in self.subscriptions.items():
+            shared = split_shared(topic_filter)
+            if shared is not None and topic_matches(shared[1], topic):
+                yield shared, qos
+
+    def publish(self, topic, payload, qos):
+        header = struct.pack(">H", len(topic)) + topic
+        if qos:
+            self._next_mid = self._next_mid % 0xFFFF + 1
+            header += struct.pack(">H", self._next_mid)
+        self.send(_packet((PUBLISH << 4) | (qos << 1), header, payload))
+
+    async def run(self):
+        tasks = [asyncio.create_task(self._process()), asyncio.create_task(self._write())]
+        try:
+            while True:
+                first, body = await _read_packet(self.reader)
+                self.inbox.put_nowait((self.uplink.schedule(len(body) + 2, time.monotonic()), first, body))
+                if first >> 4 == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.inbox.put_nowait(None)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.writer.close()
+
+    async def _process(self):
+        try:
+            while True:
+                item = await self.inbox.get()
+                if item is None:
+                    return
+                due, first, body = item
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                if not self._handle(first, body):
+                    return
+        finally:
+            self.broker.remove(self)
+            self.outbox.put_nowait(None)
+
+    async def _write(self):
+        try:
+            while True:
+                item = await self.outbox.get()
+                if item is None:
+                    return
+                due, packet = item
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                self.writer.write(packet)
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    def _handle(self, first, body):
+        kind = first >> 4
+        if kind == CONNECT:
+            self.send(_packet(CONNACK << 4, b"\x00\x00"))
+        elif kind == PUBLISH:
+            qos = (first >> 1) & 0x03
+            topic_size, = struct.unpack_from(">H", body)
+            topic = body[2:2 + topic_size]
+            offset = 2 + topic_size
+            mid = body[offset:offset + 2] if qos else None
+            offset += 2 if qos else 0
+            self.broker.route(topic, memoryview(body)[offset:], qos)
+            if qos == 1:
+                self.send(_packet(PUBACK << 4, mid))
+            elif qos == 2:
+                self.send(_packet(PUBREC << 4, mid))
+        elif kind == PUBREL:
+            self.send(_packet(PUBCOMP << 4, body[:2]))
+        elif kind == PUBREC:
+            self.send(_packet((PUBREL << 4) | 0x02, body[:2]))
+        elif kind == SUBSCRIBE:
+            mid, offset, granted = body[:2], 2, bytearray()
+            while offset < len(body):
+                size, = struct.unpack_from(">H", body, offset)
+                topic_filter = body[offset + 2:offset + 2 + size].decode()
+                qos = min(body[offset + 2 + size] & 0x03, 2)
+                offset += 3 + size
+                self.subscriptions[topic_filter] = qos
+                granted.append(qos)
+            self.send(_packet(SUBACK << 4, mid, bytes(granted)))
+        elif kind == UNSUBSCRIBE:
+            offset = 2
+            while offset < len(body):
+                size, = struct.unpack_from(">H", body, offset)
+                self.subscriptions.pop(body[offset + 2:offset + 2 + size].decode(), None)
+                offset += 2 + size
+            self.send(_packet(UNSUBACK << 4, body[:2]))
+        elif kind == PINGREQ:
+            self.send(_packet(PINGRESP << 4))
+        elif kind == DISCONNECT:
+            return False
+        return True                 # PUBACK / PUBCOMP 는 무시
+
+
+class LocalBroker:
+    """background thread의 asyncio loop에서 동작하는 broker. port=0 이면 빈 port를 할당 (start() 후 .port)"""
+
+    def __init__(self, host="127.0.0.1", port=0, uplink=None, downlink=None, seed=0):
+        self.host = host
+        self.port = port
+        self.uplink = uplink or LinkProfile()
+        self.downlink = downlink or LinkProfile()
+        self.rng = random.Random(seed)
+        self._sessions = set()
+        self._closed_stats = {"packets_in": 0, "bytes_in": 0, "packets_out": 0, "bytes_out": 0, "retransmits": 0}
+        self.messages = 0
+        self._sessions_created = 0
+        self._shared_next = {}     # (group, filter) -> round-robin counter
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self, timeout=5.0):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="local-broker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Local broker did not start")
+        return self
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await self._stop.wait()
+        for session in list(self._sessions):
+            session.writer.close()
+
+    async def _accept(self, reader, writer):
+        session = _Session(self, reader, writer)
+        self._sessions.add(session)
+        await session.run()
+
+    def next_session_index(self):
+        self._sessions_created += 1
+        return self._sessions_created
+
+    def remove(self, session):
+        if session in self._sessions:
+            self._sessions.discard(session)
+            self._add_stats(self._closed_stats, session)
+
+    @staticmethod
+    def _add_stats(stats, session):
+        stats["packets_in"] += session.uplink.packets
+        stats["bytes_in"] += session.uplink.bytes
+        stats["packets_out"] += session.downlink.packets
+        stats["bytes_out"] += session.downlink.bytes
+        stats["retransmits"] += session.uplink.retransmits + session.downlink.retransmits
+
+    def route(self, topic, payload, qos):
+        self.messages += 1
+        topic_name = bytes(topic).decode()
+        shared = {}
+        for session in list(self._sessions):
+            granted = session.match(topic_name)
+            if granted is not None:
+                session.publish(topic, payload, min(qos, granted))
+            for key, granted in session.shared_matches(topic_name):
+                shared.setdefault(key, []).append((session.index, session, granted))
+        # shared group은 구독 session 중 1개에만 (session 생성 순서 기준 round-robin)
+        for key, members in shared.items():
+            members.sort(key=lambda member: member[0])
+            turn = self._shared_next.get(key, 0)
+            self._shared_next[key] = turn + 1
+            _, session, granted = members[turn % len(members)]
+            session.publish(topic, payload, min(qos, granted))
+
+    def subscription_count(self):
+        return sum(len(s.subscriptions) for s in list(self._sessions))
+
+    def stats(self):
+        stats = dict(self._closed_stats)
+        for session in list(self._sessions):
+            self._add_stats(stats, session)
+        stats["messages"] = self.messages
+        return stats
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="local MQTT broker with network emulation")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--latency', type=float, default=0.0, help='one-way delay per hop (ms)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='uniform jitter (+/- ms)')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='per-hop bandwidth in Mbit/s (0 = unlimited)')
+    parser.add_argument('--loss', type=float, default=0.0, help='TCP segment loss (%%)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    profile = LinkProfile(args.latency / 1000, args.jitter / 1000, args.bandwidth * 1e6 / 8, args.loss / 100)
+    broker = LocalBroker(args.host, args.port, profile, profile, args.seed).start()
+    print(f"Local broker on {args.host}:{broker.port} ({profile.describe()}). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broker.stop()
+        print(broker.stats())
@@ -0,0 +1,215 @@
+# publisher / subscriber 시계 차이 추정 (NTP 방식 request / response, MQTT control topic 사용).
+# subscriber 시계가 기준: subscriber는 <topic>/clock/req 에 응답만 하고, publisher가 offset / drift를 추정하여
+# pub log의 publish_time 을 subscriber 시계로 보정한 값(publish_time_corrected)과 오차 범위를 기록한다.
+#   t1: request 송신 (pub)  t2: request 수신 (sub)  t3: response 송신 (sub)  t4: response 수신 (pub)
+#   offset = ((t2 - t1) + (t3 - t4)) / 2  (sub 시계 - pub 시계),  delay = (t4 - t1) - (t3 - t2)
+import json
+import threading
+import time
+import uuid
+from collections import deque
+import paho.mqtt.client as mqtt
+
+# 짧은 구간의 drift는 jitter가 지배하므로 sample 시간 범위가 이 값 이상일 때만 추정, NTP와 같이 ±500ppm 으로 제한
+MIN_DRIFT_SPAN = 60.0
+MAX_DRIFT = 500e-6
+
+
+def parse_message(payload, numbers, strings=()):
+    """clock request / response JSON -> dict. 형식이 틀리면 None (잘못된 message 하나로 paho loop가 죽지 않도록)"""
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(message, dict):
+        return None
+    for key in numbers:
+        value = message.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+    for key in strings:
+        value = message.get(key)
+        # topic level에 들어가므로 wildcard / 구분자 불가
+        if not isinstance(value, str) or not value or any(c in value for c in "/+#"):
+            return None
+    return message
+
+
+def request_topic(topic):
+    return f"{topic}/clock/req"
+
+
+def reply_topic(topic, client_id):
+    return f"{topic}/clock/resp/{client_id}"
+
+
+class ClockEstimator:
+    """sample 창에서 offset / drift 추정.
+
+    network 지연이 작은 sample일수록 offset 오차(delay / 2 이내)가 작으므로, 지연이 작은 절반만 사용해
+    offset(t) = offset + drift * (t - ref_time) 를 최소 제곱으로 맞춘다
+    (sample이 3개 미만이거나 시간 범위가 MIN_DRIFT_SPAN 미만이면 drift 0).
+    error = 사용한 sample의 최소 delay / 2 + fit 잔차 표준편차.
+    """
+
+    def __init__(self, window=32):
+        self.samples = deque(maxlen=window)     # (local time, offset, delay)
+        self.offset = None
+        self.drift = 0.0
+        self.error = None
+        self.ref_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, t1, t2, t3, t4):
+        offset = ((t2 - t1) + (t3 - t4)) / 2
+        delay = max(0.0, (t4 - t1) - (t3 - t2))
+        with self._lock:
+            self.samples.append(((t1 + t4) / 2, offset, delay))
+            self._fit()
+        return offset, delay
+
+    def _fit(self):
+        best = sorted(self.samples, key=lambda s: s[2])[:max(3, len(self.samples) // 2)]
+        times = [s[0] for s in best]
+        offsets = [s[1] for s in best]
+        self.ref_time = sum(times) / len(times)
+        mean_offset = sum(offsets) / len(offsets)
+        spread = sum((t - self.ref_time) ** 2 for t in times)
+        self.drift = 0.0
+        if len(best) >= 3 and max(times) - min(times) >= MIN_DRIFT_SPAN:
+            drift = sum((t - self.ref_time) * (o - mean_offset) for t, o in zip(times, offsets)) / spread
+            self.drift = max(-MAX_DRIFT, min(MAX_DRIFT, drift))
+        self.offset = mean_offset
+        residuals = [o - (mean_offset + self.drift * (t - self.ref_time)) for t, o in zip(times, offsets)]
+        residual_std = (sum(r * r for r in residuals) / len(residuals)) ** 0.5
+        self.error = min(s[2] for s in best) / 2 + residual_std
+
+    def estimate(self, local_time):
+        """local_time(pub 시계)에서의 (offset, error). sample이 없으면 (None, None)"""
+        with self._lock:
+            if self.offset is None:
+                return None, None
+            return self.offset + self.drift * (local_time - self.ref_time), self.error
+
+
+class ClockResponder:
+    """subscriber 측 응답기. 기존 MQTT client에 request topic callback으로 등록"""
+
+    def __init__(self, client, topic):
+        self.client = client
+        self.topic = topic
+        self.requests = 0
+        client.message_callback_add(request_topic(topic), self.on_request)
+
+    def subscribe(self):
+        # on_connect에서 호출 (재접속 시에도 다시 구독)
+        self.client.subscribe(request_topic(self.topic))
+
+    def on_request(self, client, userdata, msg):
+        t2 = time.time()
+        request = parse_message(msg.payload, ("id", "t1"), ("client",))
+        if request is None:
+            return
+        self.requests += 1
+        reply = {"id": request["id"], "t1": request["t1"], "t2": t2}
+        reply["t3"] = time.time()
+        client.publish(reply_topic(self.topic, request["client"]), json.dumps(reply))
+
+
+class ClockSync:
+    """publisher 측 추정기. 별도 MQTT 연결 + loop thread 에서 interval 초마다 request 전송
+    (sweep mode의 publisher client는 network loop를 돌리지 않으므로 응답을 받을 수 없음)"""
+
+    def __init__(self, broker, port, topic, interval=2.0, window=32, burst=8):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.interval = interval
+        self.burst = burst              # 시작 직후 빠르게 보낼 request 수
+        self.estimator = ClockEstimator(window)
+        self.client_id = uuid.uuid4().hex[:12]
+        self._client = mqtt.Client()
+        self._client.on_connect = self._on_connect
+        self._client.message_callback_add(reply_topic(topic, self.client_id), self._on_reply)
+        self._pending = {}              # request id -> t1 (loop thread / sender thread 공유)
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._stop = threading.Event()
+        self._first = threading.Event()
+        self._thread = None
+
+    def _on_connect(self, client, userdata, flags, rc):
+        client.subscribe(reply_topic(self.topic, self.client_id))
+
+    def _on_reply(self, client, userdata, msg):
+        t4 = time.time()
+        reply = parse_message(msg.payload, ("id", "t1", "t2", "t3"))
+        if reply is None:
+            return
+        with self._pending_lock:
+            if self._pending.pop(reply["id"], None) is None:
+                return
+        self.estimator.add(reply["t1"], reply["t2"], reply["t3"], t4)
+        self._first.set()
+
+    def _send(self):
+        self._next_id += 1
+        t1 = time.time()
+        with self._pending_lock:
+            self._pending[self._next_id] = t1
+            # 응답이 오지 않은 오래된 request 정리
+            for request_id in [i for i, t in self._pending.items() if t1 - t > 10 * self.interval]:
+                del self._pending[request_id]
+        self._client.publish(request_topic(self.topic),
+                             json.dumps({"id": self._next_id, "t1": t1, "client": self.client_id}))
+
+    def _run(self):
+        sent = 0
+        while not self._stop.is_set():
+            self._send()
+            sent += 1
+            self._stop.wait(self.interval / 10 if sent < self.burst else self.interval)
+
+    def start(self, wait=2.0):
+        """연결 후 request 전송 시작. 첫 응답을 최대 wait 초 기다림 (응답이 없어도 계속 진행)"""
+        self._client.connect(self.broker, self.port, 60)
+        self._client.loop_start()
+        self._thread = threading.Thread(target=self._run, name="clock-sync", daemon=True)
+        self._thread.start()
+        if not self._first.wait(wait):
+            print("[WARN] No clock sync response yet (subscriber not running or old version)")
+        return self
+
+    def estimate(self, local_time=None):
+        return self.estimator.estimate(time.time() if local_time is None else local_time)
+
+    def annotate(self, record, keys):
+        """record에 offset / 오차 / drift 와 keys 시각의 subscriber 시계 보정값(<key>_corrected) 추가"""
+        reference = next((record[k] for k in keys if record.get(k) is not None), None)
+        offset, error = self.estimate(reference)
+        if offset is None:
+            return record
+        record["clock_offset"] = offset
+        record["clock_offset_error"] = error
+        record["clock_drift"] = self.estimator.drift
+        for k in keys:
+            if record.get(k) is not None:
+                record[f"{k}_corrected"] = record[k] + offset
+        return record
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._client.loop_stop()
+        self._client.disconnect()
+
+
+def annotate_reference(record, keys):
+    """기준 시계(subscriber) 측 record: offset 0, 보정값 = 원래 시각"""
+    record["clock_offset"] = 0.0
+    record["clock_offset_error"] = 0.0
+    for k in keys:
+        if record.get(k) is not None:
+            record[f"{k}_corrected"] = record[k]
+    return record
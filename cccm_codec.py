@@ -0,0 +1,448 @@
+# publisher / subscriber 공용 압축·암호화 codec (key, cipher context, registry)
+import time
+import os
+import threading
+import zlib
+import gzip
+import bz2
+import lzma
+import lz4.frame
+import snappy
+import zstandard
+import brotli
+import numpy as np
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from speck import SpeckCipher
+import ascon
+from cccm_sinario import combinations_with_id
+from cccm_config import load_config
+
+AES_KEY = b'\x01' * 16
+CHACHA_KEY = b'\x02' * 32
+SPECK_KEY = 0x123456789ABCDEF00FEDCBA987654321
+ASCON_KEY = b'\x03' * 16
+ASCON_NONCE = b'\x04' * 16
+NONCE_SIZE = 12
+
+config = load_config()
+
+ZSTD_LEVEL = config.getint('COMPRESS', 'zstd_level', fallback=3)
+BROTLI_QUALITY = config.getint('COMPRESS', 'brotli_quality', fallback=5)
+# 학습된 zstd dictionary 파일 (pub/sub 양쪽에 동일하게 배포). 첫번째 파일이 publisher가 사용하는 dictionary,
+# subscriber는 목록의 모든 dictionary를 dict id로 색인해 두고 frame header의 dict id로 선택
+ZSTD_DICT_FILES = [p.strip() for p in config.get('COMPRESS', 'zstd_dict', fallback='').split(',') if p.strip()]
+
+# codec별 context 생성(setup) 시간 - 메시지당 비용(per-byte)과 분리해서 비교하기 위해 기록
+setup_times = {}
+
+
+def _timed_setup(name, factory):
+    start = time.perf_counter()
+    ctx = factory()
+    setup_times[name] = time.perf_counter() - start
+    return ctx
+
+
+# 메시지마다 새로 만들지 않고 재사용하는 context
+AESGCM_CTX = _timed_setup("AES-GCM", lambda: AESGCM(AES_KEY))
+CHACHA_CTX = _timed_setup("ChaCha20-Poly1305", lambda: ChaCha20Poly1305(CHACHA_KEY))
+SPECK_cipher = _timed_setup("Speck", lambda: SpeckCipher(SPECK_KEY, key_size=128, block_size=128))
+SPECK_block_size = SPECK_cipher.block_size // 8
+SPECK_ROUND_KEYS = np.array(SPECK_cipher.key_schedule, dtype=np.uint64)
+SPECK_DECRYPT_KEYS = SPECK_ROUND_KEYS[::-1].copy()
+setup_times["none"] = 0.0
+setup_times["ASCON"] = 0.0  # pyascon은 context 없음
+
+zstd_dictionaries = {}      # dict id -> ZstdCompressionDict
+zstd_active_dict = None     # publisher가 "zstd-dict" 압축에 사용하는 dictionary
+
+
+def load_zstd_dictionary(path, active=False):
+    """dictionary 파일을 읽어 dict id로 등록. active이면 압축에도 사용"""
+    global zstd_active_dict
+    with open(path, "rb") as f:
+        zdict = zstandard.ZstdCompressionDict(f.read())
+    zstd_dictionaries[zdict.dict_id()] = zdict
+    if active:
+        zstd_active_dict = zdict
+    return zdict.dict_id()
+
+
+def zstd_dict_loaded():
+    """publisher의 zstd-dict 압축에 쓸 dictionary가 있는지 (없으면 zstd-dict는 일반 zstd와 같음)"""
+    return zstd_active_dict is not None
+
+
+def train_zstd_dictionary(samples, out_file, dict_size=16384):
+    """수집한 payload sample(bytes list)로 dictionary 학습 후 저장. dict id 반환"""
+    zdict = zstandard.train_dictionary(dict_size, samples)
+    with open(out_file, "wb") as f:
+        f.write(zdict.as_bytes())
+    return zdict.dict_id()
+
+
+for _i, _path in enumerate(ZSTD_DICT_FILES):
+    load_zstd_dictionary(_path, active=_i == 0)
+
+# ZstdCompressor / ZstdDecompressor는 thread-safe 하지 않으므로 thread별로 (level, dict id) 단위 재사용
+_zstd_local = threading.local()
+
+
+def _zstd_context(kind, level, dict_id, factory):
+    cache = getattr(_zstd_local, "contexts", None)
+    if cache is None:
+        cache = _zstd_local.contexts = {}
+    key = (kind, level, dict_id)
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = cache[key] = factory()
+    return ctx
+
+
+def zstd_dict_id(data):
+    """zstd frame header의 dictionary id (dictionary 미사용이면 0)"""
+    return zstandard.get_frame_parameters(data).dict_id
+
+
+def zstd_decompressor_for(data):
+    """frame header의 dict id에 맞는 dictionary로 ZstdDecompressor 생성/재사용"""
+    dict_id = zstd_dict_id(data)
+    if dict_id and dict_id not in zstd_dictionaries:
+        raise ValueError(f"Unknown zstd dictionary id: {dict_id}")
+    zdict = zstd_dictionaries.get(dict_id)
+    return _zstd_context("d", None, dict_id, lambda: zstandard.ZstdDecompressor(dict_data=zdict))
+
+
+def compress_zstd(data, level=None):
+    level = ZSTD_LEVEL if level is None else level
+    return _zstd_context("c", level, 0, lambda: zstandard.ZstdCompressor(level=level)).compress(data)
+
+
+def compress_zstd_dict(data, level=None):
+    # dictionary가 없으면 일반 zstd와 동일 (frame의 dict id = 0)
+    zdict = zstd_active_dict
+    if zdict is None:
+        return compress_zstd(data, level)
+    level = ZSTD_LEVEL if level is None else level
+    return _zstd_context("c", level, zdict.dict_id(),
+                         lambda: zstandard.ZstdCompressor(level=level, dict_data=zdict)).compress(data)
+
+
+def decompress_zstd(data):
+    return zstd_decompressor_for(data).decompress(data)
+
+
+compression_methods = {
+    "none": lambda data: data,
+    "zlib": lambda data: zlib.compress(data),
+    "gzip": lambda data: gzip.compress(data),
+    "bz2": lambda data: bz2.compress(data),
+    "lzma": lambda data: lzma.compress(data),
+    "lz4": lambda data: lz4.frame.compress(data),
+    "snappy": lambda data: snappy.compress(data),
+    "zstd": compress_zstd,
+    "zstd-dict": compress_zstd_dict,
+    "brotli": lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+}
+
+# level=None 일 때 실제 적용되는 level (library 기본값 / ccms.ini) - log의 compress_level 기록용
+DEFAULT_LEVELS = {
+    "zlib": 6, "gzip": 9, "bz2": 9, "lzma": 6, "lz4": 0,
+    "zstd": ZSTD_LEVEL, "zstd-dict": ZSTD_LEVEL, "brotli": BROTLI_QUALITY,
+}
+
+# level -> compress callable
+level_compressors = {
+    "zlib": lambda level: lambda data: zlib.compress(data, level),
+    "gzip": lambda level: lambda data: gzip.compress(data, compresslevel=level),
+    "bz2": lambda level: lambda data: bz2.compress(data, level),
+    "lzma": lambda level: lambda data: lzma.compress(data, preset=level),
+    "lz4": lambda level: lambda data: lz4.frame.compress(data, compression_level=level),
+    "zstd": lambda level: lambda data: compress_zstd(data, level),
+    "zstd-dict": lambda level: lambda data: compress_zstd_dict(data, level),
+    "brotli": lambda level: lambda data: brotli.compress(data, quality=level),
+}
+_leveled = {}
+
+
+def get_compressor(comp_method, level=None):
+    """level 지정 압축 callable (level None 또는 level 없는 method는 기본 compression_methods)"""
+    if level is None or comp_method not in level_compressors:
+        return compression_methods[comp_method]
+    compress = _leveled.get((comp_method, level))
+    if compress is None:
+        compress = _leveled[(comp_method, level)] = level_compressors[comp_method](level)
+    return compress
+
+
+def effective_level(comp_method, level=None):
+    return DEFAULT_LEVELS.get(comp_method) if level is None else level
+
+
+decompression_methods = {
+    "none": lambda data: data,
+    "zlib": lambda data: zlib.decompress(data),
+    "gzip": lambda data: gzip.decompress(data),
+    "bz2": lambda data: bz2.decompress(data),
+    "lzma": lambda data: lzma.decompress(data),
+    "lz4": lambda data: lz4.frame.decompress(data),
+    "snappy": lambda data: snappy.uncompress(data),
+    "zstd": decompress_zstd,
+    "zstd-dict": decompress_zstd,
+    "brotli": lambda data: brotli.decompress(data)
+}
+
+
+# 암호화 결과 크기를 미리 알 수 있으므로 호출 측이 frame buffer 안에 자리를 잡아 두고 *_into 로 바로 기록한다.
+# *_into(data, out): out은 encrypted_size() 크기의 쓰기 가능한 memoryview, data는 bytes / memoryview 모두 가능
+AEAD_TAG_SIZE = 16
+ASCON_TAG_SIZE = 16
+
+
+def encrypted_size(enc_method, size):
+    """평문 size byte의 암호문 크기 (nonce / tag / padding 포함)"""
+    if enc_method in ("AES-GCM", "ChaCha20-Poly1305"):
+        return NONCE_SIZE + size + AEAD_TAG_SIZE
+    if enc_method == "Speck":
+        return (size // SPECK_block_size + 1) * SPECK_block_size
+    if enc_method == "ASCON":
+        return size + ASCON_TAG_SIZE
+    return size
+
+
+def _aead_encrypt_into(ctx, data, out, aad=None):
+    """nonce를 out 앞에 쓰고 그 뒤에 ciphertext + tag를 바로 기록 (nonce + ct 연결 복사 없음)"""
+    nonce = os.urandom(NONCE_SIZE)
+    out[:NONCE_SIZE] = nonce
+    ctx.encrypt_into(nonce, data, aad, out[NONCE_SIZE:])
+
+
+def encrypt_none_into(data, out):
+    out[:] = data
+
+
+def encrypt_aes_gcm_into(data, out):
+    _aead_encrypt_into(AESGCM_CTX, data, out)
+
+
+def encrypt_chacha20_into(data, out):
+    _aead_encrypt_into(CHACHA_CTX, data, out)
+
+
+def encrypt_none(data):
+    return data
+
+
+def decrypt_none(data):
+    return data
+
+
+def _new_buffer(enc_method, data):
+    out = bytearray(encrypted_size(enc_method, len(data)))
+    return out, memoryview(out)
+
+
+def encrypt_aes_gcm(data):
+    out, view = _new_buffer("AES-GCM", data)
+    encrypt_aes_gcm_into(data, view)
+    return out
+
+
+def decrypt_aes_gcm(data):
+    # bytes slice는 복사이므로 memoryview로 nonce / ciphertext를 나눔
+    data = memoryview(data)
+    return AESGCM_CTX.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], None)
+
+
+def encrypt_chacha20(data):
+    out, view = _new_buffer("ChaCha20-Poly1305", data)
+    encrypt_chacha20_into(data, view)
+    return out
+
+
+def decrypt_chacha20(data):
+    data = memoryview(data)
+    return CHACHA_CTX.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], None)
+
+
+# Speck128/128 (alpha=8, beta=3) - 모든 block을 NumPy uint64 lane으로 한번에 처리.
+# block 단위 결과는 SpeckCipher.encrypt(int.from_bytes(block, 'big')) 와 동일 (ECB).
+_U64_ALPHA = np.uint64(8)
+_U64_ALPHA_R = np.uint64(64 - 8)
+_U64_BETA = np.uint64(3)
+_U64_BETA_R = np.uint64(64 - 3)
+_SPECK_PAD = b'\x80'
+
+
+def _speck_lanes(data):
+    """bytes -> (upper, lower) uint64 lane (big endian 128-bit block)"""
+    words = np.frombuffer(data, dtype='>u8').astype(np.uint64)
+    return words[0::2].copy(), words[1::2].copy()
+
+
+def _speck_join(x, y):
+    out = np.empty(x.size * 2, dtype='>u8')
+    out[0::2] = x
+    out[1::2] = y
+    return out.tobytes()
+
+
+def _speck_encrypt_lanes(x, y):
+    for k in SPECK_ROUND_KEYS:
+        x = ((x >> _U64_ALPHA) | (x << _U64_ALPHA_R)) + y
+        x ^= k
+        y = ((y << _U64_BETA) | (y >> _U64_BETA_R)) ^ x
+    return x, y
+
+
+def speck_encrypt_blocks(data):
+    """길이가 16의 배수인 data를 ECB로 암호화"""
+    return _speck_join(*_speck_encrypt_lanes(*_speck_lanes(data)))
+
+
+def speck_encrypt_blocks_inplace(buf):
+    """쓰기 가능한 buffer(길이 16의 배수)를 그 자리에서 암호화"""
+    words = np.frombuffer(buf, dtype='>u8')
+    x, y = _speck_encrypt_lanes(words[0::2].astype(np.uint64), words[1::2].astype(np.uint64))
+    words[0::2] = x
+    words[1::2] = y
+
+
+def speck_decrypt_blocks(data):
+    x, y = _speck_lanes(data)
+    for k in SPECK_DECRYPT_KEYS:
+        y ^= x
+        y = (y >> _U64_BETA) | (y << _U64_BETA_R)
+        x = (x ^ k) - y
+        x = (x << _U64_ALPHA) | (x >> _U64_ALPHA_R)
+    return _speck_join(x, y)
+
+
+def encrypt_speck_into(data, out):
+    # ISO/IEC 7816-4 padding (0x80 00..): zero padding + rstrip은 0으로 끝나는 압축 데이터(gzip 등)를 깨뜨림
+    size = len(data)
+    out[:size] = data
+    out[size] = _SPECK_PAD[0]
+    out[size + 1:] = bytes(len(out) - size - 1)
+    speck_encrypt_blocks_inplace(out)
+
+
+def encrypt_speck(data):
+    out, view = _new_buffer("Speck", data)
+    encrypt_speck_into(data, view)
+    return out
+
+
+def decrypt_speck(data):
+    if len(data) == 0 or len(data) % SPECK_block_size:
+        raise ValueError(f"Speck ciphertext length must be a multiple of {SPECK_block_size}")
+    padded = speck_decrypt_blocks(data)
+    end = padded.rindex(_SPECK_PAD, len(padded) - SPECK_block_size)
+    if padded[end + 1:].strip(b'\x00'):
+        raise ValueError("Invalid Speck padding")
+    return memoryview(padded)[:end]
+
+
+def encrypt_ascon(data):
+    # pyascon은 bytes 연산만 지원 (binary frame / corpus slice는 memoryview)
+    return ascon.encrypt(ASCON_KEY, ASCON_NONCE, b"", bytes(data))
+
+
+def encrypt_ascon_into(data, out):
+    # pyascon은 출력 buffer를 받지 않으므로 결과를 1번 복사
+    out[:] = encrypt_ascon(data)
+
+
+def decrypt_ascon(data):
+    return ascon.decrypt(ASCON_KEY, ASCON_NONCE, b"", bytes(data))
+
+
+# cccm_sinario.combinations_with_id 의 이름을 key로 사용
+encryption_methods = {
+    "none": encrypt_none,
+    "AES-GCM": encrypt_aes_gcm,
+    "ChaCha20-Poly1305": encrypt_chacha20,
+    "Speck": encrypt_speck,
+    "ASCON": encrypt_ascon
+}
+
+# enc_method -> *_into(data, out). out 크기는 encrypted_size(enc_method, len(data))
+encryption_into_methods = {
+    "none": encrypt_none_into,
+    "AES-GCM": encrypt_aes_gcm_into,
+    "ChaCha20-Poly1305": encrypt_chacha20_into,
+    "Speck": encrypt_speck_into,
+    "ASCON": encrypt_ascon_into
+}
+
+decryption_methods = {
+    "none": decrypt_none,
+    "AES-GCM": decrypt_aes_gcm,
+    "ChaCha20-Poly1305": decrypt_chacha20,
+    "Speck": decrypt_speck,
+    "ASCON": decrypt_ascon
+}
+
+
+def get_codec(comp_method, enc_method):
+    """combo 이름 -> (compress, encrypt, decrypt, decompress) callable"""
+    return (compression_methods[comp_method], encryption_methods[enc_method],
+            decryption_methods[enc_method], decompression_methods[comp_method])
+
+
+# combo id -> get_codec() 결과를 미리 만들어 두어 message마다 dict 1번으로 dispatch
+codecs_by_id = {id_value: get_codec(comp_method, enc_method)
+                for id_value, comp_method, enc_method, _ in combinations_with_id}
+
+
+def benchmark(sizes=(64, 1024, 16384, 65536), repeat=20):
+    """codec별 setup 시간과 per-byte 비용(가장 큰 size 기준 ns/byte) 측정"""
+    results = {}
+    for name, encrypt in encryption_methods.items():
+        decrypt = decryption_methods[name]
+        per_size = {}
+        for size in sizes:
+            data = os.urandom(size)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                decrypt(encrypt(data))
+            per_size[size] = (time.perf_counter() - start) / repeat
+        # 작은 size와 큰 size의 차이로 고정 비용을 제거한 per-byte 비용 계산
+        small, large = sizes[0], sizes[-1]
+        per_byte = (per_size[large] - per_size[small]) / (large - small)
+        results[name] = {
+            "setup_time": setup_times.get(name, 0.0),
+            "per_message_time": per_size,
+            "ns_per_byte": per_byte * 1e9,
+        }
+    return results
+
+
+def read_samples(paths):
+    """directory는 파일 1개를 sample 1개로, 파일은 줄 1개를 sample 1개로 읽음"""
+    samples = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                with open(os.path.join(path, name), "rb") as f:
+                    samples.append(f.read())
+        else:
+            with open(path, "rb") as f:
+                samples.extend(line.rstrip(b"\r\n") for line in f if line.strip())
+    return samples
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="codec benchmark / zstd dictionary training")
+    parser.add_argument('--train-zstd-dict', metavar='OUT', help='train a zstd dictionary and save it to OUT')
+    parser.add_argument('--samples', nargs='+', default=[], help='captured payload files or directories')
+    parser.add_argument('--dict-size', type=int, default=16384, help='dictionary size in bytes')
+    args = parser.parse_args()
+    if args.train_zstd_dict:
+        samples = read_samples(args.samples)
+        dict_id = train_zstd_dictionary(samples, args.train_zstd_dict, args.dict_size)
+        print(f"Trained zstd dictionary {dict_id} from {len(samples)} samples -> {args.train_zstd_dict}")
+    else:
+        for name, r in benchmark().items():
+            print(f"{name:>18}: setup={r['setup_time'] * 1e6:9.2f} us, {r['ns_per_byte']:10.2f} ns/byte")
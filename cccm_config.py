@@ -0,0 +1,14 @@
+# 설정 파일 공용 loader - 모든 module이 같은 ini를 읽는다.
+# CCMS_INI 환경변수로 다른 설정 파일 지정 (cccm_bench / cccms_launch 의 run / worker별 ini)
+import configparser
+import os
+
+CONFIG_ENV = "CCMS_INI"
+DEFAULT_CONFIG = "ccms.ini"
+
+
+def load_config(path=None):
+    """path (없으면 CCMS_INI, 기본 ccms.ini) 를 읽은 ConfigParser"""
+    config = configparser.ConfigParser()
+    config.read(path or os.environ.get(CONFIG_ENV, DEFAULT_CONFIG))
+    return config
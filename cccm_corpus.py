@@ -0,0 +1,237 @@
+# payload corpus - 미리 생성한 corpus 파일을 mmap으로 열어 요청 size만큼 zero-copy slice로 제공
+import json
+import mmap
+import os
+import struct
+import threading
+import numpy as np
+
+ALNUM = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)
+WRITE_BLOCK = 1 << 20
+
+# binary telemetry record: timestamp(ms), device, seq, temp, hum, pressure, battery, accel x/y/z, status
+TELEMETRY_RECORD = struct.Struct(">QHIfffHhhhB")
+
+LOG_TEMPLATES = [
+    "{ts} INFO  gateway[{pid}]: device {dev} connected from 10.0.{a}.{b}",
+    "{ts} INFO  gateway[{pid}]: published {n} bytes to sensors/{dev}/telemetry qos=1",
+    "{ts} WARN  gateway[{pid}]: device {dev} rssi={rssi}dBm below threshold",
+    "{ts} DEBUG collector[{pid}]: batch flushed size={n} elapsed={ms}ms",
+    "{ts} ERROR collector[{pid}]: write timeout for device {dev}, retry {r}/3",
+]
+
+
+def _alnum(rng, size):
+    """기존 publisher와 같은 문자 분포 (영문 대소문자 + 숫자)"""
+    remaining = size
+    while remaining > 0:
+        n = min(WRITE_BLOCK, remaining)
+        yield ALNUM[rng.integers(0, len(ALNUM), n)].tobytes()
+        remaining -= n
+
+
+def _random(rng, size):
+    remaining = size
+    while remaining > 0:
+        n = min(WRITE_BLOCK, remaining)
+        yield rng.bytes(n)
+        remaining -= n
+
+
+def _sensor_json(rng, size):
+    """device별 random walk 센서 값을 JSON lines로"""
+    devices = [f"sensor-{i:04d}" for i in range(64)]
+    state = {d: [20.0, 45.0, 1013.0, 100.0] for d in devices}
+    ts = 1_700_000_000_000
+    written = 0
+    while written < size:
+        lines = []
+        for _ in range(1000):
+            device = devices[rng.integers(len(devices))]
+            temp, hum, pressure, battery = state[device]
+            temp += rng.normal(0, 0.1)
+            hum = min(100.0, max(0.0, hum + rng.normal(0, 0.3)))
+            pressure += rng.normal(0, 0.05)
+            battery = max(0.0, battery - rng.random() * 0.01)
+            state[device] = [temp, hum, pressure, battery]
+            ts += int(rng.integers(50, 1000))
+            lines.append(json.dumps({
+                "device_id": device, "ts": ts, "temp": round(temp, 2), "hum": round(hum, 1),
+                "pressure": round(pressure, 2), "battery": round(battery, 1),
+                "status": "ok" if battery > 20 else "low_battery",
+            }, separators=(",", ":")))
+        block = ("\n".join(lines) + "\n").encode()
+        written += len(block)
+        yield block
+
+
+def _telemetry_bin(rng, size):
+    """고정 layout binary record (TELEMETRY_RECORD) 연속"""
+    ts = 1_700_000_000_000
+    seq = 0
+    temp, hum, pressure = 20.0, 45.0, 1013.0
+    written = 0
+    while written < size:
+        records = []
+        for _ in range(4096):
+            temp += rng.normal(0, 0.1)
+            hum += rng.normal(0, 0.3)
+            pressure += rng.normal(0, 0.05)
+            ts += int(rng.integers(50, 1000))
+            seq += 1
+            accel = rng.integers(-512, 512, 3)
+            records.append(TELEMETRY_RECORD.pack(ts, int(rng.integers(64)), seq, temp, hum, pressure,
+                                                 int(rng.integers(3000, 4200)), *(int(v) for v in accel),
+                                                 int(rng.random() < 0.01)))
+        block = b"".join(records)
+        written += len(block)
+        yield block
+
+
+def _text_log(rng, size):
+    ts = 1_700_000_000
+    written = 0
+    while written < size:
+        lines = []
+        for _ in range(1000):
+            ts += int(rng.integers(0, 3))
+            template = LOG_TEMPLATES[rng.integers(len(LOG_TEMPLATES))]
+            lines.append(template.format(
+                ts=f"2024-01-01T{ts // 3600 % 24:02d}:{ts // 60 % 60:02d}:{ts % 60:02d}Z",
+                pid=int(rng.integers(100, 120)), dev=f"sensor-{int(rng.integers(64)):04d}",
+                a=int(rng.integers(256)), b=int(rng.integers(256)), n=int(rng.integers(16, 65536)),
+                rssi=-int(rng.integers(70, 100)), ms=int(rng.integers(1, 500)), r=int(rng.integers(1, 4))))
+        block = ("\n".join(lines) + "\n").encode()
+        written += len(block)
+        yield block
+
+
+def _jpeg(rng, size):
+    """합성 image (gradient + 움직이는 물체 + noise)를 JPEG frame으로 연속 저장 - Pillow 필요"""
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError("Pillow is required for the jpeg corpus") from e
+    import io
+    height, width = 240, 320
+    y, x = np.mgrid[0:height, 0:width]
+    written = 0
+    frame = 0
+    while written < size:
+        cx, cy = (frame * 7) % width, (frame * 3) % height
+        image = np.empty((height, width, 3), dtype=np.float32)
+        image[..., 0] = x / width * 255
+        image[..., 1] = y / height * 255
+        image[..., 2] = 128 + 100 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / 800.0)
+        image += rng.normal(0, 6, image.shape)
+        out = io.BytesIO()
+        Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(out, format="JPEG", quality=80)
+        written += out.tell()
+        frame += 1
+        yield out.getvalue()
+
+
+# kind -> generator(rng, size) : size byte 이상을 block 단위로 생성
+corpus_generators = {
+    "alnum": _alnum,
+    "random": _random,
+    "sensor_json": _sensor_json,
+    "telemetry_bin": _telemetry_bin,
+    "text_log": _text_log,
+    "jpeg": _jpeg,
+}
+
+
+def build_corpus(kind, path, size, seed=0):
+    """corpus 파일 생성 (정확히 size byte). 같은 seed면 같은 내용"""
+    if kind not in corpus_generators:
+        raise ValueError(f"Unsupported corpus kind: {kind} (use one of {list(corpus_generators)})")
+    rng = np.random.default_rng(seed)
+    tmp_path = path + ".tmp"
+    remaining = size
+    with open(tmp_path, "wb") as f:
+        for block in corpus_generators[kind](rng, size):
+            f.write(block[:remaining])
+            remaining -= min(len(block), remaining)
+            if remaining == 0:
+                break
+    os.replace(tmp_path, path)
+    return path
+
+
+class Corpus:
+    """corpus 파일을 mmap으로 열고 slice(size)로 memoryview를 반환 (복사 없음).
+
+    slice 시작 위치는 호출마다 size만큼 이동 (파일 끝에서 처음으로) 하여 연속 payload의 내용이 겹치지 않게 한다.
+    size가 corpus보다 크면 corpus를 반복한 bytes를 만든다 (이 경우만 복사 발생).
+    """
+
+    def __init__(self, path, kind=None):
+        self.path = path
+        self.kind = kind or os.path.splitext(os.path.basename(path))[0]
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._view)
+
+    def next_offset(self, size):
+        """다음 slice 시작 위치를 예약 (다른 process에서 slice할 때 main에서 미리 할당)"""
+        if size > len(self._view):
+            return None
+        with self._lock:
+            offset = self._offset
+            if offset + size > len(self._view):
+                offset = 0
+            self._offset = offset + size
+            return offset
+
+    def slice(self, size, offset=None):
+        if size > len(self._view):
+            repeat, rest = divmod(size, len(self._view))
+            return bytes(self._view) * repeat + bytes(self._view[:rest])
+        if offset is None:
+            offset = self.next_offset(size)
+        return self._view[offset:offset + size]
+
+    def blocks(self, size, block_size):
+        """size byte를 block_size 단위 memoryview로 (stream mode 용)"""
+        data = self.slice(size)
+        view = memoryview(data)
+        for start in range(0, size, block_size):
+            yield view[start:start + block_size]
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+def open_corpus(kind, directory="corpus", size=1 << 25, path=None, seed=0):
+    """kind별 corpus 파일(<directory>/<kind>.bin)을 열고, 없거나 size보다 작으면 먼저 생성.
+    path를 지정하면 (실제 수집 data 등) 그 파일을 그대로 사용"""
+    if path:
+        return Corpus(path, kind)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}.bin")
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        print(f"Building {kind} corpus ({size} bytes) -> {path}")
+        build_corpus(kind, path, size, seed)
+    return Corpus(path, kind)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="build payload corpora")
+    parser.add_argument('--kind', nargs='+', default=list(corpus_generators), help='corpus kinds to build')
+    parser.add_argument('--dir', default='corpus', help='output directory')
+    parser.add_argument('--size', type=int, default=1 << 25, help='corpus size in bytes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.dir, exist_ok=True)
+    for kind in args.kind:
+        path = build_corpus(kind, os.path.join(args.dir, f"{kind}.bin"), args.size, args.seed)
+        print(f"{kind}: {path} ({os.path.getsize(path)} bytes)")
@@ -0,0 +1,201 @@
+# pub/sub 메시지 포맷 (legacy JSON + base64 / binary frame)
+import base64
+import json
+import re
+import struct
+from cccm_integrity import INTEGRITY_SHA256, INTEGRITY_NONE, INTEGRITY_IDS, INTEGRITY_BY_ID, DIGEST_SIZES
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+PAYLOAD_FORMATS = (FORMAT_JSON, FORMAT_BINARY)
+
+# binary frame header (big endian)
+#   v1: magic(2) | version(1) | flags(1) | combo id(2) | sequence(4) | sha256 digest(32) | ciphertext ...
+#   v2: magic(2) | version(1) | flags(1) | combo id(2) | sequence(4) | integrity mode(1) | digest 길이(1) | digest | ...
+#   sha256 (또는 hash 없음)은 기존 subscriber와 호환되도록 v1, 그 외 integrity mode는 v2
+FRAME_MAGIC = b"CM"
+FRAME_VERSION = 1
+FRAME_VERSION_INTEGRITY = 2
+FRAME_PREFIX = struct.Struct(">2sBBHI")       # v1 / v2 공통 앞부분
+FRAME_HEADER = struct.Struct(">2sBBHI32s")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+INTEGRITY_HEADER = struct.Struct(">BB")
+DIGEST_SIZE = 32
+
+FLAG_HASH = 0x01
+FLAG_CHUNK = 0x02   # streaming chunk: header 뒤에 chunk index(4) 추가
+FLAG_LAST = 0x04    # streaming 마지막 chunk
+FLAG_BATCH = 0x08   # batch frame: data는 여러 message를 묶은 batch body (cccm_batch), sequence는 batch 번호
+
+CHUNK_HEADER = struct.Struct(">I")
+
+_EMPTY_DIGEST = b"\x00" * DIGEST_SIZE
+
+# legacy JSON은 metadata가 맨 앞에 오므로 앞부분만 검사
+_JSON_ID_PATTERN = re.compile(rb'"id":\s*(\d+)')
+_JSON_PEEK_SIZE = 64
+
+
+def is_binary_frame(payload):
+    """payload가 binary frame인지 확인 (legacy JSON은 '{'로 시작)"""
+    return payload[:2] == FRAME_MAGIC
+
+
+def is_chunk_frame(payload):
+    return is_binary_frame(payload) and len(payload) > 3 and bool(payload[3] & FLAG_CHUNK)
+
+
+def is_batch_frame(payload):
+    return is_binary_frame(payload) and len(payload) > 3 and bool(payload[3] & FLAG_BATCH)
+
+
+def peek_combo_id(payload):
+    """전체 decode 없이 combo id만 확인 (worker 분배용). 실패 시 None"""
+    if is_binary_frame(payload):
+        if len(payload) < FRAME_PREFIX.size:
+            return None
+        return FRAME_PREFIX.unpack_from(payload)[3]
+    match = _JSON_ID_PATTERN.search(payload[:_JSON_PEEK_SIZE])
+    return int(match.group(1)) if match else None
+
+
+def _is_v1(integrity):
+    return integrity in (None, INTEGRITY_NONE, INTEGRITY_SHA256)
+
+
+def frame_header_size(chunk=False, integrity=None):
+    """integrity mode별 header 크기 (chunk frame은 chunk index 포함)"""
+    if _is_v1(integrity):
+        size = FRAME_HEADER_SIZE
+    else:
+        size = FRAME_PREFIX.size + INTEGRITY_HEADER.size + DIGEST_SIZES[integrity]
+    return size + (CHUNK_HEADER.size if chunk else 0)
+
+
+def new_frame(data_size, chunk=False, integrity=None):
+    """header 자리를 비워 둔 frame buffer -> (bytearray, data 영역 memoryview).
+    data 영역에 암호문을 바로 기록한 뒤 write_frame_header()로 header를 채운다 (header + data 연결 복사 없음)"""
+    header_size = frame_header_size(chunk, integrity)
+    frame = bytearray(header_size + data_size)
+    return frame, memoryview(frame)[header_size:]
+
+
+def write_frame_header(frame, id_value, sequence, digest=None, chunk=None, last=False, integrity=None, batch=False):
+    """new_frame() buffer 앞부분에 header (+ chunk index) 기록. chunk가 있으면 streaming chunk frame, batch면 batch frame.
+    digest는 raw bytes, integrity는 new_frame()에 준 값과 같아야 한다"""
+    flags = 0
+    if chunk is not None:
+        flags |= FLAG_CHUNK
+        if last:
+            flags |= FLAG_LAST
+    if batch:
+        flags |= FLAG_BATCH
+    if digest is not None:
+        flags |= FLAG_HASH
+    if _is_v1(integrity):
+        if digest is not None and len(digest) != DIGEST_SIZE:
+            raise ValueError(f"Digest must be {DIGEST_SIZE} bytes, got {len(digest)}")
+        FRAME_HEADER.pack_into(frame, 0, FRAME_MAGIC, FRAME_VERSION, flags, id_value, sequence,
+                               digest if digest is not None else _EMPTY_DIGEST)
+        offset = FRAME_HEADER_SIZE
+    else:
+        digest = digest or b""
+        if len(digest) != DIGEST_SIZES[integrity]:
+            raise ValueError(f"{integrity} digest must be {DIGEST_SIZES[integrity]} bytes, got {len(digest)}")
+        FRAME_PREFIX.pack_into(frame, 0, FRAME_MAGIC, FRAME_VERSION_INTEGRITY, flags, id_value, sequence)
+        INTEGRITY_HEADER.pack_into(frame, FRAME_PREFIX.size, INTEGRITY_IDS[integrity], len(digest))
+        offset = FRAME_PREFIX.size + INTEGRITY_HEADER.size
+        frame[offset:offset + len(digest)] = digest
+        offset += len(digest)
+    if chunk is not None:
+        CHUNK_HEADER.pack_into(frame, offset, chunk)
+    return frame
+
+
+def pack_frame(id_value, sequence, data, digest=None, chunk=None, last=False, integrity=None):
+    """header + raw ciphertext 를 하나의 bytearray로 생성 (data 1회 복사)"""
+    frame, body = new_frame(len(data), chunk is not None, integrity)
+    body[:] = data
+    return write_frame_header(frame, id_value, sequence, digest, chunk, last, integrity)
+
+
+def unpack_frame(payload):
+    """binary frame -> (meta_set, data). data는 payload의 memoryview (복사 없음), hash는 raw digest bytes"""
+    if len(payload) < FRAME_PREFIX.size:
+        raise ValueError(f"Frame too short: {len(payload)} bytes")
+    magic, version, flags, id_value, sequence = FRAME_PREFIX.unpack_from(payload)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad frame magic: {magic!r}")
+    if version == FRAME_VERSION:
+        if len(payload) < FRAME_HEADER_SIZE:
+            raise ValueError(f"Frame too short: {len(payload)} bytes")
+        digest = FRAME_HEADER.unpack_from(payload)[5]
+        integrity = INTEGRITY_SHA256 if flags & FLAG_HASH else INTEGRITY_NONE
+        offset = FRAME_HEADER_SIZE
+    elif version == FRAME_VERSION_INTEGRITY:
+        offset = FRAME_PREFIX.size + INTEGRITY_HEADER.size
+        if len(payload) < offset:
+            raise ValueError(f"Frame too short: {len(payload)} bytes")
+        mode_id, digest_size = INTEGRITY_HEADER.unpack_from(payload, FRAME_PREFIX.size)
+        if mode_id not in INTEGRITY_BY_ID:
+            raise ValueError(f"Unsupported integrity mode id: {mode_id}")
+        integrity = INTEGRITY_BY_ID[mode_id]
+        if digest_size != DIGEST_SIZES[integrity]:
+            raise ValueError(f"{integrity} digest must be {DIGEST_SIZES[integrity]} bytes, got {digest_size}")
+        if len(payload) < offset + digest_size:
+            raise ValueError(f"Frame too short: {len(payload)} bytes")
+        digest = bytes(payload[offset:offset + digest_size])
+        offset += digest_size
+    else:
+        raise ValueError(f"Unsupported frame version: {version}")
+    meta_set = {
+        "id": id_value,
+        "sequence": sequence,
+        "hash": digest if flags & FLAG_HASH else None,
+        "integrity": integrity,
+    }
+    if flags & FLAG_BATCH:
+        meta_set["batch"] = True
+    if flags & FLAG_CHUNK:
+        if len(payload) < offset + CHUNK_HEADER.size:
+            raise ValueError(f"Frame too short: {len(payload)} bytes")
+        meta_set["chunk"], = CHUNK_HEADER.unpack_from(payload, offset)
+        meta_set["last"] = bool(flags & FLAG_LAST)
+        offset += CHUNK_HEADER.size
+    return meta_set, memoryview(payload)[offset:]
+
+
+def encode_message(id_value, sequence, data, digest=None, payload_format=FORMAT_JSON, integrity=None):
+    """publisher 송신용 payload 생성. digest는 raw bytes 또는 None, integrity는 cccm_integrity mode"""
+    if payload_format == FORMAT_BINARY:
+        return pack_frame(id_value, sequence, data, digest, integrity=integrity)
+    if payload_format != FORMAT_JSON:
+        raise ValueError(f"Unsupported payload format: {payload_format}")
+    # JSON은 text라 digest를 hex로 전송. sha256은 기존 metadata 그대로 (integrity key 생략)
+    meta_set = {
+        "id": id_value,
+        "sequence": sequence,
+        "hash": digest.hex() if digest is not None else None,
+    }
+    if not _is_v1(integrity):
+        meta_set["integrity"] = integrity
+    # json.dumps({"metadata": ..., "data": ...}).encode() 와 같은 bytes.
+    # base64 문자열은 escape가 필요 없으므로 str 변환 / dumps / encode 를 거치지 않고 1번에 연결
+    return b"".join((b'{"metadata": ', json.dumps(meta_set).encode(), b', "data": "',
+                     base64.b64encode(data), b'"}'))
+
+
+def decode_message(payload):
+    """subscriber 수신 payload -> (metadata, data, msize). 포맷은 자동 판별"""
+    if is_binary_frame(payload):
+        metadata, data = unpack_frame(payload)
+        metadata["payload_format"] = FORMAT_BINARY
+        return metadata, data, len(data)
+    parsed = json.loads(payload)
+    metadata = parsed["metadata"]
+    metadata["payload_format"] = FORMAT_JSON
+    # binary frame과 같은 형태로 (raw digest bytes + integrity mode)
+    digest = metadata.get("hash")
+    metadata["hash"] = bytes.fromhex(digest) if digest else None
+    metadata.setdefault("integrity", INTEGRITY_SHA256 if digest else INTEGRITY_NONE)
+    return metadata, base64.b64decode(parsed["data"]), len(parsed["data"])
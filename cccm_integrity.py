@@ -0,0 +1,65 @@
+# hash combo의 무결성 검사 방식 (ciphertext에 대한 digest)
+#   sha256 : 전체 SHA-256 32 byte (기존 방식, 호환용 - v1 frame / 기존 JSON과 같음)
+#   blake2s: keyed BLAKE2s 16 byte (암호화 없는 / 인증 없는 cipher 용 MAC)
+#   hmac   : HMAC-SHA256 앞 16 byte
+#   aead   : 별도 digest 없음 - AEAD cipher의 tag가 이미 ciphertext를 인증하므로 전체 pass 1번을 생략
+#            (AEAD가 아닌 cipher - none / Speck - 는 blake2s 사용)
+import hashlib
+import hmac
+
+INTEGRITY_NONE = "none"      # hash 없는 combo
+INTEGRITY_SHA256 = "sha256"
+INTEGRITY_BLAKE2S = "blake2s"
+INTEGRITY_HMAC = "hmac"
+INTEGRITY_AEAD = "aead"
+INTEGRITY_MODES = (INTEGRITY_SHA256, INTEGRITY_BLAKE2S, INTEGRITY_HMAC, INTEGRITY_AEAD)
+
+MAC_KEY = b'\x05' * 32
+MAC_SIZE = 16
+
+# tag로 ciphertext를 인증하는 cipher (Speck은 ECB라 인증 없음)
+AEAD_CIPHERS = ("AES-GCM", "ChaCha20-Poly1305", "ASCON")
+
+# binary frame(v2) header에 기록하는 mode 번호 / digest 크기
+INTEGRITY_IDS = {INTEGRITY_SHA256: 0, INTEGRITY_BLAKE2S: 1, INTEGRITY_HMAC: 2, INTEGRITY_AEAD: 3}
+INTEGRITY_BY_ID = {v: k for k, v in INTEGRITY_IDS.items()}
+DIGEST_SIZES = {INTEGRITY_SHA256: 32, INTEGRITY_BLAKE2S: MAC_SIZE, INTEGRITY_HMAC: MAC_SIZE, INTEGRITY_AEAD: 0}
+
+
+def resolve_integrity(mode, enc_method):
+    """설정 mode + 암호화 방식 -> 실제 사용할 mode. aead는 AEAD가 아닌 cipher에서 blake2s로 대체"""
+    if mode not in INTEGRITY_MODES:
+        raise ValueError(f"Unsupported integrity mode: {mode} (use one of {INTEGRITY_MODES})")
+    if mode == INTEGRITY_AEAD:
+        return INTEGRITY_AEAD if enc_method in AEAD_CIPHERS else INTEGRITY_BLAKE2S
+    return mode
+
+
+def combo_integrity(mode, enc_method, hash_option):
+    """combo의 digest 방식 (hash 없는 combo는 none). publisher는 이 방식으로 보내고, subscriber는 이 방식만 받는다"""
+    if hash_option == "none":
+        return INTEGRITY_NONE
+    return resolve_integrity(mode, enc_method)
+
+
+def compute_digest(mode, data):
+    """raw digest bytes (aead는 None)"""
+    if mode == INTEGRITY_SHA256:
+        return hashlib.sha256(data).digest()
+    if mode == INTEGRITY_BLAKE2S:
+        return hashlib.blake2s(data, digest_size=MAC_SIZE, key=MAC_KEY).digest()
+    if mode == INTEGRITY_HMAC:
+        return hmac.new(MAC_KEY, data, hashlib.sha256).digest()[:MAC_SIZE]
+    if mode == INTEGRITY_AEAD:
+        return None
+    raise ValueError(f"Unsupported integrity mode: {mode}")
+
+
+def verify_digest(mode, data, digest, enc_method):
+    """수신 digest 검사. aead는 복호화 시 tag 검사로 대신하므로 AEAD cipher일 때만 True
+    (none 은 digest가 없으므로 False - hash combo에서 검사를 건너뛰지 못하게)"""
+    if mode == INTEGRITY_AEAD:
+        return enc_method in AEAD_CIPHERS
+    if mode == INTEGRITY_NONE or digest is None:
+        return False
+    return hmac.compare_digest(compute_digest(mode, data), digest)
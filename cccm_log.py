@@ -0,0 +1,138 @@
+# timing log 공용 sink - background writer thread + buffer, file handle 1개 유지
+import atexit
+import csv
+import json
+import os
+import threading
+from collections import deque
+
+LOG_FORMATS = ("jsonl", "csv")
+
+
+class TimingLogger:
+    """log(record)는 buffer에 넣기만 하고, 실제 write는 writer thread가 묶어서 처리.
+
+    flush_size 개가 쌓이거나 flush_interval 초가 지나면 flush.
+    buffer가 capacity에 도달하면 writer가 비울 때까지 log()가 대기 (record 유실 없음).
+    """
+
+    def __init__(self, path, fmt="jsonl", flush_size=256, flush_interval=1.0, capacity=65536):
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"Unsupported log format: {fmt} (use one of {LOG_FORMATS})")
+        self.path = path
+        self.fmt = fmt
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._csv_fields = self._read_csv_header() if fmt == "csv" else None
+        self._writer = threading.Thread(target=self._run, name=f"timing-logger-{os.path.basename(path)}",
+                                        daemon=True)
+        self._writer.start()
+
+    def _read_csv_header(self):
+        if os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            return next(csv.reader(f), None)
+
+    def log(self, record):
+        with self._cond:
+            if self._closed:
+                raise ValueError(f"Logger for {self.path} is closed")
+            while len(self._buffer) >= self.capacity:
+                self._cond.notify_all()
+                self._cond.wait()
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                break
+
+    def _write(self, batch):
+        if self.fmt == "jsonl":
+            self._file.write("".join(json.dumps(record) + "\n" for record in batch))
+        else:
+            self._write_csv(batch)
+        self._file.flush()
+
+    def _write_csv(self, batch):
+        if self._csv_fields is None:
+            fields = []
+            for record in batch:
+                for k in record:
+                    if k not in fields:
+                        fields.append(k)
+            self._csv_fields = fields + ["extra"]
+            csv.writer(self._file).writerow(self._csv_fields)
+        known = set(self._csv_fields)
+        writer = csv.DictWriter(self._file, fieldnames=self._csv_fields)
+        for record in batch:
+            unknown = {k: v for k, v in record.items() if k not in known}
+            if unknown:
+                record = {k: v for k, v in record.items() if k in known}
+                record["extra"] = json.dumps(unknown)
+            writer.writerow(record)
+
+    def flush(self):
+        """buffer에 남은 record를 즉시 기록 (write_lock으로 record 순서 유지)"""
+        with self._write_lock:
+            with self._cond:
+                batch = list(self._buffer)
+                self._buffer.clear()
+                self._cond.notify_all()
+            if batch:
+                self._write(batch)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._file.close()
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path, fmt="jsonl", flush_size=256, flush_interval=1.0):
+    """path별 logger 1개를 공유 (같은 process 안의 pub/sub/pping)"""
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            logger = _loggers[path] = TimingLogger(path, fmt, flush_size, flush_interval)
+        return logger
+
+
+def get_logger_from_config(config, path=None, fmt=None):
+    """[LOG] 설정(log_file / log_format / flush_size / flush_interval)의 logger. path / fmt로 다른 파일 지정"""
+    return get_logger(path or config["LOG"]["log_file"],
+                      fmt or config.get("LOG", "log_format", fallback="jsonl"),
+                      config.getint("LOG", "flush_size", fallback=256),
+                      config.getfloat("LOG", "flush_interval", fallback=1.0))
+
+
+def close_all():
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+        _loggers.clear()
+    for logger in loggers:
+        logger.close()
+
+
+atexit.register(close_all)
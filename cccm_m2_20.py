@@ -1,58 +1,203 @@
-# txt파일을 읽어 pub/sub 를 id/sequence별 1개 파일오 묶는 작업. 
+# txt파일을 읽어 pub/sub 를 id/sequence별 1개 파일오 묶는 작업.
+# log를 한번만 순차적으로 읽으면서 pair 검증 / 불완전 sequence 제외 / merge / 계산 / csv 기록을 동시에 처리.
+import heapq
 import json
-from collections import defaultdict
-import configparser
+import os
+from collections import deque
 import pandas as pd
 import argparse
 import sys
 
-config = configparser.ConfigParser()
 #LOG_FILE = "cccm_rpc1015.txt"
 INCOMPLETE_LOG_FILE = "incomplete_sequences.json"
 
-def filter_invalid_sequences(file_path, invalid_sequences):
-    all_line = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            all_line.append(line)
-    f.close()  
-
-    filtered_lines = []
-    for line in all_line:
-        try:
-            entry = json.loads(line)
-        except json.JSONDecodeError:
+# pub/sub 공통 key (접미사 없이 저장)
+COMMON_KEYS = ["id", "sequence", "compress_method", "compress_level", "encryption_type", "integrity",
+               "pub_ping", "sub_ping"]
+# pair가 완성된 뒤에도 중복 log가 뒤늦게 나타날 수 있으므로 이 줄 수 만큼 기다린 후 기록
+DEFAULT_WINDOW = 10000
+# merge 결과를 이 개수 단위로 DataFrame으로 만들어 vectorised 계산 후 csv에 추가
+CHUNK_ROWS = 50000
+
+CALC_COLUMNS = ["compress_time_pub", "encryption_time_pub", "hash_time_pub", "hash_time_sub",
+                "decryption_time_sub", "decompress_time_sub"]
+SUMMARY_METRICS = ["total_time", "round_trip_time", "calc_time"]
+SUMMARY_GROUPS = {"id": ["id"], "size": ["data_size_pub"], "env": ["environment"],
+                  "level": ["compress_method", "compress_level"], "id_level": ["id", "compress_level"],
+                  "integrity": ["encryption_type", "integrity"]}
+
+
+def merge_pair(pub, sub, pending_sub_ping=None):
+    """pub/sub log 1쌍 -> merge된 row (공통 key는 그대로, 나머지는 _pub/_sub 접미사).
+    pending_sub_ping은 sub log 직전의 tcp_ping 값 -> tcp_ping_sub column (sub_ping은 log 값 그대로)"""
+    row = {}
+    for direction, entry in (("pub", pub), ("sub", sub)):
+        for k in COMMON_KEYS:
+            if k in entry:
+                row[k] = entry[k]
+        for k, v in entry.items():
+            if k not in COMMON_KEYS and k != "direction":
+                row[f"{k}_{direction}"] = v
+    row["tcp_ping_sub"] = pending_sub_ping
+    # sub_ping 측정 실패(음수)만 tcp_ping / pub_ping으로 대체
+    if row.get("sub_ping", 0) < 0:
+        row["sub_ping"] = pending_sub_ping if pending_sub_ping is not None else row.get("pub_ping")
+    if "integrity" in row:
+        # integrity mode가 기록된 log (aead는 hash_time이 0에 가까워도 hash combo)
+        row["hash_mode"] = "None" if row["integrity"] == "none" else "hash"
+    elif row.get("hash_time_pub", 0.0) == 0.0 and row.get("hash_time_sub", 0.0) == 0.0:
+        row["hash_mode"] = "None"
+    else:
+        row["hash_mode"] = "hash"
+    return row
+
+
+def _numeric(df, column):
+    if column not in df:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors="coerce").fillna(0)
+
+
+def _timestamp(df, column):
+    """시계 offset 보정값(<column>_corrected, cccm_clock)이 있으면 우선 사용"""
+    base, suffix = column.rsplit("_", 1)
+    corrected = f"{base}_corrected_{suffix}"
+    if corrected not in df:
+        return _numeric(df, column)
+    return pd.to_numeric(df[corrected], errors="coerce").fillna(_numeric(df, column))
+
+
+def calc_frame(df):
+    """calc_time, round_trip_time, total_time, data_size_pub 을 column 단위로 계산.
+    round_trip_time은 pub / sub 시계 offset 보정 시각 기준, 보정 오차 범위는 round_trip_time_error"""
+    calc_time = sum(_numeric(df, c) for c in CALC_COLUMNS)
+    round_trip_time = _timestamp(df, "subscribe_time_sub") - _timestamp(df, "publish_time_pub")
+    df["calc_time"] = calc_time
+    df["round_trip_time"] = round_trip_time
+    if "clock_offset_error_pub" in df:
+        df["round_trip_time_error"] = _numeric(df, "clock_offset_error_pub") + _numeric(df, "clock_offset_error_sub")
+    df["total_time"] = calc_time + round_trip_time
+    df["data_size_pub"] = _numeric(df, "size_sub")
+    return df
+
+
+class CsvSink:
+    """merge row를 CHUNK_ROWS 개씩 모아 DataFrame으로 계산 후 csv에 추가.
+    column은 첫 chunk 기준 (이후 chunk에만 있는 column은 제외하고 경고)"""
+
+    def __init__(self, path, environment=None, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.environment = environment
+        self.chunk_rows = chunk_rows
+        self._rows = []
+        self._columns = None
+        self.rows = 0
+        self.dropped_keys = set()
+
+    def write(self, row):
+        self._rows.append(row)
+        self.rows += 1
+        if len(self._rows) >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows and self._columns is not None:
+            return
+        df = calc_frame(pd.DataFrame(self._rows))
+        self._rows = []
+        if self.environment is not None:
+            df["environment"] = self.environment
+        if self._columns is None:
+            self._columns = list(df.columns)
+            df.to_csv(self.path, index=False)
+            return
+        self.dropped_keys.update(set(df.columns) - set(self._columns))
+        df.reindex(columns=self._columns).to_csv(self.path, mode="a", header=False, index=False)
+
+    def close(self):
+        self._flush()
+        if self.dropped_keys:
+            print(f"[WARN] Columns not in csv header were dropped: {sorted(self.dropped_keys)}")
+
+
+SUMMARY_QUANTILES = {0.50: "p50", 0.95: "p95", 0.99: "p99"}
+
+
+def summarize(csv_file):
+    """combo id / size / environment / 압축 level / integrity mode 별 mean, p50, p95, p99 -> <csv>_summary_by_<group>.csv"""
+    header = pd.read_csv(csv_file, nrows=0).columns
+    metrics = [m for m in SUMMARY_METRICS if m in header]
+    keys = sorted({k for group in SUMMARY_GROUPS.values() for k in group if k in header})
+    df = pd.read_csv(csv_file, usecols=keys + metrics)
+    if "compress_level" in df:
+        # level이 없는 method(none, snappy)는 "-" 로 group (NaN key는 groupby에서 빠짐)
+        df["compress_level"] = df["compress_level"].map(lambda v: "-" if pd.isna(v) else str(int(v)))
+    outputs = []
+    base = csv_file.rsplit(".", 1)[0]
+    for name, group in SUMMARY_GROUPS.items():
+        if not all(k in df for k in group):
             continue
+        grouped = df.groupby(group)[metrics]
+        stats = grouped.agg(["count", "mean"])
+        stats.columns = [f"{metric}_{stat}" for metric, stat in stats.columns]
+        quantiles = grouped.quantile(list(SUMMARY_QUANTILES)).unstack()
+        quantiles.columns = [f"{metric}_{SUMMARY_QUANTILES[q]}" for metric, q in quantiles.columns]
+        summary = stats.join(quantiles)
+        out = f"{base}_summary_by_{name}.csv"
+        summary.reset_index().to_csv(out, index=False)
+        outputs.append(out)
+    return outputs
+
+
+def merge_stream(file_path, sink, window=DEFAULT_WINDOW):
+    """log를 1번만 읽으면서 pub/sub pair를 merge하여 sink에 기록.
+
+    - 미완성 sequence(open)와 완성 후 window 줄 동안 대기 중인 pair(ready),
+      기록 후 window 줄 이내의 sequence(written, 뒤늦은 중복 검출용)만 메모리에 유지
+    - pub/sub 가 정확히 1회씩이 아닌 sequence는 기록하지 않고 invalid로 반환
+    - row는 sequence 순서로 기록: 가장 먼저 완성된 pair의 대기가 끝나면 그 sequence 이하의 ready pair를
+      sequence 순서로 함께 기록. 완성 순서가 window 줄 이상 어긋난 pair만 순서가 바뀜 (out_of_order)
+    - 기록 후 window 줄 이내의 중복은 late_duplicates, 그 이후의 중복은 미완성 sequence로 invalid에 포함
+      (둘 다 csv에 이미 기록된 pair일 수 있으므로 제외하려면 drop_sequences)
+    반환: {sequence: "pub: n, sub: m"} (invalid), 이미 기록 후 발견된 중복 sequence 목록, out_of_order row 수
+    """
+    open_seqs = {}                  # seq -> {"pub": [...], "sub": [...]}
+    ready = {}                      # seq -> (line_no, pub, sub, pending_sub_ping)
+    ready_order = deque()           # (line_no, seq) 완성 순서
+    ready_heap = []                 # seq (sequence 순서)
+    written = {}                    # seq -> 기록한 line_no
+    written_order = deque()         # (line_no, seq) 기록 순서
+    invalid = {}
+    late_duplicates = []
+    out_of_order = 0
+    last_written = None
+    pending_sub_ping = None  # sequence 없는 tcp_ping 값을 저장
 
-        if "sequence" in entry:
-            if entry["sequence"] not in invalid_sequences:
-                filtered_lines.append(line)
-        else:
-            filtered_lines.append(line)
-    
-
-    if len(filtered_lines) > 0:
-        BAK_FILE = file_path + ".bak"
-        with open(BAK_FILE, "w", encoding="utf-8") as f:
-            for line in all_line:
-                f.write(line)
-        f.close()
-        print(f"Filtered out {len(all_line) - len(filtered_lines)} invalid entries.")
-
-        with open(file_path, "w", encoding="utf-8") as f:
-                for line in filtered_lines:
-                    f.writelines(line)
-        f.close()
-        print(f"Filtered log file saved to {file_path}. Please re-run the script.")
-
-   # return filtered_lines
-
-def validation_pair(file_path, remove_option):
-    pair_counts = defaultdict(lambda: {"pub": 0, "sub": 0})
-    total_sequences = set()
-
+    def flush_ready(line_no):
+        nonlocal out_of_order, last_written
+        while written_order and line_no - written_order[0][0] >= window:
+            written_line, seq = written_order.popleft()
+            if written.get(seq) == written_line:
+                del written[seq]
+        while ready_order and line_no - ready_order[0][0] >= window:
+            due_line, due_seq = ready_order.popleft()
+            if due_seq not in ready or ready[due_seq][0] != due_line:
+                continue            # 중복 log로 ready에서 빠진 pair
+            while ready_heap and ready_heap[0] <= due_seq:
+                seq = heapq.heappop(ready_heap)
+                if seq not in ready:
+                    continue
+                _, pub, sub, sub_ping = ready.pop(seq)
+                sink.write(merge_pair(pub, sub, sub_ping))
+                written[seq] = line_no
+                written_order.append((line_no, seq))
+                if last_written is not None and seq < last_written:
+                    out_of_order += 1
+                last_written = seq if last_written is None else max(last_written, seq)
+
+    line_no = 0
     with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
+        for line_no, line in enumerate(f, 1):
             line = line.strip()
             if not line:
                 continue
@@ -62,154 +207,78 @@ def validation_pair(file_path, remove_option):
                 continue
 
             if "tcp_ping" in entry:
+                pending_sub_ping = entry["tcp_ping"]
                 continue
-
-            if "sequence" in entry and "direction" in entry:
-                seq = entry["sequence"]
-                direction = entry["direction"]
-                total_sequences.add(seq)
-                
-                if direction == "pub":
-                    pair_counts[seq]["pub"] += 1
-                elif direction == "sub":
-                    pair_counts[seq]["sub"] += 1
-                incomplete_sequences = []
-
-    for seq, counts in pair_counts.items():
-        pub_count = counts["pub"]
-        sub_count = counts["sub"]
-        
-        # pub과 sub이 모두 1회씩만 나타나지 않은 경우 (불완전하거나 중복된 세트)
-        if pub_count != 1 or sub_count != 1:
-            status = f"pub: {pub_count}, sub: {sub_count}"
-            incomplete_sequences.append((seq, status))
-    if incomplete_sequences:
-        print("\n=======================================================")
-        print(f"Warning: Incomplete or duplicated pub/sub pairs found from {file_path}")
-        print(f"Total unique sequences found: {len(total_sequences)}")
-        print(f"Sequences with invalid pairs ({len(incomplete_sequences)} total):")
-        
-        for seq, status in incomplete_sequences:
-            print(f"  - Sequence {seq}: {status}")    
- 
-        print("=======================================================\n")
-        return incomplete_sequences
-    else:
-        print("All sequences have valid pub/sub pairs.")
-        return None
-    
-
-def merge_pub_sub_log_to_list(file_path, output_path):
-    sequence_dict = defaultdict(dict)
-    pending_sub_ping = None  # sequence 없는 tcp_ping 값을 저장
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+            if "sequence" not in entry or "direction" not in entry:
                 continue
-            try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
+            direction = entry["direction"]
+            if direction not in ("pub", "sub"):
                 continue
+            seq = entry["sequence"]
 
-            if "tcp_ping" in entry:
-                pending_sub_ping = entry["tcp_ping"]
+            if seq in written:
+                late_duplicates.append(seq)
                 continue
+            if seq in ready:
+                _, pub, sub, _ = ready.pop(seq)
+                open_seqs[seq] = {"pub": [pub], "sub": [sub]}
+            state = open_seqs.setdefault(seq, {"pub": [], "sub": []})
+            state[direction].append(entry)
+            if direction == "sub":
+                state["sub_ping"] = pending_sub_ping
+
+            if len(state["pub"]) == 1 and len(state["sub"]) == 1:
+                del open_seqs[seq]
+                ready[seq] = (line_no, state["pub"][0], state["sub"][0], state.get("sub_ping"))
+                ready_order.append((line_no, seq))
+                heapq.heappush(ready_heap, seq)
+            elif len(state["pub"]) > 1 or len(state["sub"]) > 1:
+                invalid[seq] = state
+
+            flush_ready(line_no)
+
+    flush_ready(line_no + window)
+    for seq, state in open_seqs.items():
+        invalid[seq] = state
+    report = {seq: f"pub: {len(s['pub'])}, sub: {len(s['sub'])}" for seq, s in sorted(invalid.items())}
+    return report, late_duplicates, out_of_order
+
+
+def drop_sequences(csv_file, sequences, chunk_rows=CHUNK_ROWS):
+    """이미 csv에 기록된 뒤 중복이 발견된 sequence의 row 제거 (chunk 단위로 다시 기록) -> 제거한 row 수"""
+    if not sequences:
+        return 0
+    sequences = set(sequences)
+    removed = 0
+    tmp_file = csv_file + ".tmp"
+    header = True
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_rows):
+        keep = ~chunk["sequence"].isin(sequences)
+        removed += int((~keep).sum())
+        chunk[keep].to_csv(tmp_file, mode="w" if header else "a", header=header, index=False)
+        header = False
+    os.replace(tmp_file, csv_file)
+    return removed
+
+
+def print_invalid_report(file_path, invalid, late_duplicates):
+    print("\n=======================================================")
+    print(f"Warning: Incomplete or duplicated pub/sub pairs found from {file_path}")
+    print(f"Sequences with invalid pairs ({len(invalid)} total):")
+    for seq, status in invalid.items():
+        print(f"  - Sequence {seq}: {status}")
+    if late_duplicates:
+        print(f"Duplicated entries found after the pair was written (increase --window): {sorted(set(late_duplicates))}")
+    print("=======================================================\n")
 
-            # sequence가 있는 pub/sub 로그
-            if "sequence" in entry:
-                seq = entry["sequence"]
-                seq_entry = sequence_dict[seq]
-                direction = entry.get("direction")
-
-                # 공통 키 그대로 저장
-                for k in ["id", "sequence", "compress_method", "encryption_type", "pub_ping", "sub_ping"]:
-                    if k in entry:
-                        seq_entry[k] = entry[k]
-
-                # sub 로그이면 pending_sub_ping 덮어쓰기
-                if direction == "sub" and pending_sub_ping is not None:
-                    entry["sub_ping"] = pending_sub_ping
-
-                # 나머지 키 정리 (_pub/_sub 접미사)
-                for k, v in entry.items():
-                    if k not in ["id", "sequence", "compress_method", "encryption_type", "pub_ping", "sub_ping", "direction"]:
-                        if direction == "pub":
-                            seq_entry[f"{k}_pub"] = v
-                        elif direction == "sub":
-                            seq_entry[f"{k}_sub"] = v
-                        else:
-                            seq_entry[k] = v
-
-    if seq_entry["sub_ping"] < 0:
-        print(seq_entry)
-        if pending_sub_ping is not None:
-            seq_entry["sub_ping"] = pending_sub_ping 
-        else:
-            seq_entry["sub_ping"] = seq_entry["pub_ping"] 
-    if seq_entry["hash_time_pub"]==0.0 and seq_entry["hash_time_sub"]==0.0:
-        seq_entry["hash_mode"]="None"
-    else:
-        seq_entry["hash_mode"]="hash"
-
-
-    result = [sequence_dict[k] for k in sorted(sequence_dict.keys())]
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=4)
-
-    return True
-
-def data_calc_step(data_file):        
-
-    # Read the JSON data from output.txt
-    with open("output.txt", "r") as f:
-        data = json.load(f)
-
-    # Process each record to compute calc_time, round_trip_time, and total_time
-    for record in data:
-        compress_time_pub = record.get("compress_time_pub", 0) or 0
-        encryption_time_pub = record.get("encryption_time_pub", 0) or 0
-        hash_time_pub = record.get("hash_time_pub", 0) or 0
-        hash_time_sub = record.get("hash_time_sub", 0) or 0
-        hash_time = hash_time_pub + hash_time_sub
-        decryption_time_sub = record.get("decryption_time_sub", 0) or 0
-        decompress_time_sub = record.get("decompress_time_sub", 0) or 0
-        publish_time_pub = record.get("publish_time_pub", 0) or 0
-        subscribe_time_sub = record.get("subscribe_time_sub", 0) or 0
-        sequence = record.get("sequence", -1)
-
-        calc_time = (
-            compress_time_pub +
-            encryption_time_pub +
-            hash_time_pub +
-            hash_time_sub +
-            decryption_time_sub +
-            decompress_time_sub
-        )
-
-        round_trip_time = (subscribe_time_sub - publish_time_pub)
-        print(f"{sequence}, {round_trip_time}, === {calc_time}")
-        total_time = calc_time + round_trip_time
-
-        # Add computed values to the record
-        record["calc_time"] = calc_time
-        record["round_trip_time"] = round_trip_time
-        record["total_time"] = total_time
-        record["data_size_pub"] = record.get("size_sub", 0) or 0
-
-    # Save the updated data back to a new log file and a CSV file
-    df = pd.DataFrame(data)
-    CSV_FILE = data_file.split(".")[0] + ".csv"
-    df.to_csv(CSV_FILE, index=False)
-
-    print(f"Updated data saved to {data_file} and  {CSV_FILE}.")
 
 def main():
     parser = argparse.ArgumentParser(description="txt data file")
     parser.add_argument('--data', required=True, help='Path to data_log.txt')
     parser.add_argument('--mismatch', default='n', help='mismatched data remove[y] or not[n/default]')
+    parser.add_argument('--env', default=None, help='environment label added to every row (e.g. cpk, lpk)')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                        help='lines to hold a completed pair before writing (late duplicate detection)')
     args = parser.parse_args()
     data_log_file = args.data
     mismatch_option = args.mismatch
@@ -222,20 +291,34 @@ def main():
         mismatch_option = 'n'
 
     print(f"Data log file path provided: {data_log_file}")
-    
-    test = validation_pair(data_log_file, mismatch_option)
-    if test != None:
+
+    CSV_FILE = data_log_file.split(".")[0] + ".csv"
+    sink = CsvSink(CSV_FILE, args.env)
+    try:
+        invalid, late_duplicates, out_of_order = merge_stream(data_log_file, sink, args.window)
+    finally:
+        sink.close()
+    if out_of_order:
+        print(f"[WARN] {out_of_order} rows were completed more than --window lines late and are out of sequence order.")
+
+    if invalid or late_duplicates:
+        print_invalid_report(data_log_file, invalid, late_duplicates)
         if mismatch_option.lower() == 'y':
-            print("Remove mismatched data and reprocess the log file.")
-            filter_invalid_sequences(data_log_file, [seq for seq, _ in test])
+            # 기록 후 발견된 중복 pair는 csv에서 다시 제거 (window 이후의 중복은 invalid에 포함)
+            removed = drop_sequences(CSV_FILE, set(late_duplicates) | set(invalid))
+            sink.rows -= removed
+            print(f"Removed {len(invalid) + len(set(late_duplicates))} mismatched sequences from the output.")
         else:
-            print("Mismatched data found. Please set --mismatch to 'y' to remove them and reprocess.")  
+            os.remove(CSV_FILE)
+            print("Mismatched data found. Please set --mismatch to 'y' to remove them and reprocess.")
             exit(1)
+    else:
+        print("All sequences have valid pub/sub pairs.")
 
-    merge_pub_sub_log_to_list(data_log_file, "output.txt")
-    data_calc_step(data_log_file)
+    print(f"Merged {sink.rows} sequences from {data_log_file} into {CSV_FILE}.")
+    for summary_file in summarize(CSV_FILE):
+        print(f"Summary saved to {summary_file}.")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,268 @@
+# subscriber 실시간 latency 지표 - combo / stage별 log-bucket histogram (메모리 일정), Prometheus text endpoint, 주기 snapshot.
+# run 중에도 p50 / p99 변화를 확인할 수 있다 (전체 분석은 여전히 cccm_m2_20).
+#   curl http://127.0.0.1:9108/metrics
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cccm_log import get_logger
+
+# bucket i (>= 1) 범위: MIN_VALUE * 2^((i-1)/SUB_BUCKETS) ~ MIN_VALUE * 2^(i/SUB_BUCKETS), 상대 오차 약 +/-4.5%
+# bucket 0 은 MIN_VALUE 미만, 마지막 bucket은 MAX_VALUE 이상 (0.1us ~ 10000s, 약 300개)
+MIN_VALUE = 1e-7
+MAX_VALUE = 1e4
+SUB_BUCKETS = 8
+BUCKET_COUNT = int(math.ceil(math.log2(MAX_VALUE / MIN_VALUE) * SUB_BUCKETS)) + 2
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# stage 이름 -> sub metadata key. end_to_end는 on_message 수신 ~ 처리 완료 (subscriber 내부, pub 시각은 frame에 없음)
+STAGES = {
+    "hash": "hash_time",
+    "decrypt": "decryption_time",
+    "decompress": "decompress_time",
+    "queue_wait": "queue_wait_time",
+    "end_to_end": None,
+}
+
+
+def valid_sample(value):
+    """None / NaN / 음수 (pub / sub 시계 차이 등) 는 기록하지 않음"""
+    return value is not None and value == value and value >= 0
+
+
+def bucket_index(value):
+    if value < MIN_VALUE:
+        return 0
+    return min(BUCKET_COUNT - 1, int(math.log2(value / MIN_VALUE) * SUB_BUCKETS) + 1)
+
+
+def bucket_value(index):
+    """bucket 대표값 (범위의 기하 평균)"""
+    if index == 0:
+        return MIN_VALUE / 2
+    return MIN_VALUE * 2 ** ((index - 0.5) / SUB_BUCKETS)
+
+
+class LogHistogram:
+    """고정 크기 log-bucket histogram. record / quantile 모두 bucket 수에만 비례 (sample 수와 무관)"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        if not valid_sample(value):
+            return
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1) + 1
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, max(self.min, bucket_value(index)))
+        return self.max
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    def as_dict(self):
+        """snapshot용 (bucket은 0이 아닌 것만) - from_dict로 다시 합칠 수 있음"""
+        summary = {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max}
+        for q in QUANTILES:
+            summary[f"p{q * 100:g}".replace(".", "")] = self.quantile(q)
+        summary["buckets"] = {str(i): c for i, c in enumerate(self.counts) if c}
+        return summary
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for index, count in data.get("buckets", {}).items():
+            histogram.counts[int(index)] += count
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class LatencyMetrics:
+    """(combo id, stage)별 histogram 모음. observe()는 dispatcher thread 여러 개에서 호출"""
+
+    def __init__(self):
+        self.series = {}        # (id, compress_method, encryption_type, stage) -> LogHistogram
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, record, now=None):
+        now = time.time() if now is None else now
+        key = (record.get("id"), record.get("compress_method"), record.get("encryption_type"))
+        with self._lock:
+            for stage, field in STAGES.items():
+                if field is None:
+                    value = now - record["subscribe_time"] if record.get("subscribe_time") is not None else None
+                else:
+                    value = record.get(field)
+                if not valid_sample(value):
+                    continue        # 빈 series를 만들지 않음 (count 0 이면 quantile이 None)
+                histogram = self.series.get(key + (stage,))
+                if histogram is None:
+                    histogram = self.series[key + (stage,)] = LogHistogram()
+                histogram.record(value)
+
+    def snapshot(self):
+        """현재 상태 dict (snapshot file / 최종 집계용)"""
+        with self._lock:
+            series = [dict(id=k[0], compress_method=k[1], encryption_type=k[2], stage=k[3], **h.as_dict())
+                      for k, h in sorted(self.series.items(), key=lambda item: tuple(str(v) for v in item[0]))]
+        return {"time": time.time(), "uptime": time.time() - self.started, "series": series}
+
+    def merge_series(self, series):
+        """다른 process의 histogram {(id, compress, encryption, stage): LogHistogram} 합산 (cccms_launch 집계)"""
+        with self._lock:
+            for key, histogram in series.items():
+                if key in self.series:
+                    self.series[key].merge(histogram)
+                else:
+                    self.series[key] = LogHistogram().merge(histogram)
+
+    def totals(self, stage):
+        """stage의 전체 combo 합산 histogram"""
+        total = LogHistogram()
+        with self._lock:
+            for key, histogram in self.series.items():
+                if key[3] == stage:
+                    total.merge(histogram)
+        return total
+
+    def prometheus(self):
+        """Prometheus text format (0.0.4) - stage별 summary (quantile + _sum + _count)"""
+        lines = ["# HELP ccms_stage_seconds Subscriber stage latency per combo (log-bucket histogram quantiles)",
+                 "# TYPE ccms_stage_seconds summary"]
+        with self._lock:
+            items = sorted(self.series.items(), key=lambda item: tuple(str(v) for v in item[0]))
+            for (id_value, comp_method, enc_method, stage), histogram in items:
+                if not histogram.count:
+                    continue
+                labels = (f'id="{_label_value(id_value)}",compress="{_label_value(comp_method)}",'
+                          f'encryption="{_label_value(enc_method)}",stage="{stage}"')
+                for q in QUANTILES:
+                    lines.append(f'ccms_stage_seconds{{{labels},quantile="{q}"}} {histogram.quantile(q):.9g}')
+                lines.append(f"ccms_stage_seconds_sum{{{labels}}} {histogram.sum:.9g}")
+                lines.append(f"ccms_stage_seconds_count{{{labels}}} {histogram.count}")
+        lines.append("# HELP ccms_uptime_seconds Seconds since the metrics were reset")
+        lines.append("# TYPE ccms_uptime_seconds gauge")
+        lines.append(f"ccms_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def describe(histogram):
+    if not histogram.count:
+        return "no data"
+    return (f"n={histogram.count} p50={histogram.quantile(0.5) * 1000:.3f}ms "
+            f"p99={histogram.quantile(0.99) * 1000:.3f}ms max={histogram.max * 1000:.3f}ms")
+
+
+class MetricsServer:
+    """/metrics HTTP endpoint (port 0 이면 HTTP 없음) + interval 초마다 snapshot file 기록 / 요약 출력"""
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108, snapshot_interval=30.0, snapshot_file=None):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_file = snapshot_file
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.port:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/metrics", "/"):
+                        self.send_error(404)
+                        return
+                    body = metrics.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self._server.server_address[1]
+            self._spawn(self._server.serve_forever, "metrics-http")
+            print(f"Metrics endpoint: http://{self.host}:{self.port}/metrics")
+        if self.snapshot_interval > 0:
+            self._spawn(self._run_snapshots, "metrics-snapshot")
+        return self
+
+    def _spawn(self, target, name):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _run_snapshots(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def write_snapshot(self, final=False):
+        if self.snapshot_file:
+            snapshot = self.metrics.snapshot()
+            snapshot["final"] = final
+            get_logger(self.snapshot_file, "jsonl").log(snapshot)
+        print(f"Metrics: end_to_end {describe(self.metrics.totals('end_to_end'))}, "
+              f"queue_wait {describe(self.metrics.totals('queue_wait'))}")
+
+    def stop(self):
+        """HTTP 종료 후 마지막 snapshot 기록"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for t in self._threads:
+            t.join()
+        self.write_snapshot(final=True)
+
+
+def load_snapshot(path):
+    """snapshot file의 마지막 snapshot -> {(id, compress, encryption, stage): LogHistogram}"""
+    last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    if last is None:
+        return {}
+    return {(s["id"], s["compress_method"], s["encryption_type"], s["stage"]): LogHistogram.from_dict(s)
+            for s in last["series"]}
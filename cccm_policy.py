@@ -0,0 +1,87 @@
+# 추천 policy table (rec_policy_key_table.csv / auto_recommend_table.csv) 기반 combo 선택
+import bisect
+import csv
+import math
+from collections import defaultdict
+from cccm_sinario import combinations_with_id
+
+# table의 이름은 소문자 (aes-gcm, chacha20-poly1305 ...) -> combo id
+_COMBO_BY_NAME = {
+    (comp.lower(), enc.lower(), hash_flag.lower()): id_value
+    for id_value, comp, enc, hash_flag in combinations_with_id
+}
+
+
+def combo_id_for(comp_method, enc_method, hash_mode):
+    return _COMBO_BY_NAME.get((comp_method.lower(), enc_method.lower(), hash_mode.lower()))
+
+
+class PolicyTable:
+    """environment별 (pub_ping, data_size_pub) -> combo id 색인.
+
+    ping 축과 size 축을 각각 정렬해 두고 bisect로 가장 가까운 bucket을 찾는다
+    (size는 log scale 거리). 조회 비용은 O(log n).
+    """
+
+    def __init__(self):
+        self._pings = {}                      # env -> sorted ping list
+        self._sizes = {}                      # (env, ping) -> sorted size list
+        self._combos = {}                     # (env, ping, size) -> combo id
+        self._raw = defaultdict(dict)
+
+    def add(self, environment, pub_ping, data_size, combo_id):
+        self._raw[environment][(pub_ping, data_size)] = combo_id
+
+    def build(self):
+        self._pings.clear()
+        self._sizes.clear()
+        self._combos.clear()
+        for env, entries in self._raw.items():
+            by_ping = defaultdict(list)
+            for (ping, size), combo_id in entries.items():
+                by_ping[ping].append(size)
+                self._combos[(env, ping, size)] = combo_id
+            self._pings[env] = sorted(by_ping)
+            for ping, sizes in by_ping.items():
+                self._sizes[(env, ping)] = sorted(sizes)
+        return self
+
+    @property
+    def environments(self):
+        return list(self._pings)
+
+    @staticmethod
+    def _nearest(values, target, key=lambda v: v):
+        i = bisect.bisect_left(values, target)
+        if i == 0:
+            return values[0]
+        if i == len(values):
+            return values[-1]
+        before, after = values[i - 1], values[i]
+        return before if abs(key(target) - key(before)) <= abs(key(after) - key(target)) else after
+
+    def lookup(self, environment, pub_ping, data_size):
+        """가장 가까운 (ping, size) bucket의 combo id. 해당 environment가 없으면 None"""
+        pings = self._pings.get(environment)
+        if not pings:
+            return None
+        ping = self._nearest(pings, pub_ping)
+        sizes = self._sizes[(environment, ping)]
+        size = self._nearest(sizes, max(data_size, 1), key=lambda v: math.log(max(v, 1)))
+        return self._combos[(environment, ping, size)]
+
+
+def load_policy_table(paths):
+    """csv 파일(들)을 읽어 PolicyTable 생성. 알 수 없는 combo는 건너뜀"""
+    table = PolicyTable()
+    for path in paths:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                combo_id = combo_id_for(row["best_compress_method"], row["best_encryption_type"],
+                                        row["best_hash_mode"])
+                if combo_id is None:
+                    print(f"[WARN] Unknown policy combo in {path}: {row}")
+                    continue
+                table.add(row["environment"], float(row["pub_ping"]),
+                          float(row["data_size_pub"]), combo_id)
+    return table.build()
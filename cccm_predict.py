@@ -0,0 +1,99 @@
+# 전송 시간(total_time) 예측 - 학습된 CatBoost model을 한번만 load 하고 예측값을 LRU cache
+import math
+import time
+from collections import OrderedDict
+from cccm_sinario import combinations_with_id, COMBO_VERSION
+
+# 학습 시 사용한 feature 순서 (cccm_m2_20 결과 csv의 column 이름)
+FEATURES = ["compress_method", "encryption_type", "hash_mode", "pub_ping", "data_size_pub"]
+# collection/ model은 matrix version 1 (id 1 ~ 56) log로 학습 - 이후 codec(Speck, zstd, brotli)은 model에 없는 category
+TRAINED_MATRIX_VERSION = 1
+
+
+def trained_combos(version=TRAINED_MATRIX_VERSION):
+    """model 학습에 포함된 combo (matrix version 이하)"""
+    return [combo for combo in combinations_with_id if COMBO_VERSION[combo[0]] <= version]
+
+
+def load_catboost_model(model_file):
+    try:
+        from catboost import CatBoostRegressor
+    except ImportError as e:
+        raise RuntimeError("catboost is required for the transmission-time predictor") from e
+    model = CatBoostRegressor()
+    model.load_model(model_file)
+    return model
+
+
+class TransmissionPredictor:
+    """(combo id, size bucket, ping bucket) -> 예측 total_time.
+
+    size는 log2 scale로 octave당 size_steps 개, ping은 ping_step(sec) 단위 bucket.
+    model은 predict(rows) 를 제공하는 객체면 된다.
+    combos 기본값은 학습된 combo만 (model에 없는 codec은 예측값이 의미 없으므로 선택하지 않음).
+    """
+
+    def __init__(self, model, cache_size=4096, size_steps=4, ping_step=0.005, combos=None):
+        self.model = model
+        self.cache_size = cache_size
+        self.size_steps = size_steps
+        self.ping_step = ping_step
+        self.combos = combos if combos is not None else trained_combos()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.last_latency = 0.0
+
+    def size_bucket(self, size):
+        return round(math.log2(max(size, 1)) * self.size_steps)
+
+    def ping_bucket(self, ping):
+        return round(max(ping, 0.0) / self.ping_step)
+
+    def _features(self, combo, size_bucket, ping_bucket):
+        _, comp_method, enc_method, hash_flag = combo
+        # feature 값은 bucket 대표값을 사용해야 cache 결과와 일치
+        size = 2 ** (size_bucket / self.size_steps)
+        ping = ping_bucket * self.ping_step
+        return [comp_method, enc_method, "hash" if hash_flag != "none" else "None", ping, size]
+
+    def _get(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def predict_all(self, size, ping):
+        """모든 combo의 예측 시간 {id: T}. cache에 없는 combo만 모아서 1번에 model.predict"""
+        start = time.perf_counter()
+        sb, pb = self.size_bucket(size), self.ping_bucket(ping)
+        result = {}
+        missing = []
+        for combo in self.combos:
+            value = self._get((combo[0], sb, pb))
+            if value is None:
+                missing.append(combo)
+            else:
+                result[combo[0]] = value
+        self.hits += len(self.combos) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            rows = [self._features(combo, sb, pb) for combo in missing]
+            for combo, value in zip(missing, self.model.predict(rows)):
+                value = float(value)
+                self._put((combo[0], sb, pb), value)
+                result[combo[0]] = value
+        self.last_latency = time.perf_counter() - start
+        return result
+
+    def best_combo(self, size, ping):
+        """예측 시간이 가장 짧은 (combo id, 예측 시간)"""
+        predictions = self.predict_all(size, ping)
+        id_value = min(predictions, key=predictions.get)
+        return id_value, predictions[id_value]
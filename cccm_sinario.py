@@ -1,42 +1,112 @@
-combinations_with_id = [
-    (1, "none", "none", "none"), (2, "none", "none", "hash"),
-    (3, "none", "AES-GCM", "none"), (4, "none", "AES-GCM", "hash"),
-    (5, "none", "ChaCha20-Poly1305", "none"), (6, "none", "ChaCha20-Poly1305", "hash"),
-    (7, "none", "ASCON", "none"), (8, "none", "ASCON", "hash"),
-    
-    (9, "zlib", "none", "none"), (10, "zlib", "none", "hash"),
-    (11, "zlib", "AES-GCM", "none"), (12, "zlib", "AES-GCM", "hash"),
-    (13, "zlib", "ChaCha20-Poly1305", "none"), (14, "zlib", "ChaCha20-Poly1305", "hash"),
-    (15, "zlib", "ASCON", "none"), (16, "zlib", "ASCON", "hash"),
-
-    (17, "gzip", "none", "none"), (18, "gzip", "none", "hash"),
-    (19, "gzip", "AES-GCM", "none"), (20, "gzip", "AES-GCM", "hash"),
-    (21, "gzip", "ChaCha20-Poly1305", "none"), (22, "gzip", "ChaCha20-Poly1305", "hash"),
-    (23, "gzip", "ASCON", "none"), (24, "gzip", "ASCON", "hash"),
-
-    (25, "bz2", "none", "none"), (26, "bz2", "none", "hash"),
-    (27, "bz2", "AES-GCM", "none"), (28, "bz2", "AES-GCM", "hash"),
-    (29, "bz2", "ChaCha20-Poly1305", "none"), (30, "bz2", "ChaCha20-Poly1305", "hash"),
-    (31, "bz2", "ASCON", "none"), (32, "bz2", "ASCON", "hash"),
-
-    (33, "lzma", "none", "none"), (34, "lzma", "none", "hash"),
-    (35, "lzma", "AES-GCM", "none"), (36, "lzma", "AES-GCM", "hash"),
-    (37, "lzma", "ChaCha20-Poly1305", "none"), (38, "lzma", "ChaCha20-Poly1305", "hash"),
-    (39, "lzma", "ASCON", "none"), (40, "lzma", "ASCON", "hash"),
-
-    (41, "lz4", "none", "none"), (42, "lz4", "none", "hash"),
-    (43, "lz4", "AES-GCM", "none"), (44, "lz4", "AES-GCM", "hash"),
-    (45, "lz4", "ChaCha20-Poly1305", "none"), (46, "lz4", "ChaCha20-Poly1305", "hash"),
-    (47, "lz4", "ASCON", "none"), (48, "lz4", "ASCON", "hash"),
-
-    (49, "snappy", "none", "none"), (50, "snappy", "none", "hash"),
-    (51, "snappy", "AES-GCM", "none"), (52, "snappy", "AES-GCM", "hash"),
-    (53, "snappy", "ChaCha20-Poly1305", "none"), (54, "snappy", "ChaCha20-Poly1305", "hash"),
-    (55, "snappy", "ASCON", "none"), (56, "snappy", "ASCON", "hash"),
+# 압축 / 암호화 / hash 조합 시나리오.
+# id는 기존 log / 학습 data와 호환되어야 하므로 MATRIX_VERSIONS 순서대로 누적 부여한다.
+# 새 codec은 새 version block으로 뒤에만 추가 (기존 block 수정 / 재번호 금지).
+
+HASH_OPTIONS = ["none", "hash"]
+
+# (version, 압축 목록, 암호화 목록, hash 목록) - block 안에서는 압축 > 암호화 > hash 순으로 id 부여
+MATRIX_VERSIONS = [
+    (1, ["none", "zlib", "gzip", "bz2", "lzma", "lz4", "snappy"],
+        ["none", "AES-GCM", "ChaCha20-Poly1305", "ASCON"], HASH_OPTIONS),             # id 1 ~ 56
+    # Speck (batched NumPy 구현)
+    (2, ["none", "zlib", "gzip", "bz2", "lzma", "lz4", "snappy"], ["Speck"], HASH_OPTIONS),  # id 57 ~ 70
+    # zstd (zstd-dict: 학습된 dictionary 사용) / brotli
+    (3, ["zstd", "zstd-dict", "brotli"],
+        ["none", "AES-GCM", "ChaCha20-Poly1305", "ASCON", "Speck"], HASH_OPTIONS),    # id 71 ~ 100
 ]
 
+
+def build_matrix(versions):
+    """version block -> [(id, 압축, 암호화, hash)], {id: version}. 중복 조합은 오류"""
+    combos = []
+    combo_versions = {}
+    seen = set()
+    for version, comp_methods, enc_methods, hash_options in versions:
+        for comp_method in comp_methods:
+            for enc_method in enc_methods:
+                for hash_option in hash_options:
+                    key = (comp_method, enc_method, hash_option)
+                    if key in seen:
+                        raise ValueError(f"Duplicated combo in matrix version {version}: {key}")
+                    seen.add(key)
+                    id_value = len(combos) + 1
+                    combos.append((id_value, comp_method, enc_method, hash_option))
+                    combo_versions[id_value] = version
+    return combos, combo_versions
+
+
+combinations_with_id, COMBO_VERSION = build_matrix(MATRIX_VERSIONS)
+MATRIX_VERSION = MATRIX_VERSIONS[-1][0]
+
+# id -> (압축, 암호화, hash) / (압축, 암호화, hash) -> id
+COMBO_BY_ID = {combo[0]: combo[1:] for combo in combinations_with_id}
+ID_BY_COMBO = {combo[1:]: combo[0] for combo in combinations_with_id}
+
+
+# 압축 method별 level 범위 (min, max). level이 없는 method (none, snappy)는 제외
+# level은 combo id에 포함하지 않음 (모든 format이 self-describing이라 복원에 level이 필요 없음) -> log의 compress_level로 구분
+COMPRESS_LEVEL_RANGES = {
+    "zlib": (0, 9), "gzip": (0, 9), "bz2": (1, 9), "lzma": (0, 9), "lz4": (0, 16),
+    "zstd": (1, 22), "zstd-dict": (1, 22), "brotli": (0, 11),
+}
+
+
+def parse_level_sweep(spec):
+    """"zlib:1,6,9; lzma:0,6" -> {"zlib": [1, 6, 9], "lzma": [0, 6]}"""
+    sweep = {}
+    for item in spec.split(";"):
+        if not item.strip():
+            continue
+        comp_method, _, levels = item.partition(":")
+        comp_method = comp_method.strip()
+        if comp_method not in COMPRESS_LEVEL_RANGES:
+            raise ValueError(f"Compression method without levels: {comp_method}")
+        low, high = COMPRESS_LEVEL_RANGES[comp_method]
+        values = [int(v) for v in levels.split(",") if v.strip()]
+        for level in values:
+            if not low <= level <= high:
+                raise ValueError(f"{comp_method} level {level} out of range {low}..{high}")
+        sweep[comp_method] = values
+    return sweep
+
+
+def parse_id_list(spec):
+    """"1-10, 57, 71-75" -> [1, 2, .., 10, 57, 71, .., 75] (존재하지 않는 id는 오류)"""
+    ids = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        low, _, high = item.partition("-")
+        for id_value in range(int(low), int(high or low) + 1):
+            if id_value not in COMBO_BY_ID:
+                raise ValueError(f"Unknown combo id: {id_value}")
+            ids.append(id_value)
+    return ids
+
+
+def select_combos(spec):
+    """id 목록 spec의 combo [(id, 압축, 암호화, hash)]. 빈 spec은 None (전체)"""
+    ids = set(parse_id_list(spec))
+    if not ids:
+        return None
+    return [combo for combo in combinations_with_id if combo[0] in ids]
+
+
+def scenario_matrix(level_sweep=None, combos=None):
+    """[(id, 압축, 암호화, hash, level)]. sweep에 없는 method는 level None (codec 기본 level) 1개"""
+    level_sweep = level_sweep or {}
+    scenarios = []
+    for id_value, comp_method, enc_method, hash_option in (combos or combinations_with_id):
+        for level in level_sweep.get(comp_method) or [None]:
+            scenarios.append((id_value, comp_method, enc_method, hash_option, level))
+    return scenarios
+
+
 def get_configuration_by_id(id_value):
-    for combo in combinations_with_id:
-        if combo[0] == id_value:
-            return combo[1], combo[2], combo[3]
-    return None, None, None  # id가 존재하지 않을 경우, 'compression': 'zlib', 'encryption': 'AES-GCM', 'hash': 'hash'}
+    # id가 존재하지 않을 경우 (None, None, None)
+    return COMBO_BY_ID.get(id_value, (None, None, None))
+
+
+def get_id_by_configuration(comp_method, enc_method, hash_option):
+    return ID_BY_COMBO.get((comp_method, enc_method, hash_option))
@@ -0,0 +1,358 @@
+# 대용량 payload용 streaming 압축 -> chunk 단위 암호화 / 수신측 재조립
+import struct
+import threading
+import time
+import zlib
+import bz2
+import lzma
+import lz4.frame
+import snappy
+import zstandard
+import brotli
+import ascon
+import cccm_codec
+from cccm_codec import (AESGCM_CTX, CHACHA_CTX, ASCON_KEY, ASCON_NONCE, NONCE_SIZE,
+                        decrypt_speck, encrypted_size, encryption_into_methods, _aead_encrypt_into)
+from cccm_integrity import INTEGRITY_SHA256, compute_digest, verify_digest
+
+# chunk AAD: sequence | chunk index | last flag -> chunk 순서 변경/누락을 AEAD가 검출
+CHUNK_AAD = struct.Struct(">IIB")
+
+
+class _PassThrough:
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+class _Lz4Compressor:
+    """LZ4FrameCompressor는 begin()으로 frame header를 먼저 만들어야 함"""
+
+    def __init__(self, level=None):
+        self._ctx = lz4.frame.LZ4FrameCompressor(compression_level=level or 0)
+        self._header = self._ctx.begin()
+
+    def compress(self, data):
+        out = self._header + self._ctx.compress(data)
+        self._header = b""
+        return out
+
+    def flush(self):
+        return self._header + self._ctx.flush()
+
+
+class _SnappyCompressor:
+    def __init__(self, level=None):
+        self._ctx = snappy.StreamCompressor()
+
+    def compress(self, data):
+        # python-snappy stream은 bytes만 지원 (corpus block은 memoryview)
+        return self._ctx.add_chunk(bytes(data))
+
+    def flush(self):
+        return b""
+
+
+class _SnappyDecompressor:
+    """python-snappy stream은 bytes만 지원 (binary frame은 memoryview)"""
+
+    def __init__(self):
+        self._ctx = snappy.StreamDecompressor()
+
+    def decompress(self, data):
+        return self._ctx.decompress(bytes(data))
+
+
+class _BrotliCompressor:
+    def __init__(self, level=None):
+        self._ctx = brotli.Compressor(quality=cccm_codec.effective_level("brotli", level))
+
+    def compress(self, data):
+        return self._ctx.process(data)
+
+    def flush(self):
+        return self._ctx.finish()
+
+
+class _BrotliDecompressor:
+    def __init__(self):
+        self._ctx = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._ctx.process(bytes(data))
+
+
+def _zstd_compressor(use_dict, level=None):
+    zdict = cccm_codec.zstd_active_dict if use_dict else None
+    return zstandard.ZstdCompressor(level=cccm_codec.effective_level("zstd", level), dict_data=zdict).compressobj()
+
+
+class _ZstdDecompressor:
+    """첫 chunk의 frame header에서 dict id를 읽어 dictionary 선택"""
+
+    def __init__(self):
+        self._ctx = None
+
+    def decompress(self, data):
+        if self._ctx is None:
+            self._ctx = cccm_codec.zstd_decompressor_for(data).decompressobj()
+        return self._ctx.decompress(data)
+
+
+# factory(level) - level None 이면 codec 기본 level
+stream_compressors = {
+    "none": lambda level=None: _PassThrough(),
+    "zlib": lambda level=None: zlib.compressobj(-1 if level is None else level),
+    "gzip": lambda level=None: zlib.compressobj(cccm_codec.effective_level("gzip", level), wbits=31),
+    "bz2": lambda level=None: bz2.BZ2Compressor(cccm_codec.effective_level("bz2", level)),
+    "lzma": lambda level=None: lzma.LZMACompressor(preset=level),
+    "lz4": _Lz4Compressor,
+    "snappy": _SnappyCompressor,
+    "zstd": lambda level=None: _zstd_compressor(False, level),
+    "zstd-dict": lambda level=None: _zstd_compressor(True, level),
+    "brotli": _BrotliCompressor,
+}
+
+stream_decompressors = {
+    "none": _PassThrough,
+    "zlib": lambda: zlib.decompressobj(),
+    "gzip": lambda: zlib.decompressobj(wbits=31),
+    "bz2": lambda: bz2.BZ2Decompressor(),
+    "lzma": lambda: lzma.LZMADecompressor(),
+    "lz4": lambda: lz4.frame.LZ4FrameDecompressor(),
+    "snappy": _SnappyDecompressor,
+    "zstd": _ZstdDecompressor,
+    "zstd-dict": _ZstdDecompressor,
+    "brotli": _BrotliDecompressor,
+}
+
+
+def ascon_chunk_nonce(sequence, index):
+    """(sequence, chunk)마다 다른 nonce - ASCON_NONCE 하위 8byte에 sequence(4) | chunk index(4) xor.
+    chunk index만 쓰면 stream마다 chunk 0, 1, ... 이 같은 (key, nonce)를 재사용한다"""
+    tail = int.from_bytes(ASCON_NONCE[-8:], "big") ^ ((sequence & 0xFFFFFFFF) << 32 | index & 0xFFFFFFFF)
+    return ASCON_NONCE[:-8] + tail.to_bytes(8, "big")
+
+
+def encrypt_chunk_into(enc_method, data, out, sequence, index, last):
+    """chunk 암호문을 out (encrypted_size 크기의 memoryview)에 바로 기록"""
+    aad = CHUNK_AAD.pack(sequence, index, last)
+    if enc_method == "AES-GCM":
+        _aead_encrypt_into(AESGCM_CTX, data, out, aad)
+    elif enc_method == "ChaCha20-Poly1305":
+        _aead_encrypt_into(CHACHA_CTX, data, out, aad)
+    elif enc_method == "ASCON":
+        out[:] = ascon.encrypt(ASCON_KEY, ascon_chunk_nonce(sequence, index), aad, bytes(data))
+    elif enc_method in ("none", "Speck"):
+        encryption_into_methods[enc_method](data, out)
+    else:
+        raise ValueError(f"Unsupported encryption type: {enc_method}")
+
+
+def encrypt_chunk(enc_method, data, sequence, index, last):
+    if enc_method == "none":
+        return data
+    out = bytearray(encrypted_size(enc_method, len(data)))
+    encrypt_chunk_into(enc_method, data, memoryview(out), sequence, index, last)
+    return out
+
+
+def decrypt_chunk(enc_method, data, sequence, index, last):
+    aad = CHUNK_AAD.pack(sequence, index, last)
+    if enc_method == "none":
+        return data
+    if enc_method in ("AES-GCM", "ChaCha20-Poly1305"):
+        data = memoryview(data)
+        ctx = AESGCM_CTX if enc_method == "AES-GCM" else CHACHA_CTX
+        return ctx.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], aad)
+    if enc_method == "ASCON":
+        return ascon.decrypt(ASCON_KEY, ascon_chunk_nonce(sequence, index), aad, bytes(data))
+    if enc_method == "Speck":
+        return decrypt_speck(data)
+    raise ValueError(f"Unsupported encryption type: {enc_method}")
+
+
+def new_stream_timing():
+    return {"compress_time": 0.0, "encryption_time": 0.0, "hash_time": 0.0,
+            "compressed_size": 0, "chunks": 0}
+
+
+def iter_stream_chunks(blocks, comp_method, enc_method, hash_option, sequence, chunk_size, timing, level=None,
+                       new_buffer=None, integrity=INTEGRITY_SHA256):
+    """원본 block iterator -> (index, last, ciphertext chunk, digest) 를 순서대로 생성.
+
+    압축 결과를 chunk_size 단위로 잘라 암호화하므로 메모리는 chunk 몇 개 크기로 유지된다.
+    stage별 누적 시간은 timing(new_stream_timing())에 기록.
+    new_buffer(size) -> (buffer, memoryview) 를 주면 암호문을 그 memoryview에 바로 기록한다
+    (publisher는 cccm_frame.new_frame으로 header 자리를 비워 둔 frame을 받고, chunk.obj 로 frame에 접근).
+    integrity는 hash combo의 chunk digest 방식 (cccm_integrity.resolve_integrity 결과).
+    """
+    compressor = stream_compressors[comp_method](level)
+    pending = bytearray()
+    index = 0
+
+    def emit(chunk, last):
+        start = time.perf_counter()
+        size = encrypted_size(enc_method, len(chunk))
+        if new_buffer is not None:
+            _, encrypted = new_buffer(size)
+        else:
+            encrypted = memoryview(bytearray(size))
+        encrypt_chunk_into(enc_method, chunk, encrypted, sequence, index, last)
+        timing["encryption_time"] += time.perf_counter() - start
+        digest = None
+        if hash_option != "none":
+            start = time.perf_counter()
+            digest = compute_digest(integrity, encrypted)
+            timing["hash_time"] += time.perf_counter() - start
+        timing["compressed_size"] += len(chunk)
+        timing["chunks"] += 1
+        return index, last, encrypted, digest
+
+    def take(size, last=False):
+        # pending 앞부분을 memoryview로 바로 암호화한 뒤 제거 (bytes slice 복사 없음).
+        # view가 남아 있으면 bytearray 크기를 바꿀 수 없으므로 del 전에 release
+        view = memoryview(pending)
+        chunk = view[:size]
+        try:
+            return emit(chunk, last)
+        finally:
+            chunk.release()
+            view.release()
+            del pending[:size]
+
+    for block in blocks:
+        start = time.perf_counter()
+        pending += compressor.compress(block)
+        timing["compress_time"] += time.perf_counter() - start
+        while len(pending) >= chunk_size:
+            yield take(chunk_size)
+            index += 1
+
+    start = time.perf_counter()
+    pending += compressor.flush()
+    timing["compress_time"] += time.perf_counter() - start
+    while len(pending) > chunk_size:
+        yield take(chunk_size)
+        index += 1
+    yield take(len(pending), True)
+
+
+class _StreamState:
+    def __init__(self, comp_method):
+        self.lock = threading.Lock()
+        self.decompressor = stream_decompressors[comp_method]()
+        self.next_index = 0
+        self.pending = {}
+        self.first_receive = None
+        self.last_receive = None
+        self.created = time.monotonic()
+        self.hash_time = 0.0
+        self.decryption_time = 0.0
+        self.decompress_time = 0.0
+        self.msize = 0
+        self.size = 0
+        self.done = False
+
+
+class StreamAssembler:
+    """sequence별 chunk를 순서대로 복호화/해제. 복원된 데이터는 보관하지 않고 크기만 계산.
+
+    chunk 유실 / publisher 중단으로 끝나지 않는 sequence는 max_age 초가 지나거나
+    진행 중 sequence가 max_streams 개를 넘으면 (오래된 것부터) 버리고 incomplete로 출력 (메모리 상한).
+    """
+
+    def __init__(self, max_age=60.0, max_streams=64):
+        self.max_age = max_age
+        self.max_streams = max_streams
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def add_chunk(self, metadata, data, comp_method, enc_method, hash_flag, receive_time):
+        """마지막 chunk까지 처리되면 합산 metadata 반환, 아니면 None.
+        검사 / 복호화 / 해제 실패 시 해당 sequence 상태를 버리고 예외를 그대로 전달"""
+        seq = metadata["sequence"]
+        with self._lock:
+            state = self._streams.get(seq)
+            if state is None:
+                self._evict(time.monotonic())
+                state = self._streams[seq] = _StreamState(comp_method)
+
+        with state.lock:
+            if state.first_receive is None or receive_time < state.first_receive:
+                state.first_receive = receive_time
+            if state.last_receive is None or receive_time > state.last_receive:
+                state.last_receive = receive_time
+            state.pending[metadata["chunk"]] = (metadata, data)
+            try:
+                while state.next_index in state.pending:
+                    chunk_meta, chunk = state.pending.pop(state.next_index)
+                    self._process(state, chunk_meta, chunk, enc_method, hash_flag)
+                    state.next_index += 1
+                    if chunk_meta["last"]:
+                        state.done = True
+            except Exception:
+                self.discard(seq)
+                raise
+            if not state.done:
+                return None
+
+        with self._lock:
+            self._streams.pop(seq, None)
+        result = dict(metadata)
+        for k in ("chunk", "last", "hash"):
+            result.pop(k, None)
+        result.update({
+            "stream": True,
+            "chunks": state.next_index,
+            "msize": state.msize,
+            "subscribe_time": state.first_receive,
+            "subscribe_end_time": state.last_receive,
+            "hash_time": state.hash_time,
+            "decryption_time": state.decryption_time,
+            "decompress_time": state.decompress_time,
+            "size": state.size,
+        })
+        return result
+
+    def _process(self, state, metadata, data, enc_method, hash_flag):
+        state.msize += len(data)
+        if hash_flag != "none":
+            start = time.perf_counter()
+            valid = verify_digest(metadata["integrity"], data, metadata.get("hash"), enc_method)
+            state.hash_time += time.perf_counter() - start
+            if not valid:
+                raise ValueError(f"Hash mismatch in seq={metadata['sequence']} chunk={metadata['chunk']}")
+        start = time.perf_counter()
+        plain = decrypt_chunk(enc_method, data, metadata["sequence"], metadata["chunk"], metadata["last"])
+        state.decryption_time += time.perf_counter() - start
+        start = time.perf_counter()
+        state.size += len(state.decompressor.decompress(plain))
+        state.decompress_time += time.perf_counter() - start
+
+    def _evict(self, now):
+        """self._lock 안에서 호출. 오래된 / 초과 sequence 제거"""
+        expired = [seq for seq, state in self._streams.items() if now - state.created > self.max_age]
+        excess = len(self._streams) - len(expired) - self.max_streams + 1
+        if excess > 0:
+            alive = sorted((state.created, seq) for seq, state in self._streams.items() if seq not in expired)
+            expired += [seq for _, seq in alive[:excess]]
+        for seq in expired:
+            state = self._streams.pop(seq)
+            self.evicted += 1
+            print(f"[WARN] Incomplete stream evicted: seq={seq}, chunks={state.next_index} processed + "
+                  f"{len(state.pending)} pending, age={now - state.created:.1f} sec")
+
+    def pending_streams(self):
+        with self._lock:
+            return len(self._streams)
+
+    def discard(self, sequence):
+        with self._lock:
+            self._streams.pop(sequence, None)
@@ -0,0 +1,157 @@
+# subscriber 메시지 처리 엔진 (bounded queue + thread pool / process pool)
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+POLICY_BLOCK = "block"
+POLICY_DROP_OLDEST = "drop-oldest"
+POLICY_PAUSE = "pause"
+BACKPRESSURE_POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_PAUSE)
+
+_STOP = object()
+
+
+def start_process_pool(workers, start_method=None):
+    """생성 직후 worker를 시작한 ProcessPoolExecutor.
+    ProcessPoolExecutor는 첫 submit() 때 worker를 만든다. fork(Linux 기본)는 이때 worker를 모두 fork하므로,
+    그 사이 시작된 thread의 lock이 worker에 복사되지 않도록 job 1개로 미리 시작해 둔다.
+    start_method None(fork)은 thread를 시작하기 전에만 사용하고, thread가 이미 실행 중이면 safe_start_method()"""
+    context = multiprocessing.get_context(start_method) if start_method else None
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    executor.submit(int).result()
+    return executor
+
+
+def safe_start_method():
+    """thread 실행 중에도 안전한 start method (fork 하지 않음)"""
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class _Lane:
+    """bounded queue 1개와 그 queue를 소비하는 dispatcher thread들"""
+
+    def __init__(self, name, maxsize, low_watermark):
+        self.name = name
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.low_watermark = low_watermark
+        self.drained = threading.Event()
+        self.drained.set()
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.threads = []
+
+
+class MessageEngine:
+    """process_message 실행 엔진.
+
+    handler(payload, receive_time, queue_info) 는 metadata(dict), metadata list (batch message) 또는 None을 반환하고,
+    on_result(metadata) 는 dispatcher thread에서 metadata마다 호출된다.
+    is_heavy(payload) 가 True인 메시지는 process pool로 보낸다 (process_workers > 0 일 때).
+    process pool은 paho / monitor thread가 이미 실행 중일 때 만들어지므로 fork 대신 forkserver(spawn)로 생성한다.
+    """
+
+    def __init__(self, handler, on_result, thread_workers=4, process_workers=0,
+                 queue_size=256, policy=POLICY_BLOCK, low_watermark=None, is_heavy=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unsupported backpressure policy: {policy}")
+        if thread_workers < 1:
+            raise ValueError("thread_workers must be >= 1")
+        self.handler = handler
+        self.on_result = on_result
+        self.policy = policy
+        self.is_heavy = is_heavy
+        if low_watermark is None:
+            low_watermark = queue_size // 4
+        self.light = _Lane("thread", queue_size, low_watermark)
+        self.heavy = None
+        self.executor = None
+        if process_workers > 0 and is_heavy is not None:
+            self.heavy = _Lane("process", queue_size, low_watermark)
+            self.executor = start_process_pool(process_workers, safe_start_method())
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+
+    def start(self):
+        for i in range(self.thread_workers):
+            self._spawn(self.light, self._run_inline, i)
+        if self.heavy is not None:
+            for i in range(self.process_workers):
+                self._spawn(self.heavy, self._run_process, i)
+
+    def _spawn(self, lane, target, index):
+        t = threading.Thread(target=self._dispatch, args=(lane, target),
+                             name=f"{lane.name}-worker-{index}", daemon=True)
+        t.start()
+        lane.threads.append(t)
+
+    def submit(self, payload, receive_time):
+        """paho network thread(on_message)에서 호출"""
+        lane = self.light
+        if self.heavy is not None and self.is_heavy(payload):
+            lane = self.heavy
+        depth = lane.queue.qsize()
+        item = (payload, receive_time, time.perf_counter(), depth)
+
+        if self.policy == POLICY_DROP_OLDEST:
+            while True:
+                try:
+                    lane.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        lane.queue.get_nowait()
+                        with lane.dropped_lock:
+                            lane.dropped += 1
+                    except queue.Empty:
+                        pass
+        elif self.policy == POLICY_PAUSE and lane.queue.full():
+            # paho loop를 멈추고 low watermark까지 비워질 때까지 대기 (hysteresis)
+            while lane.queue.qsize() > lane.low_watermark:
+                lane.drained.clear()
+                lane.drained.wait(0.05)
+        lane.queue.put(item)
+
+    def _dispatch(self, lane, target):
+        while True:
+            item = lane.queue.get()
+            if item is _STOP:
+                break
+            payload, receive_time, enqueue_time, depth = item
+            queue_info = {
+                "queue_depth": depth,
+                "queue_wait_time": time.perf_counter() - enqueue_time,
+                "queue_dropped": lane.dropped,
+                "worker": lane.name,
+            }
+            if lane.queue.qsize() <= lane.low_watermark:
+                lane.drained.set()
+            try:
+                metadata = target(payload, receive_time, queue_info)
+            except Exception as e:
+                print(f"Error processing message: {e}")
+                continue
+            if metadata is None:
+                continue
+            for record in metadata if isinstance(metadata, list) else (metadata,):
+                self.on_result(record)
+
+    def _run_inline(self, payload, receive_time, queue_info):
+        return self.handler(payload, receive_time, queue_info)
+
+    def _run_process(self, payload, receive_time, queue_info):
+        return self.executor.submit(self.handler, payload, receive_time, queue_info).result()
+
+    def stop(self):
+        """대기 중인 메시지를 모두 처리한 뒤 종료"""
+        for lane in (self.light, self.heavy):
+            if lane is None:
+                continue
+            lane.drained.set()
+            for _ in lane.threads:
+                lane.queue.put(_STOP)
+            for t in lane.threads:
+                t.join()
+        if self.executor is not None:
+            self.executor.shutdown()
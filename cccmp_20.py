@@ -1,112 +1,116 @@
-import base64
-import hashlib
-import time
-import random
-import string
-import zlib
-import gzip
-import bz2
-import lzma
-import lz4.frame
-import snappy
-import json
 import os
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+import time
+import threading
+from collections import deque
 import paho.mqtt.client as mqtt
-from speck import SpeckCipher
-import ascon
 import pping
-import configparser
-from cccm_sinario import combinations_with_id
+from cccm_sinario import (combinations_with_id, get_configuration_by_id, parse_level_sweep, scenario_matrix,
+                          select_combos)
+from cccm_frame import encode_message, new_frame, write_frame_header, PAYLOAD_FORMATS, FORMAT_BINARY
+from cccm_codec import (codecs_by_id, zstd_dict_id, zstd_dict_loaded, get_compressor, effective_level, encrypted_size,
+                        encryption_into_methods)
+from cccm_stream import iter_stream_chunks, new_stream_timing, stream_compressors
+from cccm_policy import load_policy_table
+from cccm_predict import TransmissionPredictor, load_catboost_model, trained_combos
+from cccm_config import load_config
+from cccm_log import get_logger_from_config
+from cccm_corpus import open_corpus
+from cccm_integrity import INTEGRITY_MODES, INTEGRITY_NONE, combo_integrity, compute_digest
+from cccm_clock import ClockSync
+from cccm_worker import start_process_pool
+from cccm_batch import MessageBatcher, pack_batch
 
-config = configparser.ConfigParser()
-config.read('ccms.ini')
+config = load_config()
 
 # 전역 변수처럼 사용
 MQTT_BROKER = config['MQTT']['broker']
 MQTT_PORT = int(config['MQTT']['port'])
 MQTT_TOPIC = config['MQTT']['topic']
+# combo별 topic <topic>/<id> 으로 전송 (cccms_launch --route combo 로 worker마다 combo를 나눠 구독)
+COMBO_TOPICS = config.getboolean('MQTT', 'combo_topics', fallback=False)
 
-LOG_FILE = config['LOG']['log_file']
+# monitor (기본): background asyncio prober의 최신 값을 payload마다 읽음 (non-blocking)
+# legacy: loop마다 pping.average_ping (ICMP/TCP+TLS, blocking - 이전 log와 같은 pub_ping 측정 방식)
+PING_METHOD = config.get('PING', 'method', fallback='monitor')
 HASH_MISMATCH_LOG = config['LOG']['hash_mismatch_log']
 LABEL = config['TEST']['label']
 TIME_SLEEP = float(config['TEST']['time_sleep'])
 TEST_LOOP = int(config['TEST']['test_loop'])
+PAYLOAD_FORMAT = config['TEST'].get('payload_format', 'json')
+if PAYLOAD_FORMAT not in PAYLOAD_FORMATS:
+    print(f"Unsupported payload_format: {PAYLOAD_FORMAT} (use one of {PAYLOAD_FORMATS})")
+    exit(1)
 
-AES_KEY = b'\x01' * 16
-CHACHA_KEY = b'\x02' * 32
-
-SPECK_KEY = 0x123456789ABCDEF00FEDCBA987654321
-SPECK_cipher = SpeckCipher(SPECK_KEY, key_size=128, block_size=128)
-SPECK_block_size = SPECK_cipher.block_size // 8
+# sweep: 기존 방식 (payload 전체를 한번에 처리)
+# stream: 압축/암호화를 chunk 단위로 처리하고 chunk마다 별도 MQTT 메시지로 전송 (binary frame 전용)
+# adaptive: payload마다 policy table에서 현재 ping/size에 가장 가까운 추천 combo를 선택
+# predict: payload마다 학습된 model로 전 combo의 전송 시간을 예측하여 최소 combo를 선택
+# throughput: network loop thread + QoS in-flight window로 sleep 없이 연속 전송, ack 시간 / combo별 msgs/s 기록
+PUBLISH_MODE = config['TEST'].get('mode', 'sweep')
+STREAM_CHUNK_SIZE = config.getint('STREAM', 'chunk_size', fallback=65536)
+STREAM_DATA_SIZES = [int(v) for v in config.get('STREAM', 'data_sizes', fallback='1048576').split(',')]
+BATCH_DATA_SIZES = [int(v) for v in config.get('BATCH', 'data_sizes', fallback='512,2048').split(',')]
+BATCH_MESSAGES = config.getint('BATCH', 'messages', fallback=200)
+BATCH_INTERVAL = config.getfloat('BATCH', 'interval', fallback=0.001)
+BATCH_MAX_BYTES = config.getint('BATCH', 'max_bytes', fallback=65536)
+BATCH_MAX_DELAY = config.getfloat('BATCH', 'max_delay', fallback=0.05)
+BATCH_MAX_MESSAGES = config.getint('BATCH', 'max_messages', fallback=256)
+POLICY_TABLES = [p.strip() for p in config.get('POLICY', 'table', fallback='').split(',') if p.strip()]
+POLICY_ENVIRONMENT = config.get('POLICY', 'environment', fallback='')
+PREDICT_MODEL = config.get('PREDICT', 'model_file', fallback='')
+PREDICT_CACHE_SIZE = config.getint('PREDICT', 'cache_size', fallback=4096)
+# 예측 대상 combo id ("1-56"), 없으면 model 학습에 포함된 combo (cccm_predict.trained_combos)
+PREDICT_COMBOS = select_combos(config.get('PREDICT', 'combos', fallback=''))
+# payload 원본: 미리 생성한 corpus (alnum / random / sensor_json / telemetry_bin / text_log / jpeg) 를 mmap slice
+CORPUS_KIND = config.get('CORPUS', 'kind', fallback='alnum')
+CORPUS_DIR = config.get('CORPUS', 'dir', fallback='corpus')
+CORPUS_SIZE = config.getint('CORPUS', 'size', fallback=1 << 25)
+CORPUS_FILE = config.get('CORPUS', 'file', fallback='')
+CORPUS_SEED = config.getint('CORPUS', 'seed', fallback=0)
+# payload 준비(압축/암호화/hash)를 process pool에서 병렬 실행 (0 = main thread에서 순차)
+PREPARE_WORKERS = config.getint('PREPARE', 'workers', fallback=0)
+PREPARE_LOOKAHEAD = config.getint('PREPARE', 'lookahead', fallback=0)
+THROUGHPUT_QOS = config.getint('THROUGHPUT', 'qos', fallback=1)
+THROUGHPUT_INFLIGHT = config.getint('THROUGHPUT', 'inflight', fallback=20)
+THROUGHPUT_MESSAGES = config.getint('THROUGHPUT', 'messages', fallback=100)
+THROUGHPUT_ACK_TIMEOUT = config.getfloat('THROUGHPUT', 'ack_timeout', fallback=30.0)
+THROUGHPUT_REPORT = config.get('THROUGHPUT', 'report', fallback='throughput_report.csv')
+# sweep/stream mode에서 method별로 반복할 압축 level ("zlib:1,6,9; lzma:0,6"), 없으면 기본 level만
+LEVEL_SWEEP = parse_level_sweep(config.get('COMPRESS', 'sweep_levels', fallback=''))
+# hash combo의 무결성 검사 방식 (sha256 / blake2s / hmac / aead) - cccm_integrity 참고
+INTEGRITY_MODE = config.get('INTEGRITY', 'mode', fallback='sha256')
+if INTEGRITY_MODE not in INTEGRITY_MODES:
+    print(f"Unsupported integrity mode: {INTEGRITY_MODE} (use one of {INTEGRITY_MODES})")
+    exit(1)
+# subscriber 시계와의 offset 추정 (cccm_clock) -> pub log에 publish_time_corrected / clock_offset_error 기록
+CLOCK_SYNC = config.getboolean('CLOCK', 'enabled', fallback=True)
+CLOCK_INTERVAL = config.getfloat('CLOCK', 'interval', fallback=2.0)
+CLOCK_WINDOW = config.getint('CLOCK', 'window', fallback=32)
 
-ASCON_KEY = b'\x03' * 16
-ASCON_NONCE = b'\x04' * 16
+def timing_logging(mdata):
+    # background writer thread가 묶어서 기록 (메시지마다 open/close 하지 않음)
+    if clock_sync is not None:
+        clock_sync.annotate(mdata, ("publish_time", "publish_end_time"))
+    get_logger_from_config(config).log(mdata)
 
-compression_methods = {
-    "none": lambda data: data,
-    "zlib": lambda data: zlib.compress(data),
-    "gzip": lambda data: gzip.compress(data),
-    "bz2": lambda data: bz2.compress(data),
-    "lzma": lambda data: lzma.compress(data),
-    "lz4": lambda data: lz4.frame.compress(data), #.encode('utf-8'))
-    "snappy": lambda data: snappy.compress(data) 
-}
+ping_monitor = None
+clock_sync = None
+corpus = None
 
-def timing_logging(mdata):
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(mdata) + "\n")
+def payload_corpus():
+    global corpus
+    if corpus is None:
+        corpus = open_corpus(CORPUS_KIND, CORPUS_DIR, CORPUS_SIZE, CORPUS_FILE or None, CORPUS_SEED)
+    return corpus
 
 def get_netwok_status():
+    if ping_monitor is not None:
+        return ping_monitor.value
     return pping.average_ping(host=MQTT_BROKER)
 
-def encrypt_none(data):
-    return data
-
-def encrypt_aes_gcm(data):
-    nonce = os.urandom(12)
-    aesgcm = AESGCM(AES_KEY)
-    return nonce + aesgcm.encrypt(nonce, data, None)
-
-def encrypt_chacha20(data):
-    nonce = os.urandom(12)
-    chacha = ChaCha20Poly1305(CHACHA_KEY)
-    ciphertext = chacha.encrypt(nonce, data, None)
-    return nonce + ciphertext
-
-def encrypt_speck(data):
-    cipher = SPECK_cipher
-    block_size_bytes = SPECK_block_size
-    padded = data + b'\x00' * ((block_size_bytes - len(data) % block_size_bytes) % block_size_bytes)
-    encrypted_blocks = []
-    for i in range(0, len(padded), block_size_bytes):
-        block = int.from_bytes(padded[i:i+block_size_bytes], 'big')
-        encrypted = cipher.encrypt(block)
-        encrypted &= (1 << 64) - 1
-        encrypted_bytes = encrypted.to_bytes(8, 'big')
-        if len(encrypted_bytes) < block_size_bytes:
-            encrypted_bytes = b'\x00' * (block_size_bytes - len(encrypted_bytes)) + encrypted_bytes
-        encrypted_blocks.append(encrypted_bytes)
-    return b''.join(encrypted_blocks)
-
-def encrypt_ascon(data):
-    return ascon.encrypt(ASCON_KEY, ASCON_NONCE, b"", data)
-
-encryption_methods = {
-    "none": encrypt_none,
-    "AES-GCM": encrypt_aes_gcm,
-    "ChaCha20-Poly1305": encrypt_chacha20,
-   # "Speck": encrypt_speck,
-    "ASCON": encrypt_ascon
-}
-# ... (import, config, 함수 정의 부분은 동일)
-print("Broker:", MQTT_BROKER)
-publisher = mqtt.Client()
-try:
-    publisher.connect(MQTT_BROKER, MQTT_PORT, 100)
-except Exception as e:
-    print(f"Failed to connect to MQTT broker: {e}")
-    exit(1)
+def current_network_status(loop_status):
+    """monitor 사용 시 payload마다 최신 값, 아니면 loop 시작 시 측정값"""
+    return ping_monitor.value if ping_monitor is not None else loop_status
 
 sequence_number = 0
 data_sizes = [8, 16, 32, 64, 128, 256, 512, 1024, 8000, 20000, 30000, 32_768, 65_536, 131_072, 262_144, 524_288]
@@ -119,78 +123,618 @@ data_sizes = [512, 2048, 9024, 16384, 65536]
 #               2_048, 4_096, 8_192, 16_384, 32_768, 65_536, 131_072, 262_144, 524_288, 
 #               1_048_576, 2_097_152, 4_194_304, 8_388_608, 16_777_216, 33_554_432]
 #               #67_108_864, 134_217_728, 200_000_000]
-network_status = get_netwok_status()
-print(f"Network Status: {network_status} sec")
+# [TEST] data_sizes / combos 를 지정하면 위 목록 / 전체 combo 대신 사용 (cccm_bench 등)
+if config.get('TEST', 'data_sizes', fallback='').strip():
+    data_sizes = [int(v) for v in config.get('TEST', 'data_sizes').split(',')]
+SCENARIO_COMBOS = select_combos(config.get('TEST', 'combos', fallback=''))
 
-for loop in range(1, TEST_LOOP + 1):
-    network_status = get_netwok_status()
-    print(f"Loop {loop}, Network Status: {network_status} sec")  
+def publish_topic(id_value):
+    return f"{MQTT_TOPIC}/{id_value}" if COMBO_TOPICS else MQTT_TOPIC
 
-    for id_value, comp_method, enc_method, hash_option in combinations_with_id:
-        print(f"\n=== Loop:{loop}, Processing ID={id_value}, Comp={comp_method}, Enc={enc_method}, Hash={hash_option} ===")             
+def integrity_mode(enc_method, hash_option):
+    """combo의 digest 방식. hash 없는 combo는 none"""
+    return combo_integrity(INTEGRITY_MODE, enc_method, hash_option)
 
-        for size in data_sizes:
+def prepare_message(id_value, comp_method, enc_method, hash_option, size, network_status, extra=None, level=None,
+                    sequence=None, offset=None):
+    """payload 1개를 압축/암호화/hash -> (전송 data, pub metadata). 실패 시 None.
+    sequence / offset(corpus slice 위치)은 process pool에서 실행할 때 main이 미리 할당한 값.
+    stage별 wall time(*_time)과 함께 CPU time(*_cpu_time, thread 기준)을 기록 -> 병렬 실행 시에도 비교 가능"""
+    if sequence is None:
+        sequence = sequence_number
+    original_data = payload_corpus().slice(size, offset)  # zero-copy memoryview
+    compress, encrypt, _, _ = codecs_by_id[id_value]
+    if level is not None:
+        compress = get_compressor(comp_method, level)
 
-            # if sequence_number <=2104:
-            #     sequence_number += 1
-            #     continue
+    start_time = time.perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        compressed_data = compress(original_data)
+    except Exception as e:
+        print(f"Compression error: {e}")
+        return None
+    compress_time = time.perf_counter() - start_time
+    compress_cpu_time = time.thread_time() - start_cpu
+    compressed_size = len(compressed_data)
 
-            start_time = time.perf_counter()
-            original_data = ''.join(random.choices(string.ascii_letters + string.digits, k=size)).encode()
+    frame = None
+    integrity = integrity_mode(enc_method, hash_option)
+    start_enc_time = time.perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        if PAYLOAD_FORMAT == FORMAT_BINARY:
+            # frame buffer의 header 자리 뒤에 nonce + 암호문을 바로 기록 (header는 hash 계산 후 채움)
+            frame, encrypted_data = new_frame(encrypted_size(enc_method, compressed_size), integrity=integrity)
+            encryption_into_methods[enc_method](compressed_data, encrypted_data)
+        else:
+            encrypted_data = encrypt(compressed_data)
+    except Exception as e:
+        print(f"Encryption error: {e}")
+        return None
+    encryption_time = time.perf_counter() - start_enc_time
+    encryption_cpu_time = time.thread_time() - start_cpu
 
-            try:
-                compressed_data = compression_methods[comp_method](original_data)
-            except Exception as e:
-                print(f"Compression error: {e}")
-                continue
-            compress_time = time.perf_counter() - start_time
-            compressed_size = len(compressed_data)
-
-            start_enc_time = time.perf_counter()
-            try:
-                encrypted_data = encryption_methods[enc_method](compressed_data)
-            except Exception as e:
-                print(f"Encryption error: {e}")
+    metadata = {
+        "direction": "pub",
+        "id": id_value,
+        "sequence": sequence,
+        "pub_ping": network_status,
+        "compress_level": effective_level(comp_method, level),
+        "corpus": corpus.kind,
+        "compress_time": compress_time,
+        "encryption_time": encryption_time,
+        "compress_cpu_time": compress_cpu_time,
+        "encryption_cpu_time": encryption_cpu_time,
+        "payload_format": PAYLOAD_FORMAT,
+        "integrity": integrity,
+        "publish_time": time.time()
+    }
+    if extra:
+        metadata.update(extra)
+
+    hash_time = 0.0 
+    hash_cpu_time = 0.0
+    digest = None
+    if integrity != INTEGRITY_NONE:
+        # aead는 digest 없음 (cipher tag로 검사) -> hash_time은 거의 0
+        start_hash_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        digest = compute_digest(integrity, encrypted_data)
+        hash_time = time.perf_counter() - start_hash_time
+        hash_cpu_time = time.thread_time() - start_cpu
+        if digest is not None:
+            hash_value = digest.hex()
+            metadata["hash"] = hash_value
+            print("hash:", hash_value)
+
+    metadata["hash_time"] = hash_time
+    metadata["hash_cpu_time"] = hash_cpu_time
+    if comp_method == "zstd-dict":
+        metadata["zstd_dict_id"] = zstd_dict_id(compressed_data)
+
+    if frame is not None:
+        send_data = write_frame_header(frame, id_value, sequence, digest, integrity=integrity)
+    else:
+        send_data = encode_message(id_value, sequence, encrypted_data, digest, PAYLOAD_FORMAT, integrity)
+    return send_data, metadata
+
+def _prepare_job(job):
+    # process pool worker에서 실행 (corpus는 worker process에서 mmap으로 다시 열림)
+    try:
+        prepared = prepare_message(**job)
+    except Exception as e:
+        print(f"Prepare error (seq={job['sequence']}): {e}")
+        return None
+    if prepared is not None:
+        prepared[1]["prepare_pid"] = os.getpid()
+    return prepared
+
+def new_job(id_value, comp_method, enc_method, hash_option, size, network_status, extra=None, level=None):
+    """prepare job 생성. sequence / corpus offset을 지금 할당하고 sequence_number 증가"""
+    global sequence_number
+    job = {"id_value": id_value, "comp_method": comp_method, "enc_method": enc_method,
+           "hash_option": hash_option, "size": size, "network_status": network_status, "extra": extra,
+           "level": level, "sequence": sequence_number, "offset": payload_corpus().next_offset(size)}
+    sequence_number += 1
+    return job
+
+class Preparer:
+    """prepare job을 process pool에서 병렬 실행하고, 결과는 job 순서대로 반환 (순서 보장 publish queue).
+
+    최대 lookahead개 job을 먼저 제출해 두므로 main thread가 message N을 전송하는 동안 N+1.. 이 준비된다.
+    workers == 0 이면 main thread에서 순차 실행.
+    worker process는 생성 시 모두 fork되므로 thread(ping monitor, clock sync, paho loop, log writer)보다 먼저 만들어야 한다.
+    """
+
+    def __init__(self, workers=0, lookahead=0):
+        self.workers = workers
+        self.lookahead = lookahead or workers * 2
+        self.executor = start_process_pool(workers) if workers > 0 else None
+
+    def map(self, jobs):
+        """(job, prepare_message 결과) 를 job 순서대로 생성"""
+        if self.executor is None:
+            for job in jobs:
+                yield job, prepare_message(**job)
+            return
+        pending = deque()
+        for job in jobs:
+            pending.append((job, self.executor.submit(_prepare_job, job)))
+            if len(pending) >= self.lookahead:
+                done_job, future = pending.popleft()
+                yield done_job, future.result()
+        while pending:
+            done_job, future = pending.popleft()
+            yield done_job, future.result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+preparer = None
+
+def publish_message(publisher, id_value, comp_method, enc_method, hash_option, size, network_status, extra=None,
+                    level=None):
+    """payload 1개를 압축/암호화/hash 후 전송. extra는 pub log에 추가할 항목, level None은 기본 압축 level"""
+    prepared = prepare_message(id_value, comp_method, enc_method, hash_option, size, network_status, extra, level)
+    return publish_prepared(publisher, prepared)
+
+def publish_prepared(publisher, prepared):
+    """prepare_message 결과를 전송하고 pub log 기록"""
+    if prepared is None:
+        return False
+    send_data, metadata = prepared
+    if "prepare_pid" in metadata:
+        # process pool에서 준비된 message는 실제 전송 시각을 publish_time으로 사용
+        metadata["publish_time"] = time.time()
+    publisher.publish(publish_topic(metadata["id"]), send_data)
+    timing_logging(metadata)
+    return True
+
+def iter_original_blocks(size, block_size):
+    """원본 데이터를 block 단위 memoryview로 (corpus mmap slice, 복사 없음)"""
+    return payload_corpus().blocks(size, block_size)
+
+def publish_stream(publisher, id_value, comp_method, enc_method, hash_option, size, network_status, level=None):
+    """payload를 chunk 단위로 압축/암호화하여 chunk마다 MQTT 메시지로 전송"""
+    if comp_method not in stream_compressors:
+        print(f"Streaming not supported for compression: {comp_method}")
+        return False
+    timing = new_stream_timing()
+    publish_time = None
+    msize = 0
+    integrity = integrity_mode(enc_method, hash_option)
+    chunks = iter_stream_chunks(iter_original_blocks(size, STREAM_CHUNK_SIZE), comp_method, enc_method,
+                                hash_option, sequence_number, STREAM_CHUNK_SIZE, timing, level,
+                                new_buffer=lambda n: new_frame(n, chunk=True, integrity=integrity),
+                                integrity=integrity)
+    try:
+        for index, last, encrypted_chunk, digest in chunks:
+            # encrypted_chunk는 new_frame buffer의 data 영역 -> header만 채워서 그대로 전송
+            send_data = write_frame_header(encrypted_chunk.obj, id_value, sequence_number, digest,
+                                           chunk=index, last=last, integrity=integrity)
+            if publish_time is None:
+                publish_time = time.time()
+            publisher.publish(publish_topic(id_value), send_data)
+            msize += len(encrypted_chunk)
+    except Exception as e:
+        print(f"Stream error: {e}")
+        return False
+
+    metadata = {
+        "direction": "pub",
+        "id": id_value,
+        "sequence": sequence_number,
+        "pub_ping": network_status,
+        "compress_level": effective_level(comp_method, level),
+        "corpus": corpus.kind,
+        "compress_time": timing["compress_time"],
+        "encryption_time": timing["encryption_time"],
+        "hash_time": timing["hash_time"],
+        "payload_format": FORMAT_BINARY,
+        "integrity": integrity,
+        "stream": True,
+        "chunks": timing["chunks"],
+        "compressed_size": timing["compressed_size"],
+        "msize": msize,
+        "publish_time": publish_time,
+        "publish_end_time": time.time()
+    }
+    timing_logging(metadata)
+    return True
+
+def publish_batch(publisher, id_value, comp_method, enc_method, hash_option, records, network_status, batch_id,
+                  level=None):
+    """모은 message(records: (sequence, data, enqueue_time))를 batch frame 1개로 압축/암호화/hash 후 전송.
+    pub log는 message별로 기록 - publish_time은 message 생성(enqueue) 시각이므로 round_trip_time에 batching 대기가 포함되고,
+    stage 시간은 message 크기 비율로 나눈 값 (batch 전체 값은 batch_* 항목)"""
+    compress = codecs_by_id[id_value][0] if level is None else get_compressor(comp_method, level)
+    integrity = integrity_mode(enc_method, hash_option)
+    body = pack_batch(records)
+    try:
+        start_time = time.perf_counter()
+        compressed_data = compress(body)
+        compress_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        frame, encrypted_data = new_frame(encrypted_size(enc_method, len(compressed_data)), integrity=integrity)
+        encryption_into_methods[enc_method](compressed_data, encrypted_data)
+        encryption_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        digest = compute_digest(integrity, encrypted_data) if integrity != INTEGRITY_NONE else None
+        hash_time = time.perf_counter() - start_time
+    except Exception as e:
+        print(f"Batch error: {e}")
+        return False
+    send_data = write_frame_header(frame, id_value, batch_id, digest, integrity=integrity, batch=True)
+    publish_time = time.time()
+    publisher.publish(publish_topic(id_value), send_data)
+    publish_end_time = time.time()
+
+    total = sum(len(data) for _, data, _ in records) or 1
+    for sequence, data, enqueue_time in records:
+        share = len(data) / total
+        metadata = {
+            "direction": "pub",
+            "id": id_value,
+            "sequence": sequence,
+            "pub_ping": network_status,
+            "compress_level": effective_level(comp_method, level),
+            "corpus": corpus.kind,
+            "compress_time": compress_time * share,
+            "encryption_time": encryption_time * share,
+            "hash_time": hash_time * share,
+            "payload_format": FORMAT_BINARY,
+            "integrity": integrity,
+            "batch": batch_id,
+            "batch_messages": len(records),
+            "batch_size": len(body),
+            "batch_compressed_size": len(compressed_data),
+            "batch_msize": len(encrypted_data),
+            "batch_compress_time": compress_time,
+            "batch_encryption_time": encryption_time,
+            "batch_hash_time": hash_time,
+            "batch_wait_time": publish_time - enqueue_time,
+            "batch_publish_time": publish_time,
+            "publish_time": enqueue_time,
+            "publish_end_time": publish_end_time
+        }
+        if digest is not None:
+            metadata["hash"] = digest.hex()
+        timing_logging(metadata)
+    print(f"Published batch: ID={id_value}, Batch={batch_id}, Messages={len(records)}, Size={len(body)}, Compressed={len(compressed_data)}")
+    return True
+
+def run_batch(publisher):
+    """(combo, level, size)마다 BATCH_MESSAGES개 message를 BATCH_INTERVAL 간격으로 생성 (sensor 주기)하고,
+    max_bytes / max_messages 에 도달하거나 가장 오래된 message가 max_delay를 넘으면 batch로 묶어 전송"""
+    global sequence_number
+    batch_id = 0
+    print(f"Batch mode: max_bytes={BATCH_MAX_BYTES}, max_delay={BATCH_MAX_DELAY}, max_messages={BATCH_MAX_MESSAGES}, "
+          f"messages={BATCH_MESSAGES}, interval={BATCH_INTERVAL}")
+
+    def flush(batcher):
+        nonlocal batch_id
+        if len(batcher):
+            publish_batch(publisher, id_value, comp_method, enc_method, hash_option, batcher.take(),
+                          current_network_status(network_status), batch_id, level)
+            batch_id += 1
+
+    for loop in range(1, TEST_LOOP + 1):
+        network_status = get_netwok_status()
+        print(f"Loop {loop}, Network Status: {network_status} sec")
+        for id_value, comp_method, enc_method, hash_option, level in scenario_matrix(LEVEL_SWEEP, SCENARIO_COMBOS):
+            print(f"\n=== Loop:{loop}, Batching ID={id_value}, Comp={comp_method}, Level={effective_level(comp_method, level)}, Enc={enc_method}, Hash={hash_option} ===")
+            for size in BATCH_DATA_SIZES:
+                batcher = MessageBatcher(BATCH_MAX_BYTES, BATCH_MAX_DELAY, BATCH_MAX_MESSAGES)
+                start = time.time()
+                for i in range(BATCH_MESSAGES):
+                    batcher.add(sequence_number, payload_corpus().slice(size), time.time())
+                    sequence_number += 1
+                    if batcher.full():
+                        flush(batcher)
+                    # 다음 message 생성 전에 지연 budget이 끝나면 먼저 전송
+                    next_time = start + (i + 1) * BATCH_INTERVAL
+                    deadline = batcher.deadline()
+                    if deadline is not None and deadline <= next_time:
+                        time.sleep(max(0.0, deadline - time.time()))
+                        flush(batcher)
+                    time.sleep(max(0.0, next_time - time.time()))
+                flush(batcher)
+                time.sleep(TIME_SLEEP)
+
+def run_selected(publisher, choose):
+    """payload마다 choose(size, network_status) -> (combo id, extra) 로 combo를 골라 전송"""
+    global sequence_number
+    for loop in range(1, TEST_LOOP + 1):
+        network_status = get_netwok_status()
+        print(f"Loop {loop}, Network Status: {network_status} sec")
+
+        for size in data_sizes:
+            network_status = current_network_status(network_status)
+            id_value, extra = choose(size, network_status)
+            comp_method, enc_method, hash_option = get_configuration_by_id(id_value)
+            if not publish_message(publisher, id_value, comp_method, enc_method, hash_option, size, network_status, extra):
                 continue
-            encryption_time = time.perf_counter() - start_enc_time
-
-            metadata = {
-                "direction": "pub",
-                "id": id_value,
-                "sequence": sequence_number,
-                "pub_ping": network_status,
-                "compress_time": compress_time,
-                "encryption_time": encryption_time,
-                "publish_time": time.time()
-            }
-
-            hash_time = 0.0 
-            hash_value = None
-            if hash_option != "none":
-                start_hash_time = time.perf_counter()
-                hash_value = hashlib.sha256(encrypted_data).hexdigest()
-                hash_time = time.perf_counter() - start_hash_time
-                metadata["hash"] = hash_value
-                metadata["hash_time"] = hash_time
-                print("hash:", hash_value)
-
-            meta_set = {
-                "id": id_value,
-                "sequence": sequence_number,
-                "hash": hash_value,
-            }
-            metadata["hash_time"] = hash_time
-
-            topic = MQTT_TOPIC # #f"iot/data/{id_value}"
-            payload = {
-                "metadata": meta_set,
-                "data": base64.b64encode(encrypted_data).decode()
-            }
-            send_data = json.dumps(payload).encode()
-            publisher.publish(topic, send_data)
-            timing_logging(metadata)
-            print(f"Published: ID={id_value}, Method={comp_method}, Encryption={enc_method}, Size={size}, Seq={sequence_number}")
+            print(f"Published ({PUBLISH_MODE}): ID={id_value}, Method={comp_method}, Encryption={enc_method}, Size={size}, Seq={sequence_number}")
             time.sleep(TIME_SLEEP)
             sequence_number += 1
 
-print("Publishing completed.")
+def run_adaptive(publisher):
+    """payload마다 추천 policy의 combo로 전송 (combo id는 frame/metadata에 기록)"""
+    if not POLICY_TABLES:
+        print("No [POLICY] table configured for adaptive mode.")
+        exit(1)
+    policy = load_policy_table(POLICY_TABLES)
+    environment = POLICY_ENVIRONMENT or policy.environments[0]
+    if environment not in policy.environments:
+        print(f"No policy for environment {environment}")
+        exit(1)
+    print(f"Policy tables: {POLICY_TABLES}, environment: {environment}")
+
+    def choose(size, network_status):
+        return policy.lookup(environment, network_status, size), {"policy_environment": environment}
+
+    run_selected(publisher, choose)
+
+def run_predict(publisher):
+    """payload마다 예측 전송 시간이 최소인 combo로 전송. 예측 지연 시간도 기록"""
+    if not PREDICT_MODEL:
+        print("No [PREDICT] model_file configured for predict mode.")
+        exit(1)
+    start = time.perf_counter()
+    predictor = TransmissionPredictor(load_catboost_model(PREDICT_MODEL), cache_size=PREDICT_CACHE_SIZE,
+                                      combos=PREDICT_COMBOS)
+    print(f"Model loaded: {PREDICT_MODEL} ({time.perf_counter() - start:.3f} sec)")
+    trained = {combo[0] for combo in trained_combos()}
+    untrained = [combo[0] for combo in predictor.combos if combo[0] not in trained]
+    if untrained:
+        print(f"[WARN] [PREDICT] combos not in the model training data (predictions are unreliable): {untrained}")
+
+    def choose(size, network_status):
+        id_value, predicted = predictor.best_combo(size, network_status)
+        print(f"Predicted: ID={id_value}, T={predicted:.6f} sec, latency={predictor.last_latency * 1e3:.3f} ms, "
+              f"cache hit/miss={predictor.hits}/{predictor.misses}")
+        return id_value, {"predicted_time": predicted, "predict_time": predictor.last_latency}
+
+    run_selected(publisher, choose)
+
+class PublishWindow:
+    """최대 size개 message만 ack 대기 상태로 두는 전송 window.
+
+    on_publish (network loop thread) 는 ack 시각 기록과 slot 반환만 하고,
+    pub log 기록은 main thread의 collect()가 mid로 매칭해서 처리 (ack가 publish() 반환보다 먼저 와도 됨).
+    drain timeout으로 포기한 message는 slot을 그때 반환하고 mid를 만료 처리 -> 늦게 온 ack는 무시
+    (paho mid는 65535 이후 재사용되므로 남은 ack가 같은 mid의 다음 message를 바로 ack 처리하지 않도록).
+    paho는 자체 lock을 잡은 채 on_publish를 호출하므로 publish() 호출 중에는 _acked lock을 잡지 않는다.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.Semaphore(size)
+        self._acks = {}          # mid -> ack 시각 (loop thread가 기록)
+        self._pending = {}       # mid -> pub metadata (main thread 전용)
+        self._expired = set()    # timeout으로 포기한 mid (slot 반환 완료)
+        self._acked = threading.Condition()
+
+    def on_publish(self, client, userdata, mid, *args):
+        with self._acked:
+            if mid in self._expired:
+                self._expired.discard(mid)
+                return
+            self._acks[mid] = time.time()
+            self._acked.notify_all()
+        self._slots.release()
+
+    def send(self, publisher, topic, send_data, qos, metadata):
+        wait_start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            print(f"No free in-flight slot after {self.timeout} sec, seq={metadata['sequence']} skipped")
+            return None
+        metadata["window_wait"] = time.perf_counter() - wait_start
+        metadata["publish_time"] = time.time()
+        info = publisher.publish(topic, send_data, qos)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self._slots.release()
+            print(f"Publish failed: {mqtt.error_string(info.rc)}")
+            return None
+        with self._acked:
+            # 만료된 mid가 재사용되면 이후 ack는 이 message의 것
+            self._expired.discard(info.mid)
+        self._pending[info.mid] = metadata
+        return self.collect()
+
+    def collect(self):
+        """ack 받은 message의 pub log 기록, 완료된 metadata 목록 반환"""
+        done = []
+        with self._acked:
+            acked = [mid for mid in self._pending if mid in self._acks]
+            ack_times = [self._acks.pop(mid) for mid in acked]
+        for mid, ack_time in zip(acked, ack_times):
+            metadata = self._pending.pop(mid)
+            metadata["ack_time"] = ack_time
+            metadata["ack_latency"] = ack_time - metadata["publish_time"]
+            timing_logging(metadata)
+            done.append(metadata)
+        return done
+
+    def drain(self, timeout):
+        """모든 message의 ack를 기다림. timeout 후 남은 message는 ack 없이 기록하고 slot 반환"""
+        done = self.collect()
+        deadline = time.monotonic() + timeout
+        while self._pending:
+            with self._acked:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not any(mid in self._acks for mid in self._pending):
+                    self._acked.wait(remaining)
+            done += self.collect()
+        with self._acked:
+            # 마지막 collect와 만료 처리 사이에 ack가 끼어들지 않도록 lock 안에서 (Condition은 RLock)
+            done += self.collect()
+            expired = list(self._pending)
+            self._expired.update(expired)
+            self._acks.clear()
+        for mid in expired:
+            metadata = self._pending.pop(mid)
+            print(f"No ack for seq={metadata['sequence']} (mid={mid})")
+            metadata["ack_time"] = None
+            timing_logging(metadata)
+            self._slots.release()
+        self._pending.clear()
+        return done
+
+def throughput_report(record):
+    get_logger_from_config(config, THROUGHPUT_REPORT, "csv").log(record)
+
+def run_throughput(publisher):
+    """sleep 없이 연속 전송. network loop가 message N을 보내는 동안 main thread (또는 preparer pool)가 N+1을 준비하고,
+    ack 대기 message 수는 in-flight window로 제한. (combo, level, size)마다 msgs/s, bytes/s 기록"""
+    window = PublishWindow(THROUGHPUT_INFLIGHT, THROUGHPUT_ACK_TIMEOUT)
+    publisher.on_publish = window.on_publish
+    publisher.loop_start()
+    print(f"Throughput mode: QoS={THROUGHPUT_QOS}, inflight={THROUGHPUT_INFLIGHT}, messages={THROUGHPUT_MESSAGES}")
+    try:
+        for loop in range(1, TEST_LOOP + 1):
+            network_status = get_netwok_status()
+            print(f"Loop {loop}, Network Status: {network_status} sec")
+            for id_value, comp_method, enc_method, hash_option, level in scenario_matrix(LEVEL_SWEEP, SCENARIO_COMBOS):
+                for size in data_sizes:
+                    done = []
+                    sent_count = 0
+                    failed = 0              # prepare / publish 실패 (나머지 message는 계속 전송)
+                    wire_bytes = 0
+                    first_publish = None
+                    jobs = (new_job(id_value, comp_method, enc_method, hash_option, size,
+                                    current_network_status(network_status), {"qos": THROUGHPUT_QOS}, level)
+                            for _ in range(THROUGHPUT_MESSAGES))
+                    for job, prepared in preparer.map(jobs):
+                        if prepared is None:
+                            failed += 1
+                            continue
+                        send_data, metadata = prepared
+                        metadata["msize"] = len(send_data)
+                        sent = window.send(publisher, publish_topic(id_value), send_data, THROUGHPUT_QOS, metadata)
+                        if sent is None:
+                            failed += 1
+                            continue
+                        done += sent
+                        sent_count += 1
+                        wire_bytes += len(send_data)
+                        if first_publish is None:
+                            first_publish = metadata["publish_time"]
+                    done += window.drain(THROUGHPUT_ACK_TIMEOUT)
+                    if not done:
+                        print(f"[WARN] ID={id_value}, Size={size}: no acked messages ({failed} failed)")
+                        continue
+                    elapsed = max(m["ack_time"] for m in done) - first_publish
+                    record = {
+                        "loop": loop, "id": id_value, "compress_method": comp_method,
+                        "compress_level": effective_level(comp_method, level), "encryption_type": enc_method,
+                        "hash": hash_option, "size": size, "qos": THROUGHPUT_QOS, "inflight": THROUGHPUT_INFLIGHT,
+                        "sent": sent_count, "failed": failed, "acked": len(done), "elapsed": elapsed,
+                        "msgs_per_sec": len(done) / elapsed if elapsed > 0 else 0.0,
+                        "bytes_per_sec": wire_bytes / elapsed if elapsed > 0 else 0.0,
+                        "payload_bytes_per_sec": size * len(done) / elapsed if elapsed > 0 else 0.0,
+                        "ack_latency_mean": sum(m["ack_latency"] for m in done) / len(done),
+                        "pub_ping": network_status,
+                    }
+                    throughput_report(record)
+                    print(f"ID={id_value}, Comp={comp_method}/{record['compress_level']}, Enc={enc_method}, "
+                          f"Size={size}: {record['msgs_per_sec']:.1f} msg/s, {record['bytes_per_sec'] / 1e6:.3f} MB/s "
+                          f"({len(done)}/{sent_count} acked, {failed} failed)")
+    finally:
+        publisher.loop_stop()
+
+def run_publisher(publisher):
+    global sequence_number
+    if PUBLISH_MODE == "throughput":
+        return run_throughput(publisher)
+    if PUBLISH_MODE == "adaptive":
+        return run_adaptive(publisher)
+    if PUBLISH_MODE == "predict":
+        return run_predict(publisher)
+    if PUBLISH_MODE == "batch":
+        return run_batch(publisher)
+    if PUBLISH_MODE == "stream":
+        publish, sizes = publish_stream, STREAM_DATA_SIZES
+    else:
+        publish, sizes = publish_message, data_sizes
+
+    network_status = get_netwok_status()
+    print(f"Network Status: {network_status} sec")
+
+    for loop in range(1, TEST_LOOP + 1):
+        network_status = get_netwok_status()
+        print(f"Loop {loop}, Network Status: {network_status} sec")  
+
+        for id_value, comp_method, enc_method, hash_option, level in scenario_matrix(LEVEL_SWEEP, SCENARIO_COMBOS):
+            print(f"\n=== Loop:{loop}, Processing ID={id_value}, Comp={comp_method}, Level={effective_level(comp_method, level)}, Enc={enc_method}, Hash={hash_option} ===")
+
+            if publish is publish_message:
+                # size별 payload를 preparer에서 미리 준비하고 순서대로 전송
+                jobs = (new_job(id_value, comp_method, enc_method, hash_option, size,
+                                current_network_status(network_status), level=level) for size in sizes)
+                for job, prepared in preparer.map(jobs):
+                    if not publish_prepared(publisher, prepared):
+                        continue
+                    print(f"Published: ID={id_value}, Method={comp_method}, Encryption={enc_method}, Size={job['size']}, Seq={job['sequence']}")
+                    time.sleep(TIME_SLEEP)
+                continue
+
+            for size in sizes:
+
+                # if sequence_number <=2104:
+                #     sequence_number += 1
+                #     continue
+
+                network_status = current_network_status(network_status)
+                if not publish(publisher, id_value, comp_method, enc_method, hash_option, size, network_status, level=level):
+                    continue
+                print(f"Published: ID={id_value}, Method={comp_method}, Encryption={enc_method}, Size={size}, Seq={sequence_number}")
+                time.sleep(TIME_SLEEP)
+                sequence_number += 1
+
+def main():
+    global ping_monitor, preparer, clock_sync
+    print("Broker:", MQTT_BROKER, "Payload format:", PAYLOAD_FORMAT, "Mode:", PUBLISH_MODE)
+    print(f"Payload corpus: {payload_corpus().kind} ({len(payload_corpus())} bytes, {payload_corpus().path})")
+    if not zstd_dict_loaded() and any(combo[1] == "zstd-dict" for combo in SCENARIO_COMBOS or combinations_with_id):
+        print("[WARN] zstd-dict combos run without a dictionary ([COMPRESS] zstd_dict), compressed like plain zstd")
+    # worker process는 network / monitor thread를 시작하기 전에 생성 (Preparer가 생성 시 worker를 모두 fork)
+    preparer = Preparer(PREPARE_WORKERS, PREPARE_LOOKAHEAD)
+    if PREPARE_WORKERS:
+        print(f"Payload preparation: {PREPARE_WORKERS} processes, lookahead {preparer.lookahead}")
+    if PING_METHOD == "monitor":
+        ping_monitor = pping.PingMonitor(MQTT_BROKER).start()
+    publisher = mqtt.Client()
+    if PUBLISH_MODE == "throughput":
+        # paho 자체 in-flight 제한도 window와 맞춤 (connect 전에만 설정 가능)
+        publisher.max_inflight_messages_set(THROUGHPUT_INFLIGHT)
+    try:
+        publisher.connect(MQTT_BROKER, MQTT_PORT, 100)
+    except Exception as e:
+        print(f"Failed to connect to MQTT broker: {e}")
+        exit(1)
+
+    if CLOCK_SYNC:
+        clock_sync = ClockSync(MQTT_BROKER, MQTT_PORT, MQTT_TOPIC, CLOCK_INTERVAL, CLOCK_WINDOW).start()
+
+    try:
+        run_publisher(publisher)
+    finally:
+        preparer.close()
+        if ping_monitor is not None:
+            ping_monitor.stop()
+        if clock_sync is not None:
+            offset, error = clock_sync.estimate()
+            print(f"Clock offset (sub - pub): {offset} sec, error: {error} sec")
+            clock_sync.stop()
+    print("Publishing completed.")
+
+if __name__ == "__main__":
+    main()
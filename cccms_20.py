@@ -1,111 +1,210 @@
-import hashlib
 import time
-import zlib
-import gzip
-import bz2
-import lzma
-import lz4.frame
-import snappy
 import json
 import threading
 import os
 import paho.mqtt.client as mqtt
 import matplotlib.pyplot as plt
 from collections import defaultdict
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
-from speck import SpeckCipher
-import ascon
-import base64
 import pping
-import configparser
-from cccm_sinario import combinations_with_id, get_configuration_by_id
+from cccm_sinario import get_configuration_by_id
+from cccm_frame import decode_message, peek_combo_id, is_batch_frame, is_chunk_frame, unpack_frame
+from cccm_batch import iter_batch
+from cccm_stream import StreamAssembler
+from cccm_worker import MessageEngine, BACKPRESSURE_POLICIES
+from cccm_codec import codecs_by_id, zstd_dict_id
+from cccm_config import load_config
+from cccm_log import get_logger_from_config
+from cccm_integrity import INTEGRITY_MODES, combo_integrity, compute_digest, verify_digest
+from cccm_clock import ClockResponder, annotate_reference
+from cccm_metrics import LatencyMetrics, MetricsServer
 
-config = configparser.ConfigParser()
-config.read('ccms.ini')
+config = load_config()
 
 MQTT_BROKER = config['MQTT']['broker']
 MQTT_PORT = int(config['MQTT']['port'])
 MQTT_TOPIC = config['MQTT']['topic']
+# 구독 topic filter (','로 구분, 비우면 topic). cccms_launch가 worker마다 $share/<group>/... 또는 combo topic 목록을 지정
+SUBSCRIBE_TOPICS = [t.strip() for t in config.get('MQTT', 'subscribe', fallback='').split(',') if t.strip()] or [MQTT_TOPIC]
 
-LOG_FILE = config['LOG']['log_file']
 HASH_MISMATCH_LOG = config['LOG']['hash_mismatch_log']
 LABEL = config['TEST']['label']
+PING_METHOD = config.get('PING', 'method', fallback='monitor')
+# publisher의 시계 offset 추정 request에 응답 (subscriber 시계가 기준)
+CLOCK_SYNC = config.getboolean('CLOCK', 'enabled', fallback=True)
+# publisher와 같은 무결성 검사 방식. frame이 선언한 방식이 이 설정과 다르면 거부 (aead 선언으로 MAC 검사 생략 방지)
+INTEGRITY_MODE = config.get('INTEGRITY', 'mode', fallback='sha256')
+if INTEGRITY_MODE not in INTEGRITY_MODES:
+    print(f"Unsupported integrity mode: {INTEGRITY_MODE} (use one of {INTEGRITY_MODES})")
+    exit(1)
+# combo / stage별 실시간 latency histogram (/metrics endpoint, 주기 snapshot)
+METRICS_ENABLED = config.getboolean('METRICS', 'enabled', fallback=True)
+METRICS_HOST = config.get('METRICS', 'host', fallback='127.0.0.1')
+METRICS_PORT = config.getint('METRICS', 'port', fallback=9108)
+METRICS_INTERVAL = config.getfloat('METRICS', 'snapshot_interval', fallback=30.0)
+METRICS_FILE = config.get('METRICS', 'snapshot_file', fallback='metrics_snapshot.jsonl')
 
-AES_KEY = b'\x01' * 16
-CHACHA_KEY = b'\x02' * 32
-SPECK_KEY = 0x123456789ABCDEF00FEDCBA987654321
-SPECK_cipher = SpeckCipher(SPECK_KEY, key_size=128, block_size=128)
-SPECK_block_size = SPECK_cipher.block_size // 8
-ASCON_KEY = b'\x03' * 16
-ASCON_NONCE = b'\x04' * 16
-
-decompression_methods = {
-    "none": lambda data: data,
-    "zlib": lambda data: zlib.decompress(data),
-    "gzip": lambda data: gzip.decompress(data),
-    "bz2": lambda data: bz2.decompress(data),
-    "lzma": lambda data: lzma.decompress(data),
-    "lz4": lambda data: lz4.frame.decompress(data),
-    "snappy": lambda data: snappy.uncompress(data)
-}
+# 끝나지 않은 stream sequence 제거 기준 (chunk 유실 / publisher 중단 시 메모리 상한)
+STREAM_MAX_AGE = config.getfloat('STREAM', 'max_age', fallback=60.0)
+STREAM_MAX_PENDING = config.getint('STREAM', 'max_pending', fallback=64)
+
+# process_message 실행 엔진 설정
+WORKER_THREADS = config.getint('WORKER', 'thread_workers', fallback=4)
+WORKER_PROCESSES = config.getint('WORKER', 'process_workers', fallback=0)
+WORKER_QUEUE_SIZE = config.getint('WORKER', 'queue_size', fallback=256)
+WORKER_BACKPRESSURE = config.get('WORKER', 'backpressure', fallback='block')
+HEAVY_COMPRESS = [m.strip() for m in config.get('WORKER', 'heavy_compress', fallback='bz2,lzma').split(',') if m.strip()]
+HEAVY_ENCRYPT = [m.strip() for m in config.get('WORKER', 'heavy_encrypt', fallback='ASCON').split(',') if m.strip()]
 
 stop_event = threading.Event()
+subscriber_failed = threading.Event()
+stream_assembler = StreamAssembler(STREAM_MAX_AGE, STREAM_MAX_PENDING)
 
 r_code_total_time = 0.0
 r_code_loop = 0
 network_status = 0.0
+ping_monitor = None
+clock_responder = None
+latency_metrics = LatencyMetrics() if METRICS_ENABLED else None
 
 # def get_netwok_status():
 #     print(MQTT_BROKER)
 #     return pping.average_ping(host=MQTT_BROKER, count=10)
 
-def decrypt_data(enc_type, encrypted_data):
+def decrypt_data(decrypt, encrypted_data):
     try:
-        if enc_type == "none":
-            return encrypted_data
-        elif enc_type == "AES-GCM":
-            nonce = encrypted_data[:12]
-            ciphertext = encrypted_data[12:]
-            aesgcm = AESGCM(AES_KEY)
-            return aesgcm.decrypt(nonce, ciphertext, None)
-        elif enc_type == "ChaCha20-Poly1305":
-            nonce = encrypted_data[:12]
-            ciphertext = encrypted_data[12:]
-            chacha = ChaCha20Poly1305(CHACHA_KEY)
-            return chacha.decrypt(nonce, ciphertext, None)
-        elif enc_type == "Speck":
-            block_size_bytes = SPECK_block_size
-            decrypted_blocks = []
-            for i in range(0, len(encrypted_data), block_size_bytes):
-                block = int.from_bytes(encrypted_data[i:i+block_size_bytes], 'big')
-                decrypted = SPECK_cipher.decrypt(block)
-                decrypted &= (1 << 64) - 1
-                decrypted_bytes = decrypted.to_bytes(block_size_bytes, 'big')
-                decrypted_blocks.append(decrypted_bytes)
-            return b''.join(decrypted_blocks).rstrip(b'\x00')
-        elif enc_type == "ASCON":
-            return ascon.decrypt(ASCON_KEY, ASCON_NONCE, b"", encrypted_data)
-        else:
-            raise ValueError(f"Unsupported encryption type: {enc_type}")
+        return decrypt(encrypted_data)
     except Exception as e:
         print(f"Decryption error: {e}")
         return None
 
 def timing_logging(mdata):
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(mdata) + "\n")
+    # background writer thread가 묶어서 기록 (메시지마다 open/close 하지 않음)
+    if CLOCK_SYNC:
+        annotate_reference(mdata, ("subscribe_time", "subscribe_end_time"))
+    get_logger_from_config(config).log(mdata)
 
 def log_hash_mismatch(metadata, actual_hash):
     metadata["actual_hash"] = actual_hash
     with open(HASH_MISMATCH_LOG, "a") as f:
         f.write(json.dumps(metadata) + "\n")
 
-def process_message(msg):
-    global r_code_total_time, r_code_loop, network_status
-    receive_time = time.time()
+def check_integrity(metadata, data, digest, enc_method, hash_flag):
+    """hash combo의 무결성 검사 -> (valid, hash_time, actual_hash).
+    frame이 선언한 mode는 설정 mode + cipher로 정해지는 기대 mode와 같아야 한다"""
+    expected = combo_integrity(INTEGRITY_MODE, enc_method, hash_flag)
+    start = time.perf_counter()
+    valid = metadata["integrity"] == expected and verify_digest(expected, data, digest, enc_method)
+    hash_time = time.perf_counter() - start
+    if valid:
+        return True, hash_time, None
+    if metadata["integrity"] != expected:
+        print(f"[WARNING] Integrity mode {metadata['integrity']} does not match expected {expected}.")
+        metadata["expected_integrity"] = expected
+    actual = compute_digest(expected, data)
+    return False, hash_time, actual.hex() if actual is not None else None
+
+def process_stream_chunk(payload, receive_time, queue_info=None):
+    """streaming chunk 처리. 마지막 chunk까지 재조립되면 sequence 단위 metadata 반환"""
+    metadata, data = unpack_frame(payload)
     try:
-        payload = msg.payload
-        parsed = json.loads(payload.decode())
+        comp_method, enc_method, hash_flag = get_configuration_by_id(metadata["id"])
+        expected = combo_integrity(INTEGRITY_MODE, enc_method, hash_flag)
+        if hash_flag != "none" and metadata["integrity"] != expected:
+            raise ValueError(f"Integrity mode {metadata['integrity']} does not match expected {expected} "
+                             f"(seq={metadata['sequence']} chunk={metadata['chunk']})")
+        result = stream_assembler.add_chunk(metadata, data, comp_method, enc_method, hash_flag, receive_time)
+    except Exception as e:
+        print(f"Error processing stream chunk: {e}")
+        stream_assembler.discard(metadata["sequence"])
+        return None
+    if result is None:
+        return None
+    result["payload_format"] = "binary"
+    result["compress_method"], result["encryption_type"] = comp_method, enc_method
+    if queue_info:
+        result.update(queue_info)
+    print(f"Received stream: id={result['id']}, Seq={result['sequence']}, Chunks={result['chunks']}, Size={result['size']}")
+    ordered_metadata = {"direction": "sub"}
+    ordered_metadata.update(result)
+    return ordered_metadata
+
+def process_batch(payload, receive_time, queue_info=None):
+    """batch frame 처리: 검사 / 복호화 / 압축 해제를 batch 단위로 1번 수행한 뒤 message별 metadata list 반환.
+    stage 시간과 msize는 message 크기 비율로 나눠 기록하고, subscribe_time은 모두 batch 수신 시각"""
+    try:
+        frame_meta, encrypted_data = unpack_frame(payload)
+        id = frame_meta["id"]
+        if id not in codecs_by_id:
+            print(f"Unsupported combo id: {id}")
+            return None
+        comp_method, enc_method, hash_flag = get_configuration_by_id(id)
+        _, _, decrypt, decompress = codecs_by_id[id]
+        expected_hash = frame_meta["hash"]
+        hash_time = 0.0
+        if hash_flag != "none":
+            valid, hash_time, actual_hash = check_integrity(frame_meta, encrypted_data, expected_hash, enc_method,
+                                                            hash_flag)
+            if not valid:
+                print(f"[WARNING] Hash mismatch! Batch {frame_meta['sequence']} may be tampered.")
+                frame_meta["hash"] = expected_hash.hex() if expected_hash is not None else None
+                log_hash_mismatch(frame_meta, actual_hash)
+                return None
+
+        decrypt_start = time.perf_counter()
+        decrypted_data = decrypt_data(decrypt, encrypted_data)
+        if decrypted_data is None:
+            print("Decryption failed. Skipping batch.")
+            return None
+        decrypt_time = time.perf_counter() - decrypt_start
+
+        decompress_start = time.perf_counter()
+        body = decompress(decrypted_data)
+        decompress_time = time.perf_counter() - decompress_start
+
+        records = list(iter_batch(body))
+    except Exception as e:
+        print(f"Error processing batch: {e}")
+        return None
+
+    total = sum(len(data) for _, data in records) or 1
+    results = []
+    for sequence, data in records:
+        share = len(data) / total
+        metadata = {
+            "direction": "sub",
+            "id": id,
+            "sequence": sequence,
+            "hash": expected_hash.hex() if expected_hash is not None else None,
+            "integrity": frame_meta["integrity"],
+            "payload_format": "binary",
+            "msize": round(len(encrypted_data) * share),
+            "batch": frame_meta["sequence"],
+            "batch_messages": len(records),
+            "batch_msize": len(encrypted_data),
+            "subscribe_time": receive_time,
+            "compress_method": comp_method,
+            "encryption_type": enc_method,
+            "hash_time": hash_time * share,
+            "decryption_time": decrypt_time * share,
+            "decompress_time": decompress_time * share,
+            "size": len(data),
+        }
+        if queue_info:
+            metadata.update(queue_info)
+        results.append(metadata)
+    print(f"Received batch: id={id}, Batch={frame_meta['sequence']}, Messages={len(records)}, Size={len(body)}")
+    return results
+
+def process_message(payload, receive_time, queue_info=None):
+    """수신 payload 1개 처리 (thread/process worker에서 실행). metadata 반환, 실패 시 None
+    (batch frame은 message별 metadata list)"""
+    if is_chunk_frame(payload):
+        return process_stream_chunk(payload, receive_time, queue_info)
+    if is_batch_frame(payload):
+        return process_batch(payload, receive_time, queue_info)
+    try:
+        # legacy JSON(base64) / binary frame 자동 판별
+        metadata, encrypted_data, msize = decode_message(payload)
 
             #         metadata = {
             #     "direction": "pub",
@@ -122,46 +221,54 @@ def process_message(msg):
             #     "hash": hash_value,
             # }
 
-        metadata = parsed["metadata"]    
-        metadata['msize'] = len(parsed["data"])    
-        encrypted_data = base64.b64decode(parsed["data"])
+        metadata['msize'] = msize
+        if queue_info:
+            metadata.update(queue_info)
   
         metadata["subscribe_time"] = receive_time
         #publish_time = metadata.get("publish_time", receive_time)
         id = int(metadata.get("id"))
+        if id not in codecs_by_id:
+            print(f"Unsupported combo id: {id}")
+            return None
         metadata["compress_method"], metadata["encryption_type"], hash_flag = get_configuration_by_id(id)
+        _, _, decrypt, decompress = codecs_by_id[id]
         metadata["hash_time"]=0.0
+        # hash는 raw digest bytes -> log에는 hex로 기록
+        expected_hash = metadata.get("hash")
+        metadata["hash"] = expected_hash.hex() if expected_hash is not None else None
         if hash_flag != "none":
-            hash_start = time.perf_counter()
-            expected_hash = metadata.get("hash")
-            actual_hash = hashlib.sha256(encrypted_data).hexdigest()
-            metadata["hash_time"] = metadata.get("hash_ptime",0.0) +  time.perf_counter() - hash_start
-            if expected_hash != actual_hash:
+            # frame / metadata에 선언된 mode가 기대 mode와 같을 때만 검사 (aead는 복호화 시 tag 검사)
+            valid, hash_time, actual_hash = check_integrity(metadata, encrypted_data, expected_hash,
+                                                            metadata["encryption_type"], hash_flag)
+            metadata["hash_time"] = metadata.get("hash_ptime",0.0) + hash_time
+            if not valid:
                 print(f"[WARNING] Hash mismatch! Message may be tampered.")
-                print(f"Expected: {expected_hash}")
+                print(f"Expected: {metadata.get('hash')}")
                 print(f"Actual:   {actual_hash}")
                 log_hash_mismatch(metadata, actual_hash)
-                return
+                return None
         else:
-            expected_hash=None
             metadata["hash_time"] = 0.0
 
         decrypt_start = time.perf_counter()
-        decrypted_data = decrypt_data(metadata["encryption_type"], encrypted_data)
+        decrypted_data = decrypt_data(decrypt, encrypted_data)
         if decrypted_data is None:
             print("Decryption failed. Skipping message.")
-            return
+            return None
         decrypt_time = time.perf_counter() - decrypt_start
         metadata["decryption_time"] = decrypt_time
 
         decompress_start = time.perf_counter()
-        decompressed_data = decompression_methods[metadata["compress_method"]](decrypted_data)
+        decompressed_data = decompress(decrypted_data)
         metadata['size'] = len(decompressed_data)
        
         decompress_time = time.perf_counter() - decompress_start
         metadata["decompress_time"] = decompress_time
+        # dict id 확인은 decompress_time에 넣지 않음 (zstd / zstd-dict 비교용)
+        if metadata["compress_method"] == "zstd-dict":
+            metadata["zstd_dict_id"] = zstd_dict_id(decrypted_data)
 
-        metadata["sub_ping"] = network_status
         #rtt = receive_time - publish_time
         #etadata["subscribe_time"] =  decrypt_time + decompress_time + metadata["hash_time"]
 
@@ -172,37 +279,88 @@ def process_message(msg):
                # id를 선두에 위치시키는 새로운 딕셔너리 생성
         ordered_metadata = {"direction": "sub"}
         ordered_metadata.update(metadata)
-        metadata = ordered_metadata
-
-        timing_logging(metadata)
+        return ordered_metadata
 
     except Exception as e:
         print(f"Error processing message: {e}")
+        return None
+
+def finish_message(metadata):
+    metadata["sub_ping"] = ping_monitor.value if ping_monitor is not None else network_status
+    if latency_metrics is not None:
+        latency_metrics.observe(metadata)
+    timing_logging(metadata)
+
+def is_heavy_message(payload):
+    """CPU 부하가 큰 combo(bz2, lzma, ASCON 등)는 process pool로 보냄"""
+    if is_chunk_frame(payload):
+        return False  # streaming 재조립 상태는 main process에만 있음
+    id_value = peek_combo_id(payload)
+    if id_value is None:
+        return False
+    comp_method, enc_method, _ = get_configuration_by_id(id_value)
+    return comp_method in HEAVY_COMPRESS or enc_method in HEAVY_ENCRYPT
+
+def create_engine():
+    if WORKER_BACKPRESSURE not in BACKPRESSURE_POLICIES:
+        raise ValueError(f"Unsupported backpressure: {WORKER_BACKPRESSURE} (use one of {BACKPRESSURE_POLICIES})")
+    return MessageEngine(process_message, finish_message,
+                         thread_workers=WORKER_THREADS,
+                         process_workers=WORKER_PROCESSES,
+                         queue_size=WORKER_QUEUE_SIZE,
+                         policy=WORKER_BACKPRESSURE,
+                         is_heavy=is_heavy_message)
 
 def on_message(client, userdata, msg):
-    threading.Thread(target=process_message, args=(msg,)).start()
+    # userdata = MessageEngine, queue 대기 시간과 처리 시간을 분리하기 위해 수신 시각을 먼저 기록
+    userdata.submit(msg.payload, time.time())
 
 def on_connect(client, userdata, flags, rc):
     print("Connected with result code", rc)
-    client.subscribe(MQTT_TOPIC)
+    client.subscribe([(topic, 0) for topic in SUBSCRIBE_TOPICS])
+    if clock_responder is not None:
+        clock_responder.subscribe()
 
 def start_subscriber(stop_event):
-    client = mqtt.Client()
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 100)
-    client.loop_start()
-    print("Subscriber started. Press Ctrl+C to stop.")
+    global clock_responder
+    engine = create_engine()
+    metrics_server = None
+    client = None
     try:
+        engine.start()
+        if latency_metrics is not None:
+            # metrics port가 이미 사용 중이면 (다른 subscriber 등) OSError -> engine 정리 후 종료
+            metrics_server = MetricsServer(latency_metrics, METRICS_HOST, METRICS_PORT, METRICS_INTERVAL,
+                                           METRICS_FILE).start()
+        client = mqtt.Client(userdata=engine)
+        if CLOCK_SYNC:
+            clock_responder = ClockResponder(client, MQTT_TOPIC)
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.connect(MQTT_BROKER, MQTT_PORT, 100)
+        client.loop_start()
+        print("Subscriber started. Press Ctrl+C to stop.")
         while not stop_event.is_set():
             time.sleep(0.1)
+    except Exception as e:
+        print(f"Subscriber error: {e}")
+        subscriber_failed.set()
     finally:
-        client.loop_stop()
-        client.disconnect()
-        print("MQTT disconnected.")
+        # 시작 실패 시 main loop도 종료
+        stop_event.set()
+        if client is not None:
+            client.loop_stop()
+            client.disconnect()
+            print("MQTT disconnected.")
+        engine.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 if __name__ == "__main__":
     #network_status = get_netwok_status()
+    if PING_METHOD == "monitor":
+        ping_monitor = pping.PingMonitor(MQTT_BROKER).start()
+        network_status = ping_monitor.value
     print(f"Loop {r_code_loop}, Network Status: {network_status} sec")
 
     subscriber_thread = threading.Thread(target=start_subscriber, args=(stop_event,))
@@ -214,4 +372,8 @@ if __name__ == "__main__":
         print("Stopping subscriber...")
         stop_event.set()
     subscriber_thread.join()
+    if ping_monitor is not None:
+        ping_monitor.stop()
     print("Subscriber stopped.")
+    if subscriber_failed.is_set():
+        exit(1)
@@ -0,0 +1,166 @@
+# subscriber 수평 확장 - cccms_20 worker process N개 (각자 MQTT client / GIL) 를 실행하고 종료 시 log / metrics를 합친다.
+#   python cccms_launch.py --workers 4                  # $share/<group>/<topic> shared subscription, broker가 message마다 분배
+#   python cccms_launch.py --workers 4 --route combo    # worker마다 combo id 일부(<topic>/<id>)를 구독 (publisher combo_topics = yes)
+# stream mode는 chunk를 한 worker가 모두 받아야 하므로 --route combo 만 허용 (shared는 chunk마다 다른 worker로 갈 수 있음).
+# 다른 node에서도 같은 --group 으로 실행하면 broker가 node 사이에도 분배한다.
+import argparse
+import configparser
+import os
+import signal
+import subprocess
+import sys
+import time
+from cccm_sinario import combinations_with_id, select_combos
+from cccm_metrics import LatencyMetrics, describe, load_snapshot
+from cccm_log import get_logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ROUTE_SHARED = "shared"
+ROUTE_COMBO = "combo"
+ROUTES = (ROUTE_SHARED, ROUTE_COMBO)
+
+
+def worker_topics(config, route, group, index, workers):
+    """worker index의 구독 filter 목록"""
+    topic = config["MQTT"]["topic"]
+    if route == ROUTE_COMBO:
+        combos = select_combos(config.get("TEST", "combos", fallback="")) or combinations_with_id
+        return [f"{topic}/{combo[0]}" for combo in combos[index::workers]]
+    if config.getboolean("MQTT", "combo_topics", fallback=False):
+        topic = f"{topic}/+"
+    return [f"$share/{group}/{topic}"]
+
+
+def write_worker_config(config, path, work_dir, index, topics, metrics_port):
+    """worker 전용 ini - 구독 filter와 log / snapshot 파일만 worker별로 바꿈"""
+    worker = configparser.ConfigParser()
+    worker.read_dict(config)
+    for section in ("MQTT", "LOG", "METRICS", "CLOCK"):
+        if not worker.has_section(section):
+            worker.add_section(section)
+    worker["MQTT"]["subscribe"] = ",".join(topics)
+    worker["LOG"]["log_file"] = os.path.join(work_dir, f"worker{index}_log.txt")
+    worker["LOG"]["hash_mismatch_log"] = os.path.join(work_dir, f"worker{index}_hash_mismatch.txt")
+    worker["METRICS"]["snapshot_file"] = os.path.join(work_dir, f"worker{index}_metrics.jsonl")
+    worker["METRICS"]["port"] = str(metrics_port + index if metrics_port else 0)
+    for key in (("LOG", "log_file"), ("LOG", "hash_mismatch_log"), ("METRICS", "snapshot_file")):
+        # 이전 실행의 worker 파일이 다시 합쳐지지 않도록 삭제
+        if os.path.exists(worker[key[0]][key[1]]):
+            os.remove(worker[key[0]][key[1]])
+    if index:
+        # 시계 offset request에는 worker 0만 응답 (중복 응답 방지)
+        worker["CLOCK"]["enabled"] = "no"
+    with open(path, "w") as f:
+        worker.write(f)
+    return worker
+
+
+def stop_processes(processes, timeout=15.0):
+    """Ctrl+C 와 같이 SIGINT 1번씩 보내고 모두 종료될 때까지 대기 (cccms_20은 KeyboardInterrupt에서 log flush).
+    worker는 별도 session이라 terminal의 Ctrl+C를 직접 받지 않으므로 flush 중에 두 번째 SIGINT를 받지 않는다"""
+    for proc in processes:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + timeout
+    for proc in processes:
+        try:
+            proc.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def append_file(source, target, skip_header=False):
+    """source 내용을 target 뒤에 추가 -> 추가한 줄 수 (csv는 target에 이미 header가 있으면 source header 생략)"""
+    if not os.path.exists(source):
+        return 0
+    lines = 0
+    has_content = os.path.exists(target) and os.path.getsize(target) > 0
+    with open(source, "r", encoding="utf-8") as src, open(target, "a", encoding="utf-8") as dst:
+        for number, line in enumerate(src):
+            if skip_header and number == 0 and has_content:
+                continue
+            dst.write(line)
+            lines += 1
+    return lines
+
+
+def aggregate(config, worker_configs):
+    """worker log / hash mismatch log를 원래 파일에 추가하고 metrics snapshot을 합산"""
+    log_file = config["LOG"]["log_file"]
+    csv_log = config.get("LOG", "log_format", fallback="jsonl") == "csv"
+    total = 0
+    for index, worker in enumerate(worker_configs):
+        records = append_file(worker["LOG"]["log_file"], log_file, skip_header=csv_log)
+        append_file(worker["LOG"]["hash_mismatch_log"], config["LOG"]["hash_mismatch_log"])
+        print(f"Worker {index}: {records} log lines")
+        total += records
+    print(f"Appended {total} log lines to {log_file}.")
+
+    metrics = LatencyMetrics()
+    for worker in worker_configs:
+        snapshot_file = worker["METRICS"]["snapshot_file"]
+        if os.path.exists(snapshot_file):
+            metrics.merge_series(load_snapshot(snapshot_file))
+    if metrics.series:
+        snapshot = metrics.snapshot()
+        snapshot.update(final=True, workers=len(worker_configs))
+        metrics_file = config.get("METRICS", "snapshot_file", fallback="metrics_snapshot.jsonl")
+        get_logger(metrics_file, "jsonl").log(snapshot)
+        print(f"Metrics (all workers): end_to_end {describe(metrics.totals('end_to_end'))}, "
+              f"decrypt {describe(metrics.totals('decrypt'))}, saved to {metrics_file}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run several cccms_20 subscribers joined by MQTT shared subscriptions")
+    parser.add_argument('--config', default=os.environ.get('CCMS_INI', 'ccms.ini'), help='base ini')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='subscriber processes')
+    parser.add_argument('--route', default=ROUTE_SHARED, choices=ROUTES,
+                        help='shared: $share/<group>/<topic>, combo: worker마다 <topic>/<id> 일부 구독')
+    parser.add_argument('--group', default='cccms', help='shared subscription group')
+    parser.add_argument('--work-dir', default=None, help='worker ini / log directory (default <log_file>_workers)')
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+
+    config = configparser.ConfigParser()
+    if not config.read(args.config):
+        parser.error(f"Cannot read {args.config}")
+    if args.route == ROUTE_SHARED and config.get("TEST", "mode", fallback="sweep") == "stream":
+        parser.error("stream mode needs --route combo (shared subscriptions split one sequence's chunks across workers)")
+    if args.route == ROUTE_COMBO and not config.getboolean("MQTT", "combo_topics", fallback=False):
+        print("[WARN] route=combo needs the publisher to send to <topic>/<id> ([MQTT] combo_topics = yes)")
+    work_dir = os.path.abspath(args.work_dir or config["LOG"]["log_file"].rsplit(".", 1)[0] + "_workers")
+    os.makedirs(work_dir, exist_ok=True)
+    metrics_port = config.getint("METRICS", "port", fallback=9108)
+
+    worker_configs, processes = [], []
+    try:
+        for index in range(args.workers):
+            topics = worker_topics(config, args.route, args.group, index, args.workers)
+            ini_path = os.path.join(work_dir, f"worker{index}.ini")
+            worker_configs.append(write_worker_config(config, ini_path, work_dir, index, topics, metrics_port))
+            out = open(os.path.join(work_dir, f"worker{index}.out"), "w")
+            env = dict(os.environ, CCMS_INI=ini_path, PYTHONUNBUFFERED="1")
+            processes.append(subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "cccms_20.py")],
+                                              env=env, stdout=out, stderr=subprocess.STDOUT,
+                                              start_new_session=True))
+            out.close()
+            print(f"Worker {index} (pid {processes[-1].pid}): {', '.join(topics)}")
+        print(f"{args.workers} subscribers started ({args.route}), output in {work_dir}. Press Ctrl+C to stop.")
+        while all(proc.poll() is None for proc in processes):
+            time.sleep(0.5)
+        print("[WARN] A subscriber exited, stopping the others.")
+    except KeyboardInterrupt:
+        print("Stopping subscribers...")
+    finally:
+        stop_processes(processes)
+    for index, proc in enumerate(processes):
+        if proc.returncode not in (0, -signal.SIGINT):
+            print(f"[WARN] Worker {index} exited with {proc.returncode}, see {work_dir}/worker{index}.out")
+    aggregate(config, worker_configs)
+
+
+if __name__ == "__main__":
+    main()
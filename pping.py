@@ -1,74 +1,180 @@
 import socket
 import time
+import asyncio
+import threading
 import os
 import struct
-import json
-import configparser
 import ssl
+import select
+import sys
+import array
 from datetime import datetime
+from cccm_config import load_config
+from cccm_log import get_logger_from_config
 
 
-config = configparser.ConfigParser()
-config.read('ccms.ini')
+config = load_config()
 
 # 전역 변수 (ini 파일에서 읽음)
 MQTT_BROKER = config['MQTT']['broker']
 MQTT_PORT = int(config['MQTT']['port'])
 MQTT_TOPIC = config['MQTT']['topic']
 
-LOG_FILE = config['LOG']['log_file']
 HASH_MISMATCH_LOG = config['LOG']['hash_mismatch_log']
 PING_SLEEP = int(config['TEST']['ping_sleep'])
 
+# asyncio TCP connect prober (MQTT port 대상, 동시 probe)
+PING_PORT = config.getint('PING', 'port', fallback=MQTT_PORT)
+PING_COUNT = config.getint('PING', 'count', fallback=5)
+PING_TIMEOUT = config.getfloat('PING', 'timeout', fallback=2.0)
+PING_INTERVAL = config.getfloat('PING', 'interval', fallback=float(PING_SLEEP))
+# monitor probe 방식: tcp (connect 시간) / icmp (echo, socket 재사용)
+PING_PROTOCOL = config.get('PING', 'protocol', fallback='tcp')
+
 
 def checksum(source_string):
-    """ICMP checksum 계산"""
-    sum = 0
-    countTo = (len(source_string) // 2) * 2
-    count = 0
-    while count < countTo:
-        thisVal = source_string[count + 1] * 256 + source_string[count]
-        sum = sum + thisVal
-        sum = sum & 0xffffffff
-        count = count + 2
-    if countTo < len(source_string):
-        sum = sum + source_string[len(source_string) - 1]
-        sum = sum & 0xffffffff
-    sum = (sum >> 16) + (sum & 0xffff)
-    sum = sum + (sum >> 16)
-    answer = ~sum
-    answer = answer & 0xffff
-    answer = answer >> 8 | (answer << 8 & 0xff00)
-    return answer
-
-
-def create_packet(id):
-    """ICMP Echo Request 패킷 생성"""
-    header = struct.pack("bbHHh", 8, 0, 0, id, 1)
-    data = struct.pack("d", time.time())
+    """ICMP checksum 계산 (network byte order 16bit word 합, array로 한번에 합산)"""
+    data = bytes(source_string)
+    if len(data) % 2:
+        data += b"\x00"
+    words = array.array("H", data)
+    if sys.byteorder == "little":
+        words.byteswap()
+    total = sum(words)
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_HEADER = struct.Struct("!BBHHH")
+
+
+def create_packet(id, seq=1):
+    """ICMP Echo Request 패킷 생성.
+    header는 network byte order (id / seq big-endian), payload는 perf_counter() 값 ("!d").
+    이전 형식 (native order id / seq, payload time.time() native double) 과 다르다 - RTT는 payload가 아니라
+    송신 측 pending 시각으로 계산하므로 payload 값은 사용하지 않는다"""
+    data = struct.pack("!d", time.perf_counter())
+    header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, id, seq)
     my_checksum = checksum(header + data)
-    header = struct.pack("bbHHh", 8, 0, socket.htons(my_checksum), id, 1)
-    return header + data
+    return ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, my_checksum, id, seq) + data
+
+
+class IcmpProber:
+    """ICMP socket 1개를 열어 두고 재사용하는 echo probe.
+
+    unprivileged datagram ICMP socket (Linux ping_group_range) 을 먼저 시도하고,
+    안되면 raw socket (root 권한 필요). 응답은 (id, seq)로 매칭하므로
+    여러 probe를 동시에 보내도 된다. 둘 다 실패하면 available == False.
+    """
+
+    def __init__(self, host, timeout=PING_TIMEOUT):
+        self.host = host
+        self.timeout = timeout
+        self.addr = socket.gethostbyname(host)
+        self.sock = None
+        self.raw = False
+        self.id = os.getpid() & 0xFFFF
+        self._seq = 0
+        self._lock = threading.Lock()
+        for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+            try:
+                self.sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            self.raw = kind == socket.SOCK_RAW
+            if not self.raw:
+                # datagram socket은 kernel이 id를 local port로 바꿈
+                self.sock.bind(("", 0))
+                self.id = self.sock.getsockname()[1] & 0xFFFF
+            break
+
+    @property
+    def available(self):
+        return self.sock is not None
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _parse_reply(self, packet):
+        """echo reply이면 (id, seq), 아니면 None. raw socket은 IP header 포함"""
+        if self.raw:
+            packet = packet[(packet[0] & 0x0F) * 4:]
+        if len(packet) < ICMP_HEADER.size:
+            return None
+        icmp_type, _, _, packet_id, seq = ICMP_HEADER.unpack_from(packet)
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        return packet_id, seq
+
+    def ping_many(self, count=PING_COUNT, timeout=None):
+        """count 개 echo request를 연달아 보내고 응답을 모아 RTT(sec) list 반환 (유실분 제외)"""
+        if not self.available:
+            return []
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            pending = {}
+            for _ in range(count):
+                seq = self._next_seq()
+                packet = create_packet(self.id, seq)
+                pending[seq] = time.perf_counter()
+                try:
+                    self.sock.sendto(packet, (self.addr, 1))
+                except OSError:
+                    pending.pop(seq)
+            samples = []
+            deadline = time.perf_counter() + timeout
+            while pending:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                ready, _, _ = select.select([self.sock], [], [], remaining)
+                if not ready:
+                    break
+                packet = self.sock.recv(1024)
+                now = time.perf_counter()
+                reply = self._parse_reply(packet)
+                if reply is None or reply[0] != self.id or reply[1] not in pending:
+                    continue  # 다른 process의 응답 / 이미 timeout 된 이전 probe
+                samples.append(now - pending.pop(reply[1]))
+            return samples
+
+    def ping(self, timeout=None):
+        samples = self.ping_many(1, timeout)
+        return samples[0] if samples else None
+
+    def stats(self, count=PING_COUNT, timeout=None):
+        return ping_stats(self.ping_many(count, timeout), count)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+_icmp_probers = {}
+_icmp_lock = threading.Lock()
+
+
+def get_icmp_prober(host):
+    """host별 IcmpProber 1개를 공유 (socket을 probe마다 열지 않음)"""
+    with _icmp_lock:
+        prober = _icmp_probers.get(host)
+        if prober is None:
+            prober = _icmp_probers[host] = IcmpProber(host)
+        return prober
 
 
 def do_ping(dest_addr, timeout=10):
-    """ICMP Ping - root 권한 필요"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname("icmp"))
-    except PermissionError:
-        return None  # root 권한 없으면 실패
-    packet_id = os.getpid() & 0xFFFF
-    packet = create_packet(packet_id)
-    sock.settimeout(timeout)
-    start_time = time.time()
+    """ICMP Ping - ICMP socket을 열 수 없으면 None"""
     try:
-        sock.sendto(packet, (dest_addr, 1))
-        sock.recvfrom(1024)
-        return (time.time() - start_time) # sec 단위 
-    except socket.timeout:
+        prober = get_icmp_prober(dest_addr)
+    except OSError:
         return None
-    finally:
-        sock.close()
+    return prober.ping(timeout)
 
 
 def socket_time(host, port=443, timeout=10):
@@ -118,9 +224,109 @@ def average_ping(host, count=5):
         return -1
 
 
+def ping_stats(samples, sent):
+    """RTT sample(sec) -> min / mean / p95 / jitter(연속 sample 차이의 평균)"""
+    if not samples:
+        return {"min": -1, "mean": -1, "p95": -1, "jitter": -1, "count": 0, "lost": sent}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    diffs = [abs(b - a) for a, b in zip(samples, samples[1:])]
+    return {
+        "min": ordered[0],
+        "mean": sum(samples) / len(samples),
+        "p95": p95,
+        "jitter": sum(diffs) / len(diffs) if diffs else 0.0,
+        "count": len(samples),
+        "lost": sent - len(samples),
+    }
+
+
+async def tcp_probe(host, port=PING_PORT, timeout=PING_TIMEOUT):
+    """TCP connect 시간 (TLS handshake 없음). 실패 시 None"""
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    elapsed = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return elapsed
+
+
+async def probe_many(host, port=PING_PORT, count=PING_COUNT, timeout=PING_TIMEOUT):
+    """count 개 probe를 동시에 실행 -> ping_stats"""
+    results = await asyncio.gather(*(tcp_probe(host, port, timeout) for _ in range(count)))
+    return ping_stats([r for r in results if r is not None], count)
+
+
+def probe(host, port=PING_PORT, count=PING_COUNT, timeout=PING_TIMEOUT):
+    """동기 호출용 (최대 timeout 초 소요)"""
+    return asyncio.run(probe_many(host, port, count, timeout))
+
+
+class PingMonitor:
+    """background thread의 asyncio loop에서 주기적으로 probe하고 최신 결과를 보관.
+    latest / value 읽기는 lock 없이 즉시 반환 (dict 참조 교체만 함).
+    protocol == "icmp" 이고 ICMP socket을 열 수 없으면 tcp로 대체"""
+
+    def __init__(self, host, port=PING_PORT, count=PING_COUNT, timeout=PING_TIMEOUT, interval=PING_INTERVAL,
+                 protocol=PING_PROTOCOL):
+        self.host = host
+        self.port = port
+        self.count = count
+        self.timeout = timeout
+        self.interval = interval
+        self.icmp = None
+        if protocol == "icmp":
+            try:
+                self.icmp = IcmpProber(host, timeout)
+            except OSError as e:
+                print(f"[WARN] ICMP prober unavailable for {host} ({e}), using TCP")
+            if self.icmp is not None and not self.icmp.available:
+                print(f"[WARN] Cannot open ICMP socket for {host}, using TCP")
+                self.icmp = None
+        self.latest = ping_stats([], 0)
+        self.updated = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self, wait=True):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="ping-monitor", daemon=True)
+        self._thread.start()
+        if wait:
+            self._ready.wait(self.timeout + 1.0)
+        return self
+
+    async def _run(self):
+        while not self._stop.is_set():
+            if self.icmp is not None:
+                self.latest = await asyncio.to_thread(self.icmp.stats, self.count, self.timeout)
+            else:
+                self.latest = await probe_many(self.host, self.port, self.count, self.timeout)
+            self.updated = time.time()
+            self._ready.set()
+            await asyncio.sleep(self.interval)
+
+    @property
+    def value(self):
+        """최신 평균 RTT (sec), 측정 실패 시 -1"""
+        return self.latest["mean"]
+
+    def stop(self):
+        self._stop.set()
+        if self.icmp is not None:
+            self._thread.join(self.timeout + 1.0)
+            self.icmp.close()
+
+
 def timing_logging(mdata):
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(mdata) + "\n")
+    # background writer thread가 묶어서 기록 (메시지마다 open/close 하지 않음)
+    get_logger_from_config(config).log(mdata)
 
 if __name__ == '__main__':
     while True:
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# cccmp_20 / cccms_20 는 import 시 ini를 읽으므로 저장소의 ccms.ini를 사용
+os.environ.setdefault("CCMS_INI", os.path.join(ROOT, "ccms.ini"))
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+from cccm_clock import ClockResponder, parse_message, reply_topic
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def message_callback_add(self, topic, callback):
+        pass
+
+    def publish(self, topic, payload):
+        self.published.append((topic, json.loads(payload)))
+
+
+def request(payload):
+    if not isinstance(payload, (bytes, str)):
+        payload = json.dumps(payload)
+    return SimpleNamespace(payload=payload)
+
+
+def test_responder_replies_to_valid_request():
+    client = FakeClient()
+    responder = ClockResponder(client, "ccms")
+    responder.on_request(client, None, request({"id": 3, "t1": 1.5, "client": "abc"}))
+    assert responder.requests == 1
+    topic, reply = client.published[0]
+    assert topic == reply_topic("ccms", "abc")
+    assert reply["id"] == 3 and reply["t1"] == 1.5
+    assert reply["t2"] <= reply["t3"]
+
+
+def test_responder_ignores_bad_requests():
+    client = FakeClient()
+    responder = ClockResponder(client, "ccms")
+    for payload in (b"not json", b"[1, 2]", b"null", {"id": 1, "t1": 1.0},
+                    {"id": 1, "client": "abc"}, {"t1": 1.0, "client": "abc"},
+                    {"id": 1, "t1": "x", "client": "abc"}, {"id": 1, "t1": 1.0, "client": 5},
+                    {"id": 1, "t1": 1.0, "client": "a/#"}):
+        responder.on_request(client, None, request(payload))
+    assert responder.requests == 0
+    assert client.published == []
+
+
+def test_parse_message_rejects_bool_numbers():
+    assert parse_message(json.dumps({"id": True, "t1": 1.0}), ("id", "t1")) is None
+    assert parse_message(json.dumps({"id": 1, "t1": 1.0}), ("id", "t1")) == {"id": 1, "t1": 1.0}
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import pytest
+from cccm_frame import (FORMAT_BINARY, FORMAT_JSON, FRAME_HEADER_SIZE, FRAME_PREFIX,
+                        decode_message, encode_message, frame_header_size, is_batch_frame, is_chunk_frame,
+                        new_frame, pack_frame, peek_combo_id, unpack_frame, write_frame_header)
+from cccm_integrity import DIGEST_SIZES, INTEGRITY_AEAD, INTEGRITY_BLAKE2S, INTEGRITY_HMAC, INTEGRITY_NONE
+
+DATA = b"\x00\x01ciphertext\xff" * 10
+SHA = hashlib.sha256(DATA).digest()
+
+
+@pytest.mark.parametrize("digest", [None, SHA])
+def test_json_round_trip(digest):
+    payload = encode_message(7, 42, DATA, digest, FORMAT_JSON)
+    assert json.loads(payload)["metadata"]["id"] == 7
+    assert peek_combo_id(payload) == 7
+    metadata, data, _ = decode_message(payload)
+    assert bytes(data) == DATA
+    assert metadata["sequence"] == 42
+    assert metadata["hash"] == digest
+    assert metadata["integrity"] == ("sha256" if digest else INTEGRITY_NONE)
+    assert metadata["payload_format"] == FORMAT_JSON
+
+
+def test_json_keeps_v2_integrity_mode():
+    digest = b"\x05" * DIGEST_SIZES[INTEGRITY_HMAC]
+    metadata, data, _ = decode_message(encode_message(3, 1, DATA, digest, FORMAT_JSON, INTEGRITY_HMAC))
+    assert metadata["integrity"] == INTEGRITY_HMAC and metadata["hash"] == digest
+
+
+@pytest.mark.parametrize("digest", [None, SHA])
+def test_v1_round_trip(digest):
+    payload = encode_message(65535, 2 ** 32 - 1, DATA, digest, FORMAT_BINARY)
+    assert len(payload) == FRAME_HEADER_SIZE + len(DATA)
+    assert payload[2] == 1
+    assert peek_combo_id(payload) == 65535
+    metadata, data, size = decode_message(payload)
+    assert bytes(data) == DATA and size == len(DATA)
+    assert metadata["sequence"] == 2 ** 32 - 1
+    assert metadata["hash"] == digest
+    assert metadata["integrity"] == ("sha256" if digest else INTEGRITY_NONE)
+    assert not is_chunk_frame(payload) and not is_batch_frame(payload)
+
+
+@pytest.mark.parametrize("mode", [INTEGRITY_BLAKE2S, INTEGRITY_HMAC, INTEGRITY_AEAD])
+def test_v2_round_trip(mode):
+    digest = bytes(range(DIGEST_SIZES[mode]))
+    payload = encode_message(9, 5, DATA, digest, FORMAT_BINARY, mode)
+    assert payload[2] == 2
+    assert len(payload) == frame_header_size(integrity=mode) + len(DATA)
+    metadata, data = unpack_frame(payload)
+    assert bytes(data) == DATA
+    assert metadata["integrity"] == mode and metadata["hash"] == digest
+
+
+@pytest.mark.parametrize("mode", [None, INTEGRITY_BLAKE2S])
+def test_chunk_frame(mode):
+    digest = SHA if mode is None else b"\x01" * DIGEST_SIZES[mode]
+    for index, last in ((0, False), (3, True)):
+        payload = pack_frame(4, 11, DATA, digest, chunk=index, last=last, integrity=mode)
+        assert is_chunk_frame(payload)
+        metadata, data = unpack_frame(payload)
+        assert metadata["chunk"] == index and metadata["last"] is last
+        assert bytes(data) == DATA
+
+
+def test_batch_frame():
+    frame, body = new_frame(len(DATA))
+    body[:] = DATA
+    write_frame_header(frame, 2, 8, SHA, batch=True)
+    assert is_batch_frame(frame) and not is_chunk_frame(frame)
+    metadata, data = unpack_frame(frame)
+    assert metadata["batch"] is True and bytes(data) == DATA
+
+
+def test_digest_size_checked_on_encode():
+    with pytest.raises(ValueError):
+        encode_message(1, 1, DATA, b"short", FORMAT_BINARY)
+    with pytest.raises(ValueError):
+        encode_message(1, 1, DATA, b"short", FORMAT_BINARY, INTEGRITY_HMAC)
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        encode_message(1, 1, DATA, None, "xml")
+
+
+@pytest.mark.parametrize("mode", [None, INTEGRITY_HMAC])
+def test_truncated_headers(mode):
+    digest = SHA if mode is None else b"\x02" * DIGEST_SIZES[mode]
+    full = bytes(pack_frame(1, 1, b"", digest, chunk=0, integrity=mode))
+    for size in range(len(full)):
+        with pytest.raises(ValueError):
+            unpack_frame(full[:size])
+    unpack_frame(full)
+
+
+def test_invalid_headers():
+    payload = bytearray(encode_message(1, 1, DATA, b"\x03" * DIGEST_SIZES[INTEGRITY_HMAC], FORMAT_BINARY,
+                                       INTEGRITY_HMAC))
+    for index, value in ((0, ord("X")), (2, 9), (FRAME_PREFIX.size, 200), (FRAME_PREFIX.size + 1, 3)):
+        bad = bytearray(payload)
+        bad[index] = value
+        with pytest.raises(ValueError):
+            unpack_frame(bad)
+    assert peek_combo_id(b"CM\x01") is None
@@ -0,0 +1,102 @@
+import pytest
+
+import cccms_20
+from cccm_codec import codecs_by_id
+from cccm_frame import FORMAT_BINARY, FORMAT_JSON, encode_message, pack_frame
+from cccm_integrity import (INTEGRITY_AEAD, INTEGRITY_BLAKE2S, INTEGRITY_HMAC, INTEGRITY_NONE, INTEGRITY_SHA256,
+                            combo_integrity, compute_digest, verify_digest)
+from cccm_sinario import get_configuration_by_id
+
+DATA = b"sensor-payload-0123456789" * 40
+
+
+@pytest.fixture(autouse=True)
+def mismatch_log(tmp_path, monkeypatch):
+    path = tmp_path / "hash_mismatch.txt"
+    monkeypatch.setattr(cccms_20, "HASH_MISMATCH_LOG", str(path))
+    return path
+
+
+def make_payload(id_value, fmt, mode, tamper=False, declare=None):
+    """publisher와 같은 방식의 payload. declare는 frame에 선언할 mode (공격자가 바꾼 값)"""
+    compress, encrypt, _, _ = codecs_by_id[id_value]
+    encrypted = bytearray(encrypt(compress(DATA)))
+    digest = compute_digest(mode, encrypted) if mode != INTEGRITY_NONE else None
+    if tamper:
+        encrypted[-1] ^= 0xFF
+    if declare is not None:
+        mode, digest = declare, None
+    return encode_message(id_value, 7, bytes(encrypted), digest, fmt, mode)
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_JSON, FORMAT_BINARY])
+@pytest.mark.parametrize("mode", [INTEGRITY_SHA256, INTEGRITY_BLAKE2S, INTEGRITY_HMAC, INTEGRITY_AEAD])
+@pytest.mark.parametrize("id_value", [2, 4])
+def test_round_trip(monkeypatch, fmt, mode, id_value):
+    monkeypatch.setattr(cccms_20, "INTEGRITY_MODE", mode)
+    _, enc_method, hash_option = get_configuration_by_id(id_value)
+    expected = combo_integrity(mode, enc_method, hash_option)
+    metadata = cccms_20.process_message(make_payload(id_value, fmt, expected), 0.0)
+    assert metadata is not None
+    assert metadata["size"] == len(DATA)
+    assert metadata["integrity"] == expected
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_JSON, FORMAT_BINARY])
+def test_tampered_payload_rejected(fmt, mismatch_log):
+    assert cccms_20.process_message(make_payload(2, fmt, INTEGRITY_SHA256, tamper=True), 0.0) is None
+    assert mismatch_log.exists()
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_JSON, FORMAT_BINARY])
+@pytest.mark.parametrize("mode", [INTEGRITY_SHA256, INTEGRITY_AEAD])
+def test_declared_aead_does_not_skip_mac(monkeypatch, fmt, mode, mismatch_log):
+    # combo 2 (암호화 없음, hash): aead를 선언해 MAC 검사를 건너뛰려는 변조
+    monkeypatch.setattr(cccms_20, "INTEGRITY_MODE", mode)
+    payload = make_payload(2, fmt, INTEGRITY_SHA256, tamper=True, declare=INTEGRITY_AEAD)
+    assert cccms_20.process_message(payload, 0.0) is None
+    assert "expected_integrity" in mismatch_log.read_text()
+
+
+def test_declared_mode_must_match_config(monkeypatch):
+    monkeypatch.setattr(cccms_20, "INTEGRITY_MODE", INTEGRITY_HMAC)
+    assert cccms_20.process_message(make_payload(2, FORMAT_BINARY, INTEGRITY_BLAKE2S), 0.0) is None
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_JSON, FORMAT_BINARY])
+def test_hash_combo_without_digest_is_mismatch(fmt, mismatch_log):
+    compress, encrypt, _, _ = codecs_by_id[2]
+    payload = encode_message(2, 7, encrypt(compress(DATA)), None, fmt)
+    assert cccms_20.process_message(payload, 0.0) is None
+    assert mismatch_log.exists()
+
+
+def test_batch_frame_declared_aead_rejected(mismatch_log):
+    from cccm_batch import pack_batch
+    from cccm_frame import new_frame, write_frame_header
+    body = pack_batch([(1, DATA[:100]), (2, DATA[100:300])])
+    frame, data = new_frame(len(body), integrity=INTEGRITY_AEAD)
+    data[:] = body
+    write_frame_header(frame, 2, 0, None, integrity=INTEGRITY_AEAD, batch=True)
+    assert cccms_20.process_message(bytes(frame), 0.0) is None
+    assert mismatch_log.exists()
+
+
+def test_verify_digest():
+    digest = compute_digest(INTEGRITY_HMAC, DATA)
+    assert verify_digest(INTEGRITY_HMAC, DATA, digest, "none")
+    assert not verify_digest(INTEGRITY_HMAC, DATA + b"x", digest, "none")
+    assert not verify_digest(INTEGRITY_HMAC, DATA, None, "none")
+    assert not verify_digest(INTEGRITY_NONE, DATA, None, "none")
+    assert verify_digest(INTEGRITY_AEAD, DATA, None, "AES-GCM")
+    assert not verify_digest(INTEGRITY_AEAD, DATA, None, "Speck")
+    assert not verify_digest(INTEGRITY_AEAD, DATA, None, "none")
+
+
+def test_v1_frame_round_trip():
+    compress, encrypt, _, _ = codecs_by_id[2]
+    encrypted = encrypt(compress(DATA))
+    payload = pack_frame(2, 9, encrypted, compute_digest(INTEGRITY_SHA256, encrypted))
+    assert payload[2] == 1
+    metadata = cccms_20.process_message(bytes(payload), 0.0)
+    assert metadata["sequence"] == 9 and metadata["size"] == len(DATA)
@@ -0,0 +1,76 @@
+import json
+import pandas as pd
+from cccm_m2_20 import CsvSink, drop_sequences, merge_stream
+
+
+def write_log(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def log_entry(seq, direction, t):
+    entry = {"id": 1, "sequence": seq, "direction": direction, "compress_method": "zlib",
+             "encryption_type": "aes", "size": 10}
+    entry["publish_time" if direction == "pub" else "subscribe_time"] = t
+    return entry
+
+
+def merge(tmp_path, entries, window):
+    log = tmp_path / "log.txt"
+    write_log(log, entries)
+    sink = CsvSink(str(tmp_path / "log.csv"))
+    try:
+        result = merge_stream(str(log), sink, window)
+    finally:
+        sink.close()
+    return result, pd.read_csv(tmp_path / "log.csv")
+
+
+def test_rows_sorted_by_sequence_within_window(tmp_path):
+    # sequence 3, 1, 2 순서로 완성
+    entries = [log_entry(s, "pub", s) for s in (1, 2, 3)]
+    entries += [log_entry(s, "sub", s + 0.1) for s in (3, 1, 2)]
+    (invalid, late, out_of_order), df = merge(tmp_path, entries, window=100)
+    assert not invalid and not late and out_of_order == 0
+    assert list(df["sequence"]) == [1, 2, 3]
+
+
+def test_late_duplicate_removed_by_post_pass(tmp_path):
+    entries = [log_entry(1, "pub", 1), log_entry(1, "sub", 1.1), log_entry(2, "pub", 2), log_entry(2, "sub", 2.1),
+               log_entry(1, "sub", 9.0)]      # seq 1 기록 (line 4) 직후의 중복
+    (invalid, late, _), df = merge(tmp_path, entries, window=2)
+    assert not invalid and late == [1]
+    assert 1 in set(df["sequence"])
+    assert drop_sequences(str(tmp_path / "log.csv"), late) == 1
+    assert list(pd.read_csv(tmp_path / "log.csv")["sequence"]) == [2]
+
+
+def test_written_set_is_bounded(tmp_path):
+    entries = []
+    for s in range(1, 51):
+        entries += [log_entry(s, "pub", s), log_entry(s, "sub", s + 0.1)]
+    entries.append(log_entry(1, "sub", 99.0))     # window 훨씬 이후의 중복 -> 미완성 sequence
+    (invalid, late, _), df = merge(tmp_path, entries, window=4)
+    assert not late and list(invalid) == [1]
+    assert drop_sequences(str(tmp_path / "log.csv"), set(late) | set(invalid)) == 1
+    assert list(pd.read_csv(tmp_path / "log.csv")["sequence"]) == list(range(2, 51))
+
+
+def test_sub_ping_kept_and_tcp_ping_added(tmp_path):
+    pub, sub = log_entry(1, "pub", 1), log_entry(1, "sub", 1.1)
+    pub["pub_ping"], sub["sub_ping"] = 0.002, 0.003
+    pub2, sub2 = log_entry(2, "pub", 2), log_entry(2, "sub", 2.1)
+    pub2["pub_ping"], sub2["sub_ping"] = 0.002, -1
+    entries = [pub, {"tcp_ping": 0.007}, sub, pub2, sub2]
+    _, df = merge(tmp_path, entries, window=100)
+    assert list(df["sub_ping"]) == [0.003, 0.007]
+    assert list(df["tcp_ping_sub"]) == [0.007, 0.007]
+
+
+def test_duplicate_within_window_is_invalid(tmp_path):
+    entries = [log_entry(1, "pub", 1), log_entry(1, "sub", 1.1), log_entry(1, "sub", 1.2),
+               log_entry(2, "pub", 2), log_entry(2, "sub", 2.1)]
+    (invalid, late, _), df = merge(tmp_path, entries, window=100)
+    assert list(invalid) == [1] and not late
+    assert list(df["sequence"]) == [2]
@@ -0,0 +1,25 @@
+from cccm_metrics import LatencyMetrics, LogHistogram, describe
+
+
+def record(**fields):
+    return dict(id=1, compress_method="zlib", encryption_type="AES-GCM", **fields)
+
+
+def test_negative_and_nan_samples_do_not_break_prometheus():
+    metrics = LatencyMetrics()
+    metrics.observe(record(decryption_time=-0.001, hash_time=float("nan"), subscribe_time=10.0), now=9.999)
+    assert metrics.series == {}
+    metrics.prometheus()
+    metrics.observe(record(decryption_time=0.002, subscribe_time=10.0), now=10.5)
+    text = metrics.prometheus()
+    assert 'stage="decrypt",quantile="0.5"' in text
+    assert 'stage="hash"' not in text
+    assert metrics.totals("decrypt").count == 1
+
+
+def test_empty_series_skipped():
+    metrics = LatencyMetrics()
+    metrics.series[(1, "zlib", "AES-GCM", "decrypt")] = LogHistogram()
+    assert "ccms_stage_seconds{" not in metrics.prometheus()
+    assert describe(metrics.totals("decrypt")) == "no data"
+    assert metrics.snapshot()["series"][0]["p50"] is None
@@ -0,0 +1,27 @@
+from cccm_predict import TransmissionPredictor, trained_combos
+from cccm_sinario import combinations_with_id
+
+
+class FavourNewCodecs:
+    """model에 없는 codec(Speck / zstd / brotli)에 가장 작은 값을 주는 model"""
+
+    def predict(self, rows):
+        return [0.001 if row[0] in ("zstd", "zstd-dict", "brotli") or row[1] == "Speck" else 1.0 + row[4] * 1e-6
+                for row in rows]
+
+
+def test_trained_combos_are_matrix_v1():
+    assert [combo[0] for combo in trained_combos()] == list(range(1, 57))
+
+
+def test_best_combo_stays_in_trained_set():
+    predictor = TransmissionPredictor(FavourNewCodecs())
+    for size in (100, 10000, 1000000):
+        for ping in (0.0, 0.01, 0.2):
+            id_value, _ = predictor.best_combo(size, ping)
+            assert 1 <= id_value <= 56
+
+
+def test_explicit_combos():
+    predictor = TransmissionPredictor(FavourNewCodecs(), combos=combinations_with_id)
+    assert predictor.best_combo(1000, 0.0)[0] > 56
@@ -0,0 +1,66 @@
+import types
+
+import paho.mqtt.client as mqtt
+import pytest
+
+import cccmp_20
+
+
+class FakeClient:
+    """publish()는 mid를 1, 2, .. 순서로 (wrap 값 지정 가능) 반환, ack는 테스트가 직접 호출"""
+
+    def __init__(self, wrap=65535):
+        self.wrap = wrap
+        self.mid = 0
+
+    def publish(self, topic, payload, qos):
+        self.mid = self.mid % self.wrap + 1
+        return types.SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS, mid=self.mid)
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    records = []
+    monkeypatch.setattr(cccmp_20, "timing_logging", records.append)
+    return records
+
+
+def send(window, client, sequence):
+    return window.send(client, "t", b"x", 1, {"sequence": sequence})
+
+
+def test_ack_collected(logged):
+    window, client = cccmp_20.PublishWindow(2, 1.0), FakeClient()
+    assert send(window, client, 0) == []
+    window.on_publish(client, None, 1)
+    done = window.drain(1.0)
+    assert [m["sequence"] for m in done] == [0]
+    assert done[0]["ack_latency"] >= 0
+    assert window._slots._value == 2
+
+
+def test_late_ack_after_timeout_is_ignored(logged):
+    window, client = cccmp_20.PublishWindow(2, 1.0), FakeClient(wrap=1)
+    send(window, client, 0)
+    assert window.drain(0.01) == []
+    assert logged[-1]["ack_time"] is None
+    assert window._slots._value == 2          # 포기한 message의 slot 반환
+    window.on_publish(client, None, 1)        # 늦은 ack: slot도 ack도 기록하지 않음
+    assert window._slots._value == 2
+    assert not window._acks
+
+    # 같은 mid를 재사용한 다음 message는 자기 ack가 와야 완료
+    assert send(window, client, 1) == []
+    assert window.drain(0.01) == []
+    assert logged[-1]["sequence"] == 1 and logged[-1]["ack_time"] is None
+
+
+def test_reused_mid_gets_its_own_ack(logged):
+    window, client = cccmp_20.PublishWindow(2, 1.0), FakeClient(wrap=1)
+    send(window, client, 0)
+    window.drain(0.01)
+    send(window, client, 1)                   # mid 재사용 -> 만료 표시 해제
+    window.on_publish(client, None, 1)
+    done = window.drain(1.0)
+    assert [m["sequence"] for m in done] == [1]
+    assert window._slots._value == 2
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from cccm_integrity import INTEGRITY_SHA256
+from cccm_stream import StreamAssembler, ascon_chunk_nonce, iter_stream_chunks, new_stream_timing
+
+DATA = random.Random(0).randbytes(256 * 1024)   # 압축되지 않는 data -> chunk 여러 개
+CHUNK = 16384
+
+
+def chunks(sequence, comp="zlib", enc="AES-GCM"):
+    blocks = [memoryview(DATA)[i:i + CHUNK] for i in range(0, len(DATA), CHUNK)]
+    out = []
+    for index, last, encrypted, digest in iter_stream_chunks(blocks, comp, enc, "hash", sequence, CHUNK,
+                                                             new_stream_timing(), integrity=INTEGRITY_SHA256):
+        meta = {"id": 1, "sequence": sequence, "chunk": index, "last": last, "hash": digest,
+                "integrity": INTEGRITY_SHA256}
+        out.append((meta, bytes(encrypted)))
+    return out
+
+
+def feed(assembler, items, comp="zlib", enc="AES-GCM"):
+    result = None
+    for meta, data in items:
+        result = assembler.add_chunk(meta, data, comp, enc, "hash", 0.0)
+    return result
+
+
+def test_reassembles_out_of_order():
+    assembler = StreamAssembler()
+    items = chunks(1)
+    assert len(items) > 2
+    result = feed(assembler, items[1:] + items[:1])
+    assert result["size"] == len(DATA)
+    assert assembler.pending_streams() == 0
+
+
+def test_failed_chunk_discards_state():
+    assembler = StreamAssembler()
+    items = chunks(2)
+    meta, data = items[0]
+    tampered = bytearray(data)
+    tampered[-1] ^= 1
+    with pytest.raises(ValueError):
+        assembler.add_chunk(meta, bytes(tampered), "zlib", "AES-GCM", "hash", 0.0)
+    assert assembler.pending_streams() == 0
+
+
+def test_evicts_beyond_max_streams(capsys):
+    assembler = StreamAssembler(max_age=3600, max_streams=2)
+    for seq in range(5):
+        feed(assembler, chunks(seq)[1:2])      # 첫 chunk 유실 -> 끝나지 않음
+    assert assembler.pending_streams() == 2
+    assert assembler.evicted == 3
+    assert "Incomplete stream evicted: seq=0" in capsys.readouterr().out
+
+
+def test_evicts_old_streams():
+    assembler = StreamAssembler(max_age=0.0, max_streams=100)
+    feed(assembler, chunks(1)[1:2])
+    feed(assembler, chunks(2)[1:2])             # 새 sequence 시작 시 seq 1 은 max_age 초과
+    assert assembler.evicted == 1
+    assert assembler.pending_streams() == 1
+
+
+def test_ascon_nonce_depends_on_sequence_and_chunk():
+    nonces = {ascon_chunk_nonce(seq, index) for seq in (0, 1, 2) for index in (0, 1, 2)}
+    assert len(nonces) == 9
+    first = chunks(1, "none", "ASCON")
+    second = chunks(2, "none", "ASCON")
+    assert first[0][1] != second[0][1]
+    assert first[1][1] != second[1][1]
+    result = feed(StreamAssembler(), second, "none", "ASCON")
+    assert result["size"] == len(DATA)